@@ -0,0 +1,83 @@
+"""
+Admission control and backpressure for list WebSockets.
+Following SOLID principles - ``ListConsumer`` asks before it accepts a
+socket; the limits and close codes are decided here.
+
+A process accepts at most ``MAX_CONNECTIONS`` sockets, and at most
+``MAX_PER_LIST`` on the same list. Sockets over a limit are accepted and
+closed at once with ``CLOSE_TRY_AGAIN`` and a ``retry-after=<seconds>``
+reason, so clients wait instead of reconnecting in a loop; the delay is
+jittered so a deploy does not bring every client back at the same moment.
+
+Admitted sockets send through a queue of at most ``SEND_QUEUE`` frames. A
+socket whose queue is full, or whose frame takes longer than ``SEND_TIMEOUT``
+seconds to send, is a slow consumer and is closed with ``CLOSE_SLOW``. Every
+``PING_INTERVAL`` seconds the socket is sent a ``PING`` event, which clients
+answer with ``{"action": "pong"}``; sockets silent for ``IDLE_TIMEOUT``
+seconds are closed with ``CLOSE_IDLE``. Clients reconnect after either and
+catch up with the ``resume`` command.
+"""
+import random
+from django.conf import settings
+from .metrics import websocket_rejections
+
+DEFAULTS = {
+    "MAX_CONNECTIONS": 10000,
+    "MAX_PER_LIST": 200,
+    "RETRY_AFTER": 5,  # seconds, doubled at most by jitter
+    "SEND_QUEUE": 64,  # frames
+    "SEND_TIMEOUT": 10,  # seconds
+    "PING_INTERVAL": 25,  # seconds
+    "IDLE_TIMEOUT": 60,  # seconds
+}
+
+# Application close codes (4000-4999), read by the frontend
+CLOSE_TRY_AGAIN = 4029
+CLOSE_SLOW = 4008
+CLOSE_IDLE = 4001
+
+PING = {"event": "PING"}
+
+
+def get_config():
+    """Return ``settings.WEBSOCKET_LIMITS`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "WEBSOCKET_LIMITS", {})}
+
+
+def retry_after(config):
+    """Seconds a refused client should wait, jittered to spread reconnects."""
+    return round(config["RETRY_AFTER"] * random.uniform(1, 2))
+
+
+class ConnectionLimiter:
+    """Counts the sockets of this process, in total and per list group."""
+
+    def __init__(self):
+        self.total = 0
+        self.groups = {}
+
+    def admit(self, group, config):
+        """
+        Count a new socket of ``group`` and return None, or return the
+        seconds to wait if a limit is reached.
+        """
+        if self.total >= config["MAX_CONNECTIONS"]:
+            reason = "server_full"
+        elif self.groups.get(group, 0) >= config["MAX_PER_LIST"]:
+            reason = "list_full"
+        else:
+            self.total += 1
+            self.groups[group] = self.groups.get(group, 0) + 1
+            return None
+        websocket_rejections.inc(label=reason)
+        return retry_after(config)
+
+    def release(self, group):
+        """Forget a socket counted by ``admit``."""
+        self.total -= 1
+        remaining = self.groups.pop(group) - 1
+        if remaining:
+            self.groups[group] = remaining
+
+
+limiter = ConnectionLimiter()
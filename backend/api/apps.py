@@ -8,3 +8,12 @@ class ApiConfig(AppConfig):
     def ready(self):
         """Import signals to register them."""
         import api.signals  # noqa: F401
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from api.metrics import install_query_recorder
+        from api import sqlite
+
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+        sqlite.install()
@@ -0,0 +1,205 @@
+"""
+Native async versions of the hot API views.
+Following SOLID principles - same contracts as ``views.py``, minus the thread
+pool hops around every request.
+
+Reads use Django's async ORM, and ``get_list`` serves snapshots cached in
+this process without leaving the event loop. Each write still runs its service
+call in a single ``sync_to_async`` hop, so that the row, the revision and the
+event log commit together; the broadcasts it produces are captured and sent
+with ``await group_send`` from the view itself. Enable them with
+``API_ASYNC_VIEWS=True``.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from .broadcast import capture, send_frames
+from .cache import snapshot_cache
+from .etags import etag_matches, list_etag, sets_etag, snapshot_response
+from .models import ShoppingList, Item
+from .fast_serializers import item_data
+from .services import ShoppingListService, ItemService, ConflictError
+from .views import items_page_data, parse_items_query
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _parse_body(request):
+    """Return the JSON body as a dict, like DRF's ``request.data``."""
+    if not request.body:
+        return {}
+    data = json.loads(request.body)
+    if not isinstance(data, dict):
+        raise ValueError("JSON object expected")
+    return data
+
+
+def _parse_error(error):
+    return JsonResponse({"detail": f"JSON parse error - {error}"}, status=400)
+
+
+async def _write(func, *args, **kwargs):
+    """Run a service write in one thread hop, then send its broadcasts here."""
+
+    def run():
+        with capture() as frames:
+            result = func(*args, **kwargs)
+        return result, frames
+
+    result, frames = await sync_to_async(run)()
+    await send_frames(frames)
+    return result
+
+
+async def _get_item(item_id):
+    try:
+        return await Item.objects.select_related("shopping_list").aget(id=item_id)
+    except Item.DoesNotExist:
+        return None
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def get_list(request, list_id):
+    """
+    GET /api/lists/{list_id}/
+    Récupérer les détails d'une liste de courses.
+    Répond 304 si l'en-tête If-None-Match correspond à l'ETag actuel.
+    """
+    try:
+        shopping_list = await ShoppingList.objects.aget(list_id=list_id)
+    except ShoppingList.DoesNotExist:
+        return JsonResponse(
+            {"detail": "No ShoppingList matches the given query."}, status=404
+        )
+    etag = list_etag(list_id, shopping_list.revision)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return snapshot_response(etag, None)
+    # The local cache is in memory: no need to leave the event loop.
+    payload = snapshot_cache.get_local(shopping_list.pk, shopping_list.revision)
+    if payload is None:
+        payload = await sync_to_async(ShoppingListService.render_snapshot)(
+            shopping_list
+        )
+    return snapshot_response(etag, payload)
+
+
+async def list_items(request, list_id):
+    """
+    GET /api/lists/{list_id}/items/?status=&cursor=&limit=
+    Parcourir les articles d'une liste page par page, dans l'ordre d'affichage.
+    """
+    kwargs, error = parse_items_query(request.GET)
+    if error:
+        return _error(error, 400)
+    try:
+        items, next_cursor = await sync_to_async(ItemService.get_items_page)(
+            list_id, **kwargs
+        )
+    except Http404 as e:
+        return JsonResponse({"detail": str(e)}, status=404)
+    except ValueError:
+        return _error("Curseur invalide", 400)
+    return JsonResponse(items_page_data(items, next_cursor))
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+@sets_etag
+async def add_item(request, list_id):
+    """
+    POST /api/lists/{list_id}/items/
+    Ajouter un article à une liste de courses.
+    Body: { "name": "Article name" }
+    GET sur la même adresse : voir list_items.
+    """
+    if request.method == "GET":
+        return await list_items(request, list_id)
+    try:
+        data = _parse_body(request)
+    except ValueError as e:
+        return _parse_error(e)
+
+    try:
+        shopping_list = await ShoppingList.objects.aget(list_id=list_id)
+    except ShoppingList.DoesNotExist:
+        return JsonResponse(
+            {"detail": "No ShoppingList matches the given query."}, status=404
+        )
+
+    name = data.get("name")
+    if not ItemService.is_valid_name(name):
+        return _error("Le nom de l'article est requis", 400)
+
+    item = await _write(ItemService.create_item, shopping_list, name)
+    return JsonResponse(item_data(item), status=201)
+
+
+@csrf_exempt
+@require_http_methods(["PATCH"])
+@sets_etag
+async def update_item(request, item_id):
+    """
+    PATCH /api/items/{item_id}/
+    Mettre à jour un article.
+    Body: { "name": "...", "status": "...", "claimed_by": "...", "version": 3 }
+    """
+    try:
+        data = _parse_body(request)
+    except ValueError as e:
+        return _parse_error(e)
+
+    item = await _get_item(item_id)
+    if item is None:
+        return _error("Article introuvable", 404)
+
+    # Check if item is locked by another user
+    if ItemService.is_locked_for(item, data.get("current_pseudo")):
+        return _error("Cet article est verrouillé par un autre utilisateur", 403)
+
+    # Update allowed fields
+    allowed_fields = ["name", "status", "claimed_by"]
+    update_data = {key: value for key, value in data.items() if key in allowed_fields}
+    if "name" in update_data and not ItemService.is_valid_name(update_data["name"]):
+        return _error("Le nom de l'article est requis", 400)
+
+    version = data.get("version")
+    try:
+        item = await _write(
+            ItemService.update_item,
+            item,
+            expected_version=version if isinstance(version, int) else None,
+            **update_data,
+        )
+    except ConflictError as e:
+        return _error(str(e), 409)
+    return JsonResponse(item_data(item))
+
+
+@csrf_exempt
+@require_http_methods(["DELETE"])
+@sets_etag
+async def delete_item(request, item_id):
+    """
+    DELETE /api/items/{item_id}/
+    Supprimer un article.
+    """
+    try:
+        data = _parse_body(request)
+    except ValueError as e:
+        return _parse_error(e)
+
+    item = await _get_item(item_id)
+    if item is None:
+        return _error("Article introuvable", 404)
+
+    # Check if item is locked by another user
+    if ItemService.is_locked_for(item, data.get("current_pseudo")):
+        return _error("Cet article est verrouillé par un autre utilisateur", 403)
+
+    await _write(ItemService.delete_item, item)
+    return HttpResponse(status=204)
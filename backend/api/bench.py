@@ -0,0 +1,143 @@
+"""
+Helpers shared by the benchmark management commands.
+Following SOLID principles - timing statistics and reporting live in one place.
+"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import CommandError
+
+HOST = "127.0.0.1"
+
+
+def percentile(sorted_values, pct):
+    """Return the ``pct`` percentile (0-100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1)))
+    )
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """Summarize latency samples given in seconds, in milliseconds."""
+    values = sorted(samples)
+    count = len(values)
+    return {
+        "count": count,
+        "mean_ms": (sum(values) / count * 1000) if count else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": (values[-1] * 1000) if count else 0.0,
+    }
+
+
+def format_table(headers, rows):
+    """Render rows as a plain-text table with right-aligned columns."""
+    cells = [[str(h) for h in headers]] + [
+        [f"{v:.3f}" if isinstance(v, float) else str(v) for v in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(row, widths)) for row in cells]
+    lines.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
+
+
+def sample_item(item_id, status="pending", claimed_by=None):
+    """Return an item dict shaped like ``ItemSerializer`` output."""
+    return {
+        "id": item_id,
+        "name": f"Article {item_id}",
+        "status": status,
+        "claimed_by": claimed_by,
+        "created_at": "2025-11-29T15:14:00.123456Z",
+        "updated_at": "2025-11-29T15:20:00.654321Z",
+        "version": 1,
+    }
+
+
+def _wait_for_port(port, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"daphne on port {port} did not start")
+
+
+@contextmanager
+def daphne_processes(ports, **env):
+    """
+    Run one daphne process per port with the current settings and ``env``
+    overrides, and stop them on exit. Yields once every port accepts connections.
+    """
+    env = dict(os.environ, **env)
+    env["ALLOWED_HOSTS"] = ",".join(filter(None, [env.get("ALLOWED_HOSTS"), HOST]))
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "daphne", "-b", HOST, "-p", str(port)]
+            + ["teamshop.asgi:application"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    try:
+        deadline = time.monotonic() + 30
+        for port in ports:
+            _wait_for_port(port, deadline)
+        yield processes
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def http_json(port, method, path, data=None, connection=None):
+    """
+    Send a JSON request to a local server and return ``(status, body)``.
+    Pass an ``http.client.HTTPConnection`` to reuse a keep-alive connection.
+    """
+    conn = connection or http.client.HTTPConnection(HOST, port, timeout=10)
+    body = json.dumps(data).encode() if data is not None else None
+    headers = {"Content-Type": "application/json"} if body else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    content = response.read()
+    if connection is None:
+        conn.close()
+    return response.status, json.loads(content) if content else None
+
+
+def run_on_scratch_database(command, arguments, **env):
+    """
+    Run ``manage.py <command> --worker <arguments>`` in a child process against
+    a fresh SQLite file, with ``env`` overrides, and return the JSON object it
+    prints last. The worker migrates the file itself.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ, **env, DATABASE_URL=f"sqlite:///{directory}/bench.sqlite3"
+        )
+        output = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), command]
+            + ["--worker", *arguments],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
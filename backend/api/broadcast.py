@@ -0,0 +1,305 @@
+"""
+Transactional outbox for list broadcasts.
+Following SOLID principles - signals and services only publish events, the
+dispatcher alone talks to the channel layer.
+
+Events published inside a transaction are held until it commits and are
+dropped if it rolls back, or if the savepoint they were published in does.
+Events for the same list emitted by one transaction
+are sent as a single ``BATCH`` frame. Each frame is JSON-encoded once, in the
+publishing thread, and travels through the channel layer as text that every
+consumer forwards unchanged. Sending happens on an event loop owned by the
+dispatcher, never in the request thread, unless an async view captures the
+frames with ``capture()`` and awaits ``send_frames()`` itself.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .events import record_event
+from .metrics import group_send_duration
+from .profiling import timed
+
+logger = logging.getLogger(__name__)
+
+
+def list_group_name(list_id):
+    """Return the channel layer group of a shopping list."""
+    return f"list_{list_id}"
+
+
+def encode_frame(messages):
+    """
+    Encode the events of one group into a single pre-rendered frame.
+    Returns the channel layer message handled by ``ListConsumer.list_frame``.
+    """
+    if len(messages) == 1:
+        frame = messages[0]
+    else:
+        frame = {"type": "list_batch", "event": "BATCH", "events": messages}
+    with timed("broadcast"):
+        text = json.dumps(frame, cls=DjangoJSONEncoder)
+    return {"type": "list_frame", "text": text}
+
+
+def _frame(messages, text=None):
+    # ``text``: the JSON of the only message, when its publisher encoded it
+    if text is not None and len(messages) == 1:
+        return {"type": "list_frame", "text": text}
+    return encode_frame(messages)
+
+
+class _PendingBroadcasts:
+    """
+    Events published in the current transaction, grouped by channel group.
+
+    Each event gets its own commit hook, which adds it to the batch; Django
+    drops the hooks of a savepoint that rolls back, and with them its events.
+    The batch is sent by a flush hook kept behind every event hook, and
+    registered under the savepoints all the events share: a rollback that
+    removes the flush hook has removed every event already.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.texts = {}
+        self._sids = None
+        self._flush = None
+
+    def publish(self, connection, group, message, text=None):
+        transaction.on_commit(
+            functools.partial(self.add, group, message, text), using=connection.alias
+        )
+        sids = set(connection.savepoint_ids)
+        self._sids = sids if self._sids is None else self._sids & sids
+
+        def flush():
+            # Earlier flush hooks stay registered; only the latest one sends
+            if self._flush is flush:
+                self.flush()
+
+        self._flush = flush
+        connection.run_on_commit.append((set(self._sids), flush, False))
+
+    def is_scheduled(self, connection):
+        """True if the flush is still waiting for the current transaction."""
+        return any(func is self._flush for _, func, _ in connection.run_on_commit)
+
+    def add(self, group, message, text=None):
+        self.groups.setdefault(group, []).append(message)
+        if text is not None:
+            self.texts[group] = text
+
+    def flush(self):
+        self._flush = None
+        _submit(
+            [
+                (group, _frame(messages, self.texts.get(group)))
+                for group, messages in self.groups.items()
+            ]
+        )
+
+
+class BroadcastDispatcher:
+    """
+    Sends committed events to the channel layer from an asyncio task.
+
+    The task runs on the event loop of the ASGI server as soon as a consumer
+    calls ``attach()``; processes without consumers (management commands, WSGI)
+    get a private background loop instead. It only lives while batches are
+    waiting, so a loop that shuts down has no dispatcher task left pending
+    unless it still had batches to send; ``join()`` waits for those.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._loop = None
+        self._task = None
+        self._pending = 0
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    @property
+    def backlog(self):
+        """Number of submitted batches not sent yet."""
+        return len(self._queue)
+
+    def attach(self):
+        """Run the dispatcher on the running event loop. Call from async code."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is loop:
+                return
+            self._loop = loop
+        # Batches left to the previous loop are sent from this one now
+        loop.call_soon(self._wake)
+
+    def submit(self, batch):
+        """
+        Queue a batch of ``(group, frame)`` pairs built by ``encode_frame``.
+        Safe to call from any thread; returns immediately.
+        """
+        if not batch:
+            return
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self._queue.append(batch)
+        loop = self._ensure_loop()
+        loop.call_soon_threadsafe(self._wake)
+
+    def wait_idle(self, timeout=None):
+        """Block until every submitted batch has been sent. For sync callers."""
+        return self._idle.wait(timeout)
+
+    async def join(self):
+        """
+        Wait until the batches queued for the running loop have been sent.
+        Call before the loop the dispatcher is attached to shuts down.
+        """
+        loop = asyncio.get_running_loop()
+        while self._loop is loop:
+            self._wake()
+            task = self._task
+            if task is None or task.done() or task.get_loop() is not loop:
+                return
+            await task
+
+    async def send(self, group, frame, channel_layer=None):
+        """
+        Send one frame built by ``encode_frame`` to a group, on the running
+        loop. Failures are logged, not raised: the event stays in the log for
+        clients to catch up on.
+        """
+        channel_layer = channel_layer or get_channel_layer()
+        started = time.perf_counter()
+        try:
+            await channel_layer.group_send(group, frame)
+        except Exception:
+            logger.exception("Failed to broadcast to %s", group)
+        group_send_duration.observe(time.perf_counter() - started)
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+        thread = threading.Thread(
+            target=loop.run_forever, name="broadcast-dispatcher", daemon=True
+        )
+        thread.start()
+        return loop
+
+    def _wake(self):
+        # Runs on a loop the dispatcher was attached to, maybe no longer.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop or not self._queue:
+            return
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        channel_layer = get_channel_layer()
+        # Another loop took over through attach(); leave the queue to it.
+        while self._queue and self._loop is loop:
+            batch = self._queue.popleft()
+            for group, frame in batch:
+                await self.send(group, frame, channel_layer)
+            with self._lock:
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.set()
+
+
+dispatcher = BroadcastDispatcher()
+_local = threading.local()
+
+
+def _submit(batch):
+    captured = getattr(_local, "captured", None)
+    if captured is None:
+        with timed("broadcast"):
+            dispatcher.submit(batch)
+    else:
+        captured.extend(batch)
+
+
+@contextmanager
+def capture():
+    """
+    Collect the frames published by this thread instead of queueing them.
+    Yields the list of ``(group, frame)`` pairs, filled as transactions commit;
+    the caller sends them with ``send_frames()``.
+    """
+    previous = getattr(_local, "captured", None)
+    frames = _local.captured = []
+    try:
+        yield frames
+    finally:
+        _local.captured = previous
+
+
+async def send_frames(frames):
+    """Send captured ``(group, frame)`` pairs on the running event loop."""
+    channel_layer = get_channel_layer()
+    with timed("broadcast"):
+        for group, frame in frames:
+            await dispatcher.send(group, frame, channel_layer)
+
+
+def publish(group, message, using=None, text=None):
+    """
+    Broadcast a message to a channel group once the current transaction commits.
+    Outside a transaction the message is queued for sending immediately.
+    ``text`` is the message already encoded as JSON, sent as is when the
+    message is the only one of its group in the transaction.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        _submit([(group, _frame([message], text))])
+        return
+
+    pending = getattr(_local, "pending", {}).get(connection.alias)
+    if pending is None or not pending.is_scheduled(connection):
+        # First event of this transaction, or the previous one rolled back.
+        pending = _PendingBroadcasts()
+        _local.__dict__.setdefault("pending", {})[connection.alias] = pending
+    pending.publish(connection, group, message, text)
+
+
+def publish_to_list(list_id, message):
+    """
+    Broadcast a message to every socket of a shopping list.
+    The message is stamped with the next list revision and kept in the event
+    log; the revision is returned.
+    """
+    with transaction.atomic(savepoint=False):
+        revision = record_event(list_id, message)
+        publish(list_group_name(list_id), message)
+    return revision
+
+
+def publish_encoded(list_id, message):
+    """
+    Like ``publish_to_list``, and also encode the stamped message as JSON.
+    Returns ``(revision, text)``; ``text`` is the frame sent to the sockets
+    unless other events for the list are published in the same transaction,
+    so a write can answer its caller with the very text it broadcast.
+    """
+    with transaction.atomic(savepoint=False):
+        revision = record_event(list_id, message)
+        with timed("broadcast"):
+            text = json.dumps(message, cls=DjangoJSONEncoder)
+        publish(list_group_name(list_id), message, text=text)
+    return revision, text
@@ -0,0 +1,105 @@
+"""
+Read-through cache for serialized shopping list snapshots.
+Following SOLID principles - caching is isolated from views and services.
+
+Snapshots are the rendered JSON bytes of ``GET /api/lists/{list_id}/`` and are
+keyed by the list's primary key and ``revision``. Every write to a list bumps
+its revision in the database (see ``events.record_event``), and readers look
+the revision up on each request, so a snapshot can only be served for the
+revision it was rendered at, whichever process made the write. Writers never
+touch the cache: older snapshots are simply never asked for again and fall out
+of the LRU.
+"""
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ListSnapshotCache:
+    """
+    In-process LRU of list snapshots with an optional shared backend.
+
+    When ``shared_alias`` names an entry of ``settings.CACHES``, payloads are
+    also stored there so that a snapshot rendered by one worker process can be
+    served by the others.
+    """
+
+    def __init__(self, max_entries=512, shared_alias=None, timeout=300):
+        self.max_entries = max_entries
+        self.shared_alias = shared_alias
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Build the cache from ``settings.LIST_SNAPSHOT_CACHE``."""
+        config = getattr(settings, "LIST_SNAPSHOT_CACHE", {})
+        return cls(
+            max_entries=config.get("MAX_ENTRIES", 512),
+            shared_alias=config.get("SHARED_CACHE"),
+            timeout=config.get("TIMEOUT", 300),
+        )
+
+    @property
+    def shared(self):
+        """Return the shared Django cache backend, if one is configured."""
+        if not self.shared_alias:
+            return None
+        return caches[self.shared_alias]
+
+    @staticmethod
+    def _snapshot_key(list_pk, revision):
+        return f"teamshop:list:{list_pk}:snapshot:{revision}"
+
+    def get_local(self, list_pk, revision):
+        """Return the snapshot held by this process, or None. Never does I/O."""
+        with self._lock:
+            entry = self._entries.get(list_pk)
+            if entry is None or entry[0] != revision:
+                return None
+            self._entries.move_to_end(list_pk)
+            return entry[1]
+
+    def get(self, list_pk, revision):
+        """
+        Return the rendered snapshot of a list at ``revision``, or None on a
+        miss; the caller should then store the bytes it renders with ``set``.
+        """
+        payload = self.get_local(list_pk, revision)
+        if payload is not None:
+            return payload
+
+        shared = self.shared
+        if shared is not None:
+            payload = shared.get(self._snapshot_key(list_pk, revision))
+            if payload is not None:
+                self._store_local(list_pk, revision, payload)
+        return payload
+
+    def set(self, list_pk, revision, payload):
+        """Store the rendered snapshot of a list at ``revision``."""
+        self._store_local(list_pk, revision, payload)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._snapshot_key(list_pk, revision), payload, self.timeout)
+
+    def clear(self):
+        """Drop every locally cached snapshot."""
+        with self._lock:
+            self._entries.clear()
+
+    def _store_local(self, list_pk, revision, payload):
+        with self._lock:
+            current = self._entries.get(list_pk)
+            # A slower reader must not replace a newer snapshot with its own.
+            if current is not None and current[0] > revision:
+                return
+            self._entries[list_pk] = (revision, payload)
+            self._entries.move_to_end(list_pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+snapshot_cache = ListSnapshotCache.from_settings()
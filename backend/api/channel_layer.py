@@ -0,0 +1,268 @@
+"""
+Channel layer that spans several server processes without Redis.
+Following SOLID principles - delivery to local sockets stays in memory, only
+the hand-off between processes goes through the database.
+
+Each process keeps its own groups and channel queues, exactly like
+``InMemoryChannelLayer``. Messages for groups, and for channels owned by
+another process, are also written to the ``ChannelLayerMessage`` table. Every
+process polls that table for rows written by others and delivers them to its
+own members. On PostgreSQL, ``LISTEN``/``NOTIFY`` wakes the pollers as soon as
+a row is written; on SQLite they poll every ``poll_interval`` seconds.
+
+Configure it in ``settings.CHANNEL_LAYERS``::
+
+    "BACKEND": "api.channel_layer.DatabaseChannelLayer",
+    "CONFIG": {"capacity": 100, "expiry": 60, "poll_interval": 0.05},
+
+Single-process deployments use ``MemoryChannelLayer``, the in-memory layer
+plus overflow notices and a count of messages dropped at capacity.
+"""
+import asyncio
+import base64
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from asgiref.sync import sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+from django.db import connection, transaction
+from .metrics import channel_messages_dropped
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "teamshop_channel_layer"
+
+# Takes the place of the messages of a full channel
+OVERFLOW = {"type": "channel.overflow"}
+
+
+def _encode(message):
+    def default(value):
+        if isinstance(value, bytes):
+            return {"__bytes__": base64.b64encode(value).decode("ascii")}
+        raise TypeError(f"{type(value).__name__} is not serializable")
+
+    return json.dumps(message, default=default)
+
+
+def _decode(payload):
+    def object_hook(value):
+        if len(value) == 1 and "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        return value
+
+    return json.loads(payload, object_hook=object_hook)
+
+
+class MemoryChannelLayer(InMemoryChannelLayer):
+    """
+    ``InMemoryChannelLayer`` that does not drop messages silently: when a
+    channel is at capacity, its backlog is replaced by a single
+    ``channel.overflow`` message, so its consumer knows it missed events, and
+    the dropped messages are counted.
+    """
+
+    async def send(self, channel, message):
+        try:
+            await super().send(channel, message)
+        except ChannelFull:
+            self._overflow(channel)
+            raise
+
+    def _overflow(self, channel):
+        queue = self.channels[channel]
+        dropped = 1
+        while not queue.empty():
+            _, message = queue.get_nowait()
+            dropped += message["type"] != OVERFLOW["type"]
+        channel_messages_dropped.inc(dropped)
+        queue.put_nowait((time.time() + self.expiry, dict(OVERFLOW)))
+
+
+class DatabaseChannelLayer(MemoryChannelLayer):
+    """
+    ``InMemoryChannelLayer`` whose groups and specific channels reach every
+    process sharing the same database.
+    """
+
+    extensions = ["groups", "flush"]
+
+    # Rows below the highest ID already seen that are still re-read, so that
+    # rows committed out of ID order (concurrent writers on PostgreSQL) are
+    # not skipped.
+    LOOKBACK = 200
+
+    def __init__(self, poll_interval=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.poll_interval = poll_interval
+        self.process_id = secrets.token_hex(6)
+        self._loop = None
+        self._wakeup = None
+        self._last_id = None
+        self._seen = set()
+        self._last_prune = 0.0
+
+    # Channel layer API
+
+    async def new_channel(self, prefix="specific."):
+        """Return a channel name owned by this process."""
+        self._ensure_poller()
+        return f"{prefix}.{self.process_id}!{secrets.token_hex(6)}"
+
+    async def send(self, channel, message):
+        """Send to a local channel directly, or hand it to its owning process."""
+        if self._is_local(channel):
+            return await super().send(channel, message)
+        self.require_valid_channel_name(channel)
+        await self._write(channel=channel, message=message)
+
+    async def receive(self, channel):
+        self._ensure_poller()
+        return await super().receive(channel)
+
+    async def group_add(self, group, channel):
+        self._ensure_poller()
+        await super().group_add(group, channel)
+
+    async def group_send(self, group, message):
+        """Deliver to local members now and to other processes via the table."""
+        await self._deliver_group(group, message)
+        await self._write(group=group, message=message)
+
+    async def flush(self):
+        await super().flush()
+        await sync_to_async(self._delete_all, thread_sensitive=False)()
+
+    # Local delivery
+
+    def _is_local(self, channel):
+        return "!" in channel and channel.split("!", 1)[0].endswith(
+            "." + self.process_id
+        )
+
+    async def _deliver_group(self, group, message):
+        self.require_valid_group_name(group)
+        self._clean_expired()
+        for channel in list(self.groups.get(group, {})):
+            try:
+                await super().send(channel, message)
+            except ChannelFull:
+                # Counted in channel_messages_dropped by MemoryChannelLayer
+                pass
+
+    async def _deliver(self, row_group, row_channel, payload):
+        message = _decode(payload)
+        if row_group:
+            await self._deliver_group(row_group, message)
+        elif self._is_local(row_channel):
+            try:
+                await super().send(row_channel, message)
+            except ChannelFull:
+                pass
+
+    # Database hand-off
+
+    async def _write(self, group="", channel="", message=None):
+        await sync_to_async(self._insert, thread_sensitive=False)(
+            group, channel, _encode(message)
+        )
+
+    def _insert(self, group, channel, payload):
+        from .models import ChannelLayerMessage
+
+        with transaction.atomic():
+            ChannelLayerMessage.objects.create(
+                group=group,
+                channel=channel,
+                origin=self.process_id,
+                payload=payload,
+                expires_at=time.time() + self.expiry,
+            )
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, '')", [NOTIFY_CHANNEL])
+
+    def _fetch(self):
+        from .models import ChannelLayerMessage
+
+        messages = ChannelLayerMessage.objects.order_by("id")
+        if self._last_id is None:
+            self._last_id = messages.values_list("id", flat=True).last() or 0
+            return []
+
+        now = time.time()
+        rows = list(
+            messages.filter(id__gt=self._last_id - self.LOOKBACK, expires_at__gt=now)
+            .exclude(origin=self.process_id)
+            .values_list("id", "group", "channel", "payload")
+        )
+        fresh = [row for row in rows if row[0] not in self._seen]
+        for row in fresh:
+            self._seen.add(row[0])
+        if rows:
+            self._last_id = max(self._last_id, rows[-1][0])
+        self._seen = {i for i in self._seen if i > self._last_id - self.LOOKBACK}
+
+        if now - self._last_prune > self.expiry:
+            self._last_prune = now
+            ChannelLayerMessage.objects.filter(expires_at__lt=now).delete()
+        return fresh
+
+    def _delete_all(self):
+        from .models import ChannelLayerMessage
+
+        ChannelLayerMessage.objects.all().delete()
+
+    # Polling
+
+    def _ensure_poller(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        loop.create_task(self._poll(loop))
+        if connection.vendor == "postgresql":
+            threading.Thread(
+                target=self._listen,
+                args=(loop,),
+                name="channel-layer-listen",
+                daemon=True,
+            ).start()
+
+    async def _poll(self, loop):
+        fetch = sync_to_async(self._fetch, thread_sensitive=False)
+        interval = self.poll_interval
+        if connection.vendor == "postgresql":
+            # NOTIFY wakes us up; polling only covers missed notifications.
+            interval = max(interval, 1.0)
+        while self._loop is loop:
+            try:
+                for _, group, channel, payload in await fetch():
+                    await self._deliver(group, channel, payload)
+            except Exception:
+                logger.exception("Channel layer poll failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _listen(self, loop):
+        """Wake the poller on PostgreSQL notifications. Runs in its own thread."""
+        conn = connection.get_new_connection(connection.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        while self._loop is loop and not loop.is_closed():
+            if select.select([conn], [], [], 5.0) == ([], [], []):
+                continue
+            conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                loop.call_soon_threadsafe(self._wakeup.set)
+        conn.close()
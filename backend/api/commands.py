@@ -0,0 +1,234 @@
+"""
+WebSocket command protocol for list mutations.
+Following SOLID principles - commands only translate socket messages into
+calls to the same services used by the HTTP views.
+
+A client sends ``{"action": "...", "request_id": "...", ...}`` and receives an
+``ACK`` carrying the same ``request_id``. The usual ``ITEM_*`` / ``LIST_RESET``
+/ ``PSEUDO_RENAMED`` events are still broadcast to every socket of the list.
+"""
+import logging
+from django.http import Http404
+from .models import Item
+from .fast_serializers import item_data
+from .services import (
+    ShoppingListService,
+    ItemService,
+    ConflictError,
+    MAX_BATCH_OPERATIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CommandError(Exception):
+    """A command was rejected; ``status`` mirrors the HTTP status of the view."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _get_item(list_id, payload):
+    """Fetch an item of the list, never one belonging to another list."""
+    try:
+        return Item.objects.select_related("shopping_list").get(
+            id=payload.get("item_id"), shopping_list__list_id=list_id
+        )
+    except (Item.DoesNotExist, ValueError, TypeError):
+        raise CommandError("Article introuvable", status=404)
+
+
+def _expected_version(payload):
+    """Return the client's ``version`` for optimistic updates, if it sent one."""
+    version = payload.get("version")
+    return version if isinstance(version, int) else None
+
+
+def _ensure_unlocked(item, current_pseudo):
+    if ItemService.is_locked_for(item, current_pseudo):
+        raise CommandError(
+            "Cet article est verrouillé par un autre utilisateur", status=403
+        )
+
+
+def add_item(list_id, payload):
+    """Add an item. Payload: ``{"name": "..."}``."""
+    name = payload.get("name")
+    if not ItemService.is_valid_name(name):
+        raise CommandError("Le nom de l'article est requis")
+    shopping_list = ShoppingListService.get_list_by_id(list_id)
+    item = ItemService.create_item(shopping_list, name)
+    return item_data(item)
+
+
+def claim(list_id, payload):
+    """Claim a pending item. Payload: ``{"item_id": 1, "pseudo": "..."}``."""
+    item = _get_item(list_id, payload)
+    pseudo = payload.get("pseudo")
+    if not pseudo:
+        raise CommandError("Le pseudo est requis")
+    try:
+        item = ItemService.claim_item(item, pseudo)
+    except ValueError as e:
+        raise CommandError(str(e), status=403)
+    except ConflictError as e:
+        raise CommandError(str(e), status=409)
+    return item_data(item)
+
+
+def unclaim(list_id, payload):
+    """Release a claimed item. Payload: ``{"item_id": 1, "pseudo": "..."}``."""
+    item = _get_item(list_id, payload)
+    try:
+        item = ItemService.unclaim_item(item, payload.get("pseudo"))
+    except ValueError as e:
+        raise CommandError(str(e), status=403)
+    except ConflictError as e:
+        raise CommandError(str(e), status=409)
+    return item_data(item)
+
+
+def validate(list_id, payload):
+    """Mark a claimed item as bought. Payload: ``{"item_id": 1, "pseudo": "..."}``."""
+    item = _get_item(list_id, payload)
+    try:
+        item = ItemService.validate_item(item, payload.get("pseudo"))
+    except ValueError as e:
+        raise CommandError(str(e), status=403)
+    except ConflictError as e:
+        raise CommandError(str(e), status=409)
+    return item_data(item)
+
+
+def update(list_id, payload):
+    """
+    Update an item, like ``PATCH /api/items/{item_id}/``.
+    Payload: ``{"item_id": 1, "current_pseudo": "...", "name": "...", ...}``,
+    optionally with the ``version`` the client last saw.
+    """
+    item = _get_item(list_id, payload)
+    _ensure_unlocked(item, payload.get("current_pseudo"))
+    allowed_fields = ["name", "status", "claimed_by"]
+    update_data = {
+        key: value for key, value in payload.items() if key in allowed_fields
+    }
+    if "name" in update_data and not ItemService.is_valid_name(update_data["name"]):
+        raise CommandError("Le nom de l'article est requis")
+    try:
+        item = ItemService.update_item(
+            item, expected_version=_expected_version(payload), **update_data
+        )
+    except ConflictError as e:
+        raise CommandError(str(e), status=409)
+    return item_data(item)
+
+
+def delete(list_id, payload):
+    """Delete an item. Payload: ``{"item_id": 1, "current_pseudo": "..."}``."""
+    item = _get_item(list_id, payload)
+    _ensure_unlocked(item, payload.get("current_pseudo"))
+    item_id = item.id
+    ItemService.delete_item(item)
+    return {"item_id": item_id}
+
+
+def reset(list_id, payload):
+    """Reset the list after shopping."""
+    shopping_list = ShoppingListService.get_list_by_id(list_id)
+    payload, _ = ShoppingListService.reset_list(shopping_list)
+    return payload
+
+
+def rename_pseudo(list_id, payload):
+    """Rename a pseudo. Payload: ``{"old_pseudo": "...", "new_pseudo": "..."}``."""
+    old_pseudo = payload.get("old_pseudo")
+    new_pseudo = payload.get("new_pseudo")
+    if not old_pseudo or not new_pseudo:
+        raise CommandError("Les pseudos ancien et nouveau sont requis")
+    if old_pseudo == new_pseudo:
+        raise CommandError("Le nouveau pseudo doit être différent de l'ancien")
+    shopping_list = ShoppingListService.get_list_by_id(list_id)
+    try:
+        updated_count = ShoppingListService.rename_pseudo(
+            shopping_list, old_pseudo, new_pseudo
+        )
+    except ValueError as e:
+        raise CommandError(str(e))
+    return {
+        "old_pseudo": old_pseudo,
+        "new_pseudo": new_pseudo,
+        "updated_items": updated_count,
+    }
+
+
+def batch(list_id, payload):
+    """
+    Apply several operations at once, like ``POST .../items/batch/``.
+    Payload: ``{"operations": [{"op": "add", "name": "..."}, ...]}``.
+    """
+    operations = payload.get("operations")
+    if not isinstance(operations, list) or not operations:
+        raise CommandError("La liste des opérations est requise")
+    if len(operations) > MAX_BATCH_OPERATIONS or not all(
+        isinstance(op, dict) for op in operations
+    ):
+        raise CommandError("Opérations invalides ou trop nombreuses")
+    shopping_list = ShoppingListService.get_list_by_id(list_id)
+    return ItemService.apply_batch(shopping_list, operations)
+
+
+def resume(list_id, payload):
+    """
+    Catch up after a reconnect. Payload: ``{"since": 12}``.
+    Returns the missed events, or a snapshot when the gap is too large.
+    """
+    try:
+        since = int(payload.get("since"))
+    except (TypeError, ValueError):
+        raise CommandError("Le paramètre since est requis")
+    return ShoppingListService.get_changes(list_id, since)
+
+
+COMMANDS = {
+    "add_item": add_item,
+    "claim": claim,
+    "unclaim": unclaim,
+    "validate": validate,
+    "update": update,
+    "delete": delete,
+    "reset": reset,
+    "rename_pseudo": rename_pseudo,
+    "batch": batch,
+    "resume": resume,
+}
+
+
+def execute_command(list_id, message):
+    """
+    Run one command message and build its ACK.
+    Never raises: client errors are reported in the ACK, and unexpected
+    failures are logged and answered with status 500, like the HTTP views.
+    """
+    request_id = message.get("request_id")
+    action = message.get("action")
+    ack = {"event": "ACK", "request_id": request_id, "action": action}
+
+    handler = COMMANDS.get(action)
+    if handler is None:
+        ack.update(ok=False, status=400, error=f"Action inconnue : {action}")
+        return ack
+
+    try:
+        data = handler(list_id, message)
+    except CommandError as e:
+        ack.update(ok=False, status=e.status, error=e.message)
+    except Http404:
+        ack.update(ok=False, status=404, error="Liste introuvable")
+    except Exception:
+        logger.exception("Command %s failed", action)
+        ack.update(ok=False, status=500, error="Erreur interne du serveur")
+    else:
+        ack.update(ok=True, data=data)
+    return ack
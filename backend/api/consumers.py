@@ -2,54 +2,190 @@
 WebSocket consumers for real-time list synchronization.
 Following SOLID principles - focused consumer handling list events.
 """
+import asyncio
 import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from .broadcast import dispatcher, list_group_name
+from .commands import execute_command
+from .metrics import (
+    websocket_connections,
+    websocket_evictions,
+    websocket_frames_dropped,
+)
+from .retention import touch_due, touch_list
+from . import admission, wire
+
+# Close code of each eviction reason
+EVICTION_CODES = {
+    "slow": admission.CLOSE_SLOW,
+    "overflow": admission.CLOSE_SLOW,
+    "idle": admission.CLOSE_IDLE,
+}
 
 
 class ListConsumer(AsyncWebsocketConsumer):
     """
     Consumer for handling real-time updates to shopping lists.
     Each connection joins a group specific to the list_id.
+    Clients may negotiate the compact binary format of ``api.wire`` through
+    the WebSocket subprotocol; JSON text frames are the default.
+    Admission, send queue and idle limits are described in ``api.admission``.
     """
 
+    # Whether this socket is included in the open connections gauge
+    counted = False
+    # Whether this socket uses the binary MessagePack format
+    binary = False
+    # Whether this socket was counted by the connection limiter
+    admitted = False
+    # Whether the server is closing this socket; frames are no longer sent
+    closing = False
+    outbox = None
+    tasks = ()
+
     async def connect(self):
         """Accept WebSocket connection and join list group."""
         self.list_id = self.scope["url_route"]["kwargs"]["list_id"]
-        self.room_group_name = f"list_{self.list_id}"
+        self.room_group_name = list_group_name(self.list_id)
+        self.limits = admission.get_config()
+
+        subprotocol = wire.negotiate(self.scope.get("subprotocols"))
+        self.binary = subprotocol == wire.MSGPACK_PROTOCOL
+        retry_after = admission.limiter.admit(self.room_group_name, self.limits)
+        if retry_after is not None:
+            # Accept first: a socket refused during the handshake tells the
+            # browser nothing, a close code carries the delay.
+            self.closing = True
+            await self.accept(subprotocol=subprotocol)
+            await self.close(
+                code=admission.CLOSE_TRY_AGAIN, reason=f"retry-after={retry_after}"
+            )
+            return
+        self.admitted = True
+
+        # Broadcasts are sent from this server's event loop
+        dispatcher.attach()
 
         # Join room group
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
 
-        await self.accept()
+        await self.accept(subprotocol=subprotocol)
+        websocket_connections.inc()
+        self.counted = True
+        self.outbox = asyncio.Queue(maxsize=self.limits["SEND_QUEUE"])
+        self.last_seen = asyncio.get_running_loop().time()
+        self.tasks = [
+            asyncio.create_task(self.drain_outbox()),
+            asyncio.create_task(self.heartbeat()),
+        ]
+        if touch_due(self.list_id):
+            await database_sync_to_async(touch_list)(self.list_id)
 
     async def disconnect(self, close_code):
         """Leave list group on disconnect."""
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        for task in self.tasks:
+            task.cancel()
+        if self.counted:
+            websocket_connections.dec()
+        if self.admitted:
+            admission.limiter.release(self.room_group_name)
+            await self.channel_layer.group_discard(
+                self.room_group_name, self.channel_name
+            )
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
-        Receive message from WebSocket.
-        Currently not used, but available for future features.
+        Receive a command from the WebSocket and reply with an ACK.
+        See ``api.commands`` for the message format.
         """
-        pass
+        self.last_seen = asyncio.get_running_loop().time()
+        binary = self.binary and bytes_data is not None
+        try:
+            if binary:
+                message = wire.expand(wire.unpack(bytes_data))
+            else:
+                message = json.loads(text_data if text_data is not None else bytes_data)
+        except (TypeError, ValueError):
+            message = None
+        if not isinstance(message, dict):
+            error = "MessagePack invalide" if binary else "JSON invalide"
+            ack = {"event": "ACK", "ok": False, "status": 400, "error": error}
+            await self.send_event(ack)
+            return
+        if message.get("action") == "pong":
+            return
 
-    # Event handlers for broadcasting
-    async def item_added(self, event):
-        """Send item_added event to WebSocket."""
-        await self.send(text_data=json.dumps(event))
+        ack = await self.run_command(message)
+        await self.send_event(ack)
+
+    async def run_command(self, message):
+        """Execute a command in a worker thread and return its ACK."""
+        return await database_sync_to_async(self.execute)(message)
 
-    async def item_updated(self, event):
-        """Send item_updated event to WebSocket."""
-        await self.send(text_data=json.dumps(event))
+    def execute(self, message):
+        return execute_command(self.list_id, message)
 
-    async def item_deleted(self, event):
-        """Send item_deleted event to WebSocket."""
-        await self.send(text_data=json.dumps(event))
+    async def send_event(self, event):
+        """Send an event in the format negotiated by this socket."""
+        if self.binary:
+            await self.enqueue(bytes_data=wire.pack(wire.compact(event)))
+        else:
+            await self.enqueue(text_data=json.dumps(event))
 
-    async def list_reset(self, event):
-        """Send list_reset event to WebSocket."""
-        await self.send(text_data=json.dumps(event))
+    async def enqueue(self, **frame):
+        """Queue a frame for sending; a full queue means a slow consumer."""
+        if self.closing or self.outbox is None:
+            websocket_frames_dropped.inc()
+            return
+        try:
+            self.outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            websocket_frames_dropped.inc()
+            await self.evict("slow")
+
+    async def drain_outbox(self):
+        """Send queued frames in order, evicting the socket if one stalls."""
+        while True:
+            frame = await self.outbox.get()
+            try:
+                await asyncio.wait_for(self.send(**frame), self.limits["SEND_TIMEOUT"])
+            except asyncio.TimeoutError:
+                await self.evict("slow")
+                return
+
+    async def heartbeat(self):
+        """Ping the client regularly and close the socket once it falls silent."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.limits["PING_INTERVAL"])
+            if loop.time() - self.last_seen > self.limits["IDLE_TIMEOUT"]:
+                await self.evict("idle")
+                return
+            await self.send_event(admission.PING)
+
+    async def evict(self, reason):
+        """Close the socket from the server side, dropping its queued frames."""
+        if self.closing:
+            return
+        self.closing = True
+        websocket_evictions.inc(label=reason)
+        if self.outbox.qsize():
+            websocket_frames_dropped.inc(self.outbox.qsize())
+        current = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current:
+                task.cancel()
+        await self.close(code=EVICTION_CODES[reason], reason=reason)
+
+    # Event handlers for broadcasting
+    async def list_frame(self, event):
+        """Forward a frame that was JSON-encoded once by the publisher."""
+        if self.binary:
+            await self.enqueue(bytes_data=wire.binary_frame(event["text"]))
+        else:
+            await self.enqueue(text_data=event["text"])
 
-    async def pseudo_renamed(self, event):
-        """Send pseudo_renamed event to WebSocket."""
-        await self.send(text_data=json.dumps(event))
+    async def channel_overflow(self, event):
+        """The channel layer dropped messages for this socket: make it reload."""
+        await self.evict("overflow")
@@ -0,0 +1,113 @@
+"""
+Synthetic shopping lists for benchmarks and manual testing.
+Following SOLID principles - data generation is shared by the commands.
+
+Items are written with ``bulk_create``, so no signals fire and nothing is
+broadcast; their names are counted for autocomplete all at once. Statuses and
+pseudos are consistent with what the app produces: claimed and bought items
+always have a ``claimed_by``, pending items never do.
+"""
+import random
+from .models import ShoppingList, Item
+from .suggest import record_names
+
+PRODUCTS = [
+    "Lait",
+    "Pain",
+    "Beurre",
+    "Oeufs",
+    "Farine",
+    "Sucre",
+    "Sel",
+    "Poivre",
+    "Riz",
+    "Pâtes",
+    "Tomates",
+    "Pommes",
+    "Bananes",
+    "Carottes",
+    "Oignons",
+    "Ail",
+    "Courgettes",
+    "Salade",
+    "Fromage",
+    "Yaourts",
+    "Jambon",
+    "Poulet",
+    "Café",
+    "Thé",
+    "Chocolat",
+    "Confiture",
+    "Huile d'olive",
+    "Vinaigre",
+    "Moutarde",
+    "Lessive",
+    "Éponges",
+    "Papier toilette",
+    "Dentifrice",
+    "Savon",
+    "Eau gazeuse",
+    "Jus d'orange",
+    "Céréales",
+    "Biscuits",
+]
+QUALIFIERS = ["", "bio", "x2", "x6", "grand format", "sans sucre", "frais", "surgelé"]
+PSEUDOS = [
+    "Alice",
+    "Bob",
+    "Chloé",
+    "David",
+    "Emma",
+    "Farid",
+    "Gabriel",
+    "Hugo",
+    "Inès",
+    "Jules",
+    "Karim",
+    "Léa",
+    "Manon",
+    "Nina",
+    "Oscar",
+    "Paul",
+]
+
+# Default share of each status among generated items
+STATUS_WEIGHTS = {"pending": 0.6, "claimed": 0.25, "bought": 0.15}
+
+
+def pseudo_pool(count, rng=random):
+    """Return ``count`` distinct pseudos."""
+    base = list(PSEUDOS)
+    rng.shuffle(base)
+    return [
+        base[n % len(base)] + ("" if n < len(base) else str(n // len(base)))
+        for n in range(count)
+    ]
+
+
+def item_name(rng=random):
+    """Return a plausible item name such as ``"Tomates bio"``."""
+    return f"{rng.choice(PRODUCTS)} {rng.choice(QUALIFIERS)}".strip()
+
+
+def build_items(shopping_list, size, pseudos, rng=random, weights=STATUS_WEIGHTS):
+    """Return ``size`` unsaved items for a list, with mixed statuses."""
+    statuses = rng.choices(list(weights), weights=list(weights.values()), k=size)
+    return [
+        Item(
+            shopping_list=shopping_list,
+            name=item_name(rng),
+            status=status,
+            claimed_by=None if status == "pending" else rng.choice(pseudos),
+        )
+        for status in statuses
+    ]
+
+
+def generate_list(size, pseudos, rng=random, weights=STATUS_WEIGHTS):
+    """Create a list with ``size`` items and return it."""
+    shopping_list = ShoppingList.objects.create()
+    items = build_items(shopping_list, size, pseudos, rng, weights)
+    Item.objects.bulk_create(items, batch_size=1000)
+    record_names(shopping_list.pk, shopping_list.list_id, [i.name for i in items])
+    return shopping_list
@@ -0,0 +1,98 @@
+"""
+Strong ETags for shopping list snapshots.
+Following SOLID principles - validators are derived from list revisions only.
+
+A list's ETag is built from its ``list_id`` and ``revision``. Every item save,
+delete, reset and rename goes through ``events.record_event``, which bumps the
+revision in the same transaction, so the tag changes exactly when the
+snapshot does. ``GET /api/lists/{list_id}/`` answers a matching
+``If-None-Match`` with 304, and mutating views decorated with ``sets_etag``
+return the list's new tag.
+"""
+import functools
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+# Revisions recorded while a view decorated with ``sets_etag`` runs
+_revisions = ContextVar("list_revisions", default=None)
+
+
+def list_etag(list_id, revision):
+    """Return the quoted ETag of a list at ``revision``."""
+    return f'"{list_id}-{revision}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if an ``If-None-Match`` header value matches ``etag``.
+    Uses the weak comparison RFC 9110 requires for this header.
+    """
+    if not if_none_match:
+        return False
+    return any(
+        tag == "*" or tag.removeprefix("W/") == etag
+        for tag in parse_etags(if_none_match)
+    )
+
+
+def snapshot_response(etag, payload):
+    """
+    Response for a list snapshot from ``get_list_snapshot``: the JSON payload,
+    or 304 when it is None. Caches must revalidate before reuse.
+    """
+    if payload is None:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def note_revision(list_id, revision):
+    """Remember the latest revision of a list for the running view, if any."""
+    revisions = _revisions.get()
+    if revisions is not None:
+        revisions[list_id] = revision
+
+
+def _apply(response, revisions):
+    # Only a single-list write has an unambiguous tag to return.
+    if 200 <= response.status_code < 300 and len(revisions) == 1:
+        ((list_id, revision),) = revisions.items()
+        response["ETag"] = list_etag(list_id, revision)
+    return response
+
+
+def sets_etag(view):
+    """
+    Decorate a mutating view so a successful response carries the new ETag of
+    the list it changed. Works for sync and async views.
+    """
+    if iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            revisions = {}
+            token = _revisions.set(revisions)
+            try:
+                response = await view(*args, **kwargs)
+            finally:
+                _revisions.reset(token)
+            return _apply(response, revisions)
+
+    else:
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            revisions = {}
+            token = _revisions.set(revisions)
+            try:
+                response = view(*args, **kwargs)
+            finally:
+                _revisions.reset(token)
+            return _apply(response, revisions)
+
+    return wrapper
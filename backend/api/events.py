@@ -0,0 +1,77 @@
+"""
+Per-list revisions and the bounded event log used for delta resync.
+Following SOLID principles - ordering and catch-up live apart from fan-out.
+
+Every broadcast increments ``ShoppingList.revision`` and is stored as a
+``ListEvent``. A client that knows the revision it last applied can ask for
+the events it missed; when they are no longer in the log it gets a full
+snapshot instead.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .etags import note_revision
+from .models import ShoppingList, ListEvent
+
+
+def _log_config():
+    config = getattr(settings, "LIST_EVENT_LOG", {})
+    return config.get("MAX_EVENTS", 200), config.get("PRUNE_EVERY", 20)
+
+
+def record_event(list_id, message):
+    """
+    Assign the next revision of a list to ``message`` and append it to the log.
+    The revision is also written into ``message["revision"]``.
+    Returns the revision, or None if the list no longer exists.
+    """
+    max_events, prune_every = _log_config()
+    lists = ShoppingList.objects.filter(list_id=list_id)
+
+    # No savepoint: callers already run inside the transaction of their write.
+    with transaction.atomic(savepoint=False):
+        if not lists.update(revision=F("revision") + 1, last_active_at=timezone.now()):
+            return None
+        list_pk, revision = lists.values_list("id", "revision").get()
+        message["revision"] = revision
+        ListEvent.objects.create(
+            shopping_list_id=list_pk, revision=revision, payload=message
+        )
+        if revision % prune_every == 0:
+            ListEvent.objects.filter(
+                shopping_list_id=list_pk, revision__lte=revision - max_events
+            ).delete()
+    note_revision(list_id, revision)
+    return revision
+
+
+def get_changes(list_id, since):
+    """
+    Return what a client at revision ``since`` needs to catch up.
+    Either ``{"revision": R, "events": [...]}`` with the missed events in order,
+    or ``{"revision": R, "snapshot": {...}}`` when the gap is no longer in the
+    log. Raises ShoppingList.DoesNotExist if the list does not exist.
+    """
+    from .fast_serializers import list_data
+
+    max_events, _ = _log_config()
+    list_pk, revision = ShoppingList.objects.values_list("id", "revision").get(
+        list_id=list_id
+    )
+    if since == revision:
+        return {"revision": revision, "events": []}
+
+    if 0 <= since < revision and revision - since <= max_events:
+        events = list(
+            ListEvent.objects.filter(
+                shopping_list_id=list_pk, revision__gt=since
+            ).values_list("payload", flat=True)
+        )
+        # Only a contiguous run of events is a valid delta.
+        if events and events[0]["revision"] == since + 1:
+            return {"revision": events[-1]["revision"], "events": events}
+
+    shopping_list = ShoppingList.objects.get(pk=list_pk)
+    snapshot = list_data(shopping_list)
+    return {"revision": snapshot["revision"], "snapshot": snapshot}
@@ -0,0 +1,137 @@
+"""
+Allocation of unique 6-character list codes.
+Following SOLID principles - uniqueness is guaranteed here, not by retrying
+random draws against the database.
+
+A code is a keyed permutation of a counter: counter values are unique, and a
+permutation maps distinct values to distinct codes, so codes never collide
+however full the table gets. The permutation is a Feistel network over the
+36^6 possible codes (two halves of 36^3), keyed with ``settings.LIST_IDS["KEY"]``
+or a key derived from ``SECRET_KEY``, so consecutive lists get unrelated codes
+that cannot be predicted without the key.
+
+Each process reserves ``BLOCK_SIZE`` counter values at a time with one UPDATE,
+so creating a list costs a single INSERT whatever the table size. The counter
+starts at a random offset drawn with ``secrets`` when its row is created.
+Codes minted before this allocator can still be taken;
+``ShoppingListService.create_list`` then discards the block and retries. The
+reservation must not share a transaction with the INSERT of the list: rolling
+back the failed INSERT would roll the counter back too, and the retry would
+reserve, and collide in, the very same block.
+"""
+import hashlib
+import secrets
+import string
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+HALF = len(ALPHABET) ** (CODE_LENGTH // 2)
+SPACE = HALF * HALF
+
+DEFAULTS = {"KEY": None, "BLOCK_SIZE": 1000, "ROUNDS": 6}
+
+
+def get_config():
+    """Return ``settings.LIST_IDS`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "LIST_IDS", {})}
+
+
+def derive_key(config):
+    """The permutation key: the configured one, or one derived from SECRET_KEY."""
+    secret = config["KEY"] or settings.SECRET_KEY
+    return hashlib.blake2b(
+        secret.encode(), digest_size=32, person=b"teamshop-list-id"
+    ).digest()
+
+
+class FeistelPermutation:
+    """A keyed bijection of ``range(SPACE)``."""
+
+    def __init__(self, key, rounds=6):
+        self._rounds = [
+            hashlib.blake2b(key=key, digest_size=8, person=bytes([index]))
+            for index in range(rounds)
+        ]
+
+    def _f(self, index, value):
+        h = self._rounds[index].copy()
+        h.update(value.to_bytes(4, "big"))
+        return int.from_bytes(h.digest(), "big") % HALF
+
+    def permute(self, number):
+        left, right = divmod(number, HALF)
+        for index in range(len(self._rounds)):
+            left, right = right, (left + self._f(index, right)) % HALF
+        return left * HALF + right
+
+    def invert(self, number):
+        left, right = divmod(number, HALF)
+        for index in reversed(range(len(self._rounds))):
+            left, right = (right - self._f(index, left)) % HALF, left
+        return left * HALF + right
+
+
+def encode(number):
+    """Write a number below SPACE as a fixed-length code."""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, digit = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def random_code():
+    """A uniformly random code, from the ``secrets`` CSPRNG."""
+    return "".join(secrets.choice(ALPHABET) for _ in range(CODE_LENGTH))
+
+
+class ListCodeAllocator:
+    """Hands out codes from counter blocks reserved in the database."""
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._permutation = None
+        self._next = self._end = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def next_code(self):
+        """Return a code no other allocator, in any process, will return."""
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve()
+            number = (self._offset + self._next) % SPACE
+            self._next += 1
+        return encode(self._permutation.permute(number))
+
+    def discard_block(self):
+        """Drop the rest of the current block; the next code reserves a new one."""
+        with self._lock:
+            self._next = self._end
+
+    def _reserve(self):
+        from .models import ListCodeCounter
+
+        size = self.config["BLOCK_SIZE"]
+        counter = ListCodeCounter.objects.filter(pk=1)
+        with transaction.atomic():
+            if not counter.update(value=F("value") + size):
+                ListCodeCounter.objects.get_or_create(
+                    pk=1, defaults={"offset": secrets.randbelow(SPACE)}
+                )
+                counter.update(value=F("value") + size)
+            end, self._offset = counter.values_list("value", "offset").get()
+        if end > SPACE:
+            raise RuntimeError("Every list code has been allocated")
+        self._next, self._end = end - size, end
+        if self._permutation is None:
+            self._permutation = FeistelPermutation(
+                derive_key(self.config), self.config["ROUNDS"]
+            )
+
+
+allocator = ListCodeAllocator()
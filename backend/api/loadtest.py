@@ -0,0 +1,189 @@
+"""
+WebSocket fan-out load test for ``ListConsumer``.
+Following SOLID principles - one scenario, two interchangeable transports.
+
+The scenario opens ``subscribers`` sockets on each of ``lists`` lists, adds
+``mutations`` items to every list through the HTTP API and records when each
+socket receives each ``ITEM_ADDED``. ``CommunicatorTransport`` drives
+``teamshop.asgi.application`` in-process with the ``channels.testing``
+communicators; ``DaphneTransport`` talks to a daphne process over real
+sockets. Both run offline on one Linux machine.
+"""
+import asyncio
+import gc
+import json
+import os
+import time
+from channels.testing import HttpCommunicator, WebsocketCommunicator
+from .bench import HOST, http_json, summarize
+from .wsclient import connect
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_bytes(pid="self"):
+    """Resident set size of a process, from ``/proc`` (Linux only)."""
+    with open(f"/proc/{pid}/statm") as statm:
+        return int(statm.read().split()[1]) * _PAGE_SIZE
+
+
+class CommunicatorTransport:
+    """
+    Runs the ASGI application in this process. Memory figures include the
+    client side of each socket, since both live in the same process.
+    """
+
+    name = "communicator"
+    headers = [(b"host", b"localhost"), (b"origin", b"http://localhost")]
+
+    def __init__(self):
+        from teamshop.asgi import application
+
+        self.application = application
+
+    async def connect(self, list_id):
+        communicator = WebsocketCommunicator(
+            self.application, f"/ws/lists/{list_id}/", headers=self.headers
+        )
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise ConnectionError(f"WebSocket refused for list {list_id}")
+        return communicator
+
+    async def recv(self, socket, timeout):
+        # On timeout the communicator cancels the consumer; only the last
+        # receive of a socket ever times out.
+        return await socket.receive_from(timeout)
+
+    async def close(self, socket):
+        if not socket.future.done():
+            await socket.disconnect()
+
+    async def post(self, path, data):
+        body = json.dumps(data).encode()
+        communicator = HttpCommunicator(
+            self.application,
+            "POST",
+            path,
+            body=body,
+            headers=self.headers
+            + [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        )
+        response = await communicator.get_response(timeout=30)
+        return response["status"], json.loads(response["body"])
+
+    def server_rss(self):
+        return rss_bytes()
+
+
+class DaphneTransport:
+    """Talks to an already running daphne process over TCP."""
+
+    name = "daphne"
+
+    def __init__(self, port, pid):
+        self.port = port
+        self.pid = pid
+
+    async def connect(self, list_id):
+        return await connect(HOST, self.port, f"/ws/lists/{list_id}/")
+
+    async def recv(self, socket, timeout):
+        return await asyncio.wait_for(socket.recv(), timeout)
+
+    async def close(self, socket):
+        await socket.close()
+
+    async def post(self, path, data):
+        return await asyncio.to_thread(http_json, self.port, "POST", path, data)
+
+    def server_rss(self):
+        return rss_bytes(self.pid)
+
+
+async def _collect(transport, socket, expected, seen, timeout):
+    """Record arrival times of ``expected`` item names until idle for ``timeout``."""
+    while expected - seen.keys():
+        try:
+            text = await transport.recv(socket, timeout)
+        except asyncio.TimeoutError:
+            return
+        data = json.loads(text)
+        events = data["events"] if data.get("event") == "BATCH" else [data]
+        for event in events:
+            if event.get("event") == "ITEM_ADDED":
+                seen.setdefault(event["item"]["name"], time.monotonic())
+
+
+async def run_fanout(transport, lists, subscribers, mutations, timeout=10.0):
+    """
+    Run the fan-out scenario and return its statistics: connection count,
+    expected, delivered and dropped messages, latency percentiles (ms) and
+    server memory per connection (KiB).
+    """
+    list_ids = []
+    for _ in range(lists):
+        _, created = await transport.post("/api/lists/", {})
+        list_ids.append(created["list_id"])
+
+    gc.collect()
+    rss_before = transport.server_rss()
+    sockets = {list_id: [] for list_id in list_ids}
+    for list_id in list_ids:
+        for _ in range(subscribers):
+            sockets[list_id].append(await transport.connect(list_id))
+    gc.collect()
+    rss_after = transport.server_rss()
+    connections = lists * subscribers
+
+    expected = {
+        list_id: {f"{list_id}-{n}" for n in range(mutations)} for list_id in list_ids
+    }
+    arrivals = []
+    collectors = []
+    for list_id, list_sockets in sockets.items():
+        for socket in list_sockets:
+            seen = {}
+            arrivals.append(seen)
+            collectors.append(
+                asyncio.create_task(
+                    _collect(transport, socket, expected[list_id], seen, timeout)
+                )
+            )
+
+    sent = {}
+    failed = 0
+
+    async def drive(list_id):
+        nonlocal failed
+        for n in range(mutations):
+            name = f"{list_id}-{n}"
+            sent[name] = time.monotonic()
+            status, _ = await transport.post(
+                f"/api/lists/{list_id}/items/", {"name": name}
+            )
+            failed += status != 201
+
+    await asyncio.gather(*(drive(list_id) for list_id in list_ids))
+    await asyncio.gather(*collectors)
+    for list_sockets in sockets.values():
+        for socket in list_sockets:
+            await transport.close(socket)
+
+    latencies = [
+        arrived - sent[name] for seen in arrivals for name, arrived in seen.items()
+    ]
+    total = connections * mutations
+    stats = summarize(latencies)
+    stats.update(
+        connections=connections,
+        expected=total,
+        delivered=len(latencies),
+        dropped=total - len(latencies),
+        failed_requests=failed,
+        kib_per_connection=(rss_after - rss_before) / 1024 / max(connections, 1),
+    )
+    return stats
@@ -0,0 +1,351 @@
+"""
+REST benchmark suite: every endpoint of ``api/urls.py`` on lists of several sizes.
+
+Requests go through Django's test client in-process, so the numbers cover the
+whole Django stack (middleware, DRF, ORM, broadcasts) without network noise.
+For each endpoint and list size it reports requests per second, latency
+percentiles and queries per request.
+
+    python manage.py bench_api --sizes 10,1000,10000 --iterations 30
+    python manage.py bench_api --save-baseline          # store the results
+    python manage.py bench_api --compare --fail-on-regression
+
+Baselines are JSON files (default: ``benchmarks/api_baseline.json``). A result
+regresses when it runs more queries than its baseline, or when its median
+latency grows by more than ``--tolerance``. Generated lists are deleted at the
+end of the run.
+"""
+import json
+import platform
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.functions import Mod
+from django.test import Client
+from api.bench import format_table, summarize
+from api.cache import snapshot_cache
+from api.datagen import build_items, generate_list, pseudo_pool
+from api.models import ShoppingList, Item
+from api.signals import delete_without_broadcast
+
+DEFAULT_BASELINE = settings.BASE_DIR / "benchmarks" / "api_baseline.json"
+BENCH_PSEUDO = "Banc"
+
+
+class _QueryCounter:
+    """Counts queries with ``connection.execute_wrapper``; cheaper than capturing."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _Run:
+    """The list under test and helpers to prepare untimed fixtures."""
+
+    def __init__(self, size, iterations, rng):
+        self.size = size
+        self.iterations = iterations
+        self.rng = rng
+        self.pseudos = pseudo_pool(12, rng)
+        self.shopping_list = generate_list(size, self.pseudos, rng)
+        self.list_id = self.shopping_list.list_id
+        self.pool = []
+
+    def make_pool(self, status="pending", claimed_by=None):
+        """Add one item per iteration, so the list size barely changes."""
+        items = Item.objects.bulk_create(
+            Item(
+                shopping_list=self.shopping_list,
+                name=f"Banc {n}",
+                status=status,
+                claimed_by=claimed_by,
+            )
+            for n in range(self.iterations)
+        )
+        self.pool = [item.id for item in items]
+
+    def set_pool(self, **fields):
+        Item.objects.filter(id__in=self.pool).update(**fields)
+
+    def refill(self):
+        """Bring back bought and claimed items after a reset."""
+        items = Item.objects.filter(shopping_list=self.shopping_list)
+        items.annotate(slot=Mod("id", 4)).filter(slot=0).update(
+            status="claimed", claimed_by=self.pseudos[0]
+        )
+        missing = self.size - items.count()
+        if missing > 0:
+            Item.objects.bulk_create(
+                build_items(
+                    self.shopping_list,
+                    missing,
+                    self.pseudos,
+                    self.rng,
+                    weights={"bought": 1},
+                )
+            )
+
+
+def _json(method):
+    def send(client, path, data=None):
+        return getattr(client, method)(
+            path, json.dumps(data or {}), content_type="application/json"
+        )
+
+    return send
+
+
+_post, _patch, _delete = _json("post"), _json("patch"), _json("delete")
+
+
+def _scenarios():
+    """
+    Return ``(name, setup, before_each, request)`` tuples in run order.
+    ``setup(client, run)`` and ``before_each(run, n)`` are not timed;
+    ``request(client, run, n)`` is, and returns the response.
+    """
+    item = "/api/items/{}/"
+    return [
+        ("create_list", None, None, lambda c, r, n: _post(c, "/api/lists/")),
+        (
+            "get_list",
+            lambda c, r: c.get(f"/api/lists/{r.list_id}/"),
+            None,
+            lambda c, r, n: c.get(f"/api/lists/{r.list_id}/"),
+        ),
+        (
+            "get_list_uncached",
+            None,
+            lambda r, n: snapshot_cache.clear(),
+            lambda c, r, n: c.get(f"/api/lists/{r.list_id}/"),
+        ),
+        (
+            "add_item",
+            None,
+            None,
+            lambda c, r, n: _post(
+                c, f"/api/lists/{r.list_id}/items/", {"name": f"Ajout {n}"}
+            ),
+        ),
+        (
+            "batch_items",
+            None,
+            None,
+            lambda c, r, n: _post(
+                c,
+                f"/api/lists/{r.list_id}/items/batch/",
+                {"operations": [{"op": "add", "name": f"Lot {k}"} for k in range(10)]},
+            ),
+        ),
+        (
+            "update_item",
+            lambda c, r: r.make_pool(),
+            None,
+            lambda c, r, n: _patch(c, item.format(r.pool[n]), {"name": f"Modif {n}"}),
+        ),
+        (
+            "claim_item",
+            lambda c, r: r.set_pool(status="pending", claimed_by=None),
+            None,
+            lambda c, r, n: _post(
+                c, item.format(r.pool[n]) + "claim/", {"pseudo": BENCH_PSEUDO}
+            ),
+        ),
+        (
+            "unclaim_item",
+            None,
+            None,
+            lambda c, r, n: _post(
+                c, item.format(r.pool[n]) + "unclaim/", {"pseudo": BENCH_PSEUDO}
+            ),
+        ),
+        (
+            "validate_item",
+            lambda c, r: r.set_pool(status="claimed", claimed_by=BENCH_PSEUDO),
+            None,
+            lambda c, r, n: _post(
+                c, item.format(r.pool[n]) + "validate/", {"pseudo": BENCH_PSEUDO}
+            ),
+        ),
+        (
+            "delete_item",
+            None,
+            None,
+            lambda c, r, n: _delete(
+                c, item.format(r.pool[n]) + "delete/", {"current_pseudo": BENCH_PSEUDO}
+            ),
+        ),
+        (
+            "get_changes",
+            None,
+            None,
+            lambda c, r, n: c.get(
+                f"/api/lists/{r.list_id}/changes/?since={max(0, 5 * n)}"
+            ),
+        ),
+        (
+            "rename_pseudo",
+            None,
+            None,
+            lambda c, r, n: _post(
+                c,
+                f"/api/lists/{r.list_id}/rename-pseudo/",
+                {
+                    "old_pseudo": r.pseudos[0] + ("-bis" if n % 2 else ""),
+                    "new_pseudo": r.pseudos[0] + ("" if n % 2 else "-bis"),
+                },
+            ),
+        ),
+        (
+            "reset_list",
+            None,
+            lambda r, n: r.refill(),
+            lambda c, r, n: _post(c, f"/api/lists/{r.list_id}/reset/"),
+        ),
+    ]
+
+
+def _measure(client, run, before_each, request):
+    counter = _QueryCounter()
+    latencies, queries = [], []
+    for n in range(run.iterations):
+        if before_each:
+            before_each(run, n)
+        counter.count = 0
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = request(client, run, n)
+            latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            raise CommandError(
+                f"{response.status_code} from {response.request['PATH_INFO']}: "
+                f"{response.content[:200]!r}"
+            )
+        queries.append(counter.count)
+    stats = summarize(latencies)
+    stats["rps"] = len(latencies) / sum(latencies) if latencies else 0.0
+    stats["queries"] = max(queries)
+    return stats
+
+
+def _regressions(result, baseline, tolerance):
+    """Return the reasons ``result`` regressed against ``baseline``."""
+    reasons = []
+    if result["queries"] > baseline["queries"]:
+        reasons.append(f"queries {baseline['queries']}->{result['queries']}")
+    slower = result["p50_ms"] - baseline["p50_ms"]
+    # Ignore sub-millisecond jitter on very fast endpoints.
+    if slower > 0.5 and result["p50_ms"] > baseline["p50_ms"] * (1 + tolerance):
+        reasons.append(f"p50 {baseline['p50_ms']:.2f}->{result['p50_ms']:.2f}ms")
+    return reasons
+
+
+class Command(BaseCommand):
+    help = "Benchmark every REST endpoint and compare with a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,1000,10000")
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--endpoints", help="Comma-separated subset to run.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--save-baseline",
+            nargs="?",
+            const=str(DEFAULT_BASELINE),
+            help=f"Store results as a baseline (default: {DEFAULT_BASELINE}).",
+        )
+        parser.add_argument(
+            "--compare",
+            nargs="?",
+            const=str(DEFAULT_BASELINE),
+            help="Compare results with a stored baseline.",
+        )
+        parser.add_argument("--tolerance", type=float, default=0.25)
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        scenarios = _scenarios()
+        if options["endpoints"]:
+            wanted = options["endpoints"].split(",")
+            scenarios = [s for s in scenarios if s[0] in wanted]
+
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)["results"]
+
+        rng = random.Random(options["seed"])
+        client = Client(HTTP_HOST="localhost")
+        results, rows, regressed = {}, [], []
+        # Everything after this pk was created by the run, create_list included.
+        last = ShoppingList.objects.order_by("-pk").values_list("pk", flat=True)
+        first_pk = (last.first() or 0) + 1
+        try:
+            for size in sizes:
+                run = _Run(size, options["iterations"], rng)
+                for name, setup, before_each, request in scenarios:
+                    if setup:
+                        setup(client, run)
+                    stats = _measure(client, run, before_each, request)
+                    key = f"{name}@{size}"
+                    results[key] = {
+                        field: round(stats[field], 3)
+                        for field in ("rps", "p50_ms", "p95_ms", "p99_ms", "queries")
+                    }
+                    reasons = (
+                        _regressions(results[key], baseline[key], options["tolerance"])
+                        if key in baseline
+                        else []
+                    )
+                    if reasons:
+                        regressed.append(key)
+                    rows.append(
+                        [
+                            name,
+                            size,
+                            stats["rps"],
+                            stats["p50_ms"],
+                            stats["p99_ms"],
+                            stats["queries"],
+                            "; ".join(reasons) or ("-" if baseline else ""),
+                        ]
+                    )
+        finally:
+            self._cleanup(first_pk)
+
+        headers = ["endpoint", "size", "req_per_s", "p50_ms", "p99_ms", "queries"]
+        self.stdout.write(format_table(headers + ["regression"], rows))
+
+        if options["save_baseline"]:
+            self._save(options["save_baseline"], options, results)
+        if regressed:
+            message = f"{len(regressed)} regressions: {', '.join(regressed)}"
+            if options["fail_on_regression"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def _save(self, path, options, results):
+        from pathlib import Path
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "database": connection.vendor,
+            "iterations": options["iterations"],
+        }
+        with open(path, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write(self.style.SUCCESS(f"Baseline saved to {path}"))
+
+    def _cleanup(self, first_pk):
+        # Without broadcasting ITEM_DELETED for every item of the deleted lists
+        delete_without_broadcast(ShoppingList.objects.filter(pk__gte=first_pk))
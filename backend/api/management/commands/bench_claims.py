@@ -0,0 +1,118 @@
+"""
+Contention benchmark: many shoppers racing to claim the items of one list.
+
+Every claimer thread walks all items of a fresh list in its own random order
+and tries to claim each one. ``cas`` uses ``ItemService.claim_item`` (one
+conditional UPDATE); ``legacy`` reproduces the former read, check in Python
+and ``save()`` sequence. A correct run has exactly one winner per item.
+
+    python manage.py bench_claims --claimers 16 --items 100
+"""
+import random
+import threading
+import time
+from collections import Counter
+from django.db import OperationalError, connection
+from django.core.management.base import BaseCommand
+from api.bench import format_table, summarize
+from api.models import Item
+from api.services import ConflictError, ItemService, ShoppingListService
+
+
+def _legacy_claim(item, pseudo):
+    if item.status != "pending":
+        raise ValueError("Item is not available for claiming")
+    item.status = "claimed"
+    item.claimed_by = pseudo
+    item.save()
+
+
+def _run(mode, claimers, items):
+    shopping_list = ShoppingListService.create_list()
+    item_ids = [
+        ItemService.create_item(shopping_list, f"Article {i}").id
+        for i in range(items)
+    ]
+    claim = ItemService.claim_item if mode == "cas" else _legacy_claim
+    barrier = threading.Barrier(claimers)
+    winners = Counter()
+    outcomes = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def claimer(pseudo):
+        order = random.sample(item_ids, len(item_ids))
+        barrier.wait()
+        try:
+            for item_id in order:
+                started = time.perf_counter()
+                item = Item.objects.select_related("shopping_list").get(id=item_id)
+                try:
+                    claim(item, pseudo)
+                    outcome = "won"
+                except ValueError:
+                    outcome = "taken"
+                except ConflictError:
+                    outcome = "conflict"
+                except OperationalError:
+                    outcome = "db_error"
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    outcomes[outcome] += 1
+                    if outcome == "won":
+                        winners[item_id] += 1
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=claimer, args=(f"Shopper {n}",))
+        for n in range(claimers)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies)
+    return [
+        mode,
+        outcomes["won"],
+        sum(1 for count in winners.values() if count > 1),
+        outcomes["conflict"],
+        outcomes["taken"],
+        outcomes["db_error"],
+        len(latencies) / elapsed,
+        stats["p50_ms"],
+        stats["p99_ms"],
+    ]
+
+
+class Command(BaseCommand):
+    help = "Race concurrent claimers on one list and count double claims."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--claimers", type=int, default=16)
+        parser.add_argument("--items", type=int, default=100)
+        parser.add_argument(
+            "--modes", default="legacy,cas", help="Comma-separated: legacy, cas."
+        )
+
+    def handle(self, *args, **options):
+        rows = [
+            _run(mode, options["claimers"], options["items"])
+            for mode in options["modes"].split(",")
+        ]
+        headers = [
+            "mode",
+            "wins",
+            "double_claimed",
+            "conflicts",
+            "already_taken",
+            "db_errors",
+            "attempts_per_s",
+            "p50_ms",
+            "p99_ms",
+        ]
+        self.stdout.write(format_table(headers, rows))
@@ -0,0 +1,93 @@
+"""
+Microbenchmark of WebSocket fan-out cost per event.
+
+Compares the legacy path, where every consumer receives the structured event
+and calls ``json.dumps`` on it, with the encode-once path, where the publisher
+renders the frame once and consumers forward the text unchanged. Both go
+through a real ``InMemoryChannelLayer`` so its per-channel message copy is
+included.
+
+    python manage.py bench_fanout --subscribers 1,10,50,200 --events 200
+"""
+import asyncio
+import json
+import time
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+from api.bench import format_table, sample_item
+from api.broadcast import encode_frame
+
+
+def _events():
+    """The event shapes to measure, from cheapest to most expensive."""
+    return {
+        "ITEM_UPDATED": {
+            "type": "item_updated",
+            "event": "ITEM_UPDATED",
+            "item": sample_item(1, "claimed", "Alice"),
+            "revision": 42,
+        },
+        "BATCH(40)": {
+            "type": "list_batch",
+            "event": "BATCH",
+            "events": [
+                {"event": "ITEM_ADDED", "item": sample_item(i)} for i in range(40)
+            ],
+            "revision": 43,
+        },
+    }
+
+
+async def _run(subscribers, events, event, encode_once):
+    """Return the CPU seconds spent publishing and delivering ``events`` events."""
+    layer = InMemoryChannelLayer(capacity=events + 1)
+    channels = [await layer.new_channel() for _ in range(subscribers)]
+    for channel in channels:
+        await layer.group_add("bench", channel)
+
+    started = time.process_time()
+    for _ in range(events):
+        if encode_once:
+            await layer.group_send("bench", encode_frame([event]))
+            for channel in channels:
+                (await layer.receive(channel))["text"]
+        else:
+            await layer.group_send("bench", event)
+            for channel in channels:
+                json.dumps(await layer.receive(channel))
+    return time.process_time() - started
+
+
+class Command(BaseCommand):
+    help = "Measure per-event CPU cost of WebSocket fan-out versus subscriber count."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers",
+            default="1,10,50,200",
+            help="Comma-separated subscriber counts (default: 1,10,50,200).",
+        )
+        parser.add_argument(
+            "--events", type=int, default=200, help="Events per measurement."
+        )
+
+    def handle(self, *args, **options):
+        counts = [int(n) for n in options["subscribers"].split(",")]
+        events = options["events"]
+        rows = []
+        for name, event in _events().items():
+            for subscribers in counts:
+                legacy = asyncio.run(_run(subscribers, events, event, False))
+                once = asyncio.run(_run(subscribers, events, event, True))
+                rows.append(
+                    [
+                        name,
+                        subscribers,
+                        legacy / events * 1e6,
+                        once / events * 1e6,
+                        legacy / once if once else 0.0,
+                    ]
+                )
+
+        headers = ["event", "subscribers", "legacy_us", "encode_once_us", "speedup"]
+        self.stdout.write(format_table(headers, rows))
@@ -0,0 +1,113 @@
+"""
+Memory and latency of reading very large lists, by list size.
+
+Runs in a child process on a fresh SQLite file. For each size, a list is
+generated, then read three ways:
+
+- ``get_list``: the full snapshot of ``GET /api/lists/{list_id}/``, uncached
+- ``export``: the streamed ``GET /api/lists/{list_id}/export/``
+- ``pages``: every page of ``GET /api/lists/{list_id}/items/`` (100 items)
+
+``first_ms`` is the time until the first item bytes are ready (the whole
+response for ``get_list``, the first page for ``pages``), ``total_ms`` the
+time for everything, and ``peak_kib`` the peak Python memory traced while
+reading, measured in a separate pass.
+
+    python manage.py bench_large_lists --sizes 1000,10000,50000
+"""
+import json
+import time
+import tracemalloc
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from api.bench import format_table, run_on_scratch_database
+from api.cache import snapshot_cache
+from api.datagen import generate_list, pseudo_pool
+from api.services import ItemService, ShoppingListService
+
+
+def _get_list(list_id):
+    snapshot_cache.clear()
+    ShoppingListService.get_list_snapshot(list_id)
+    yield
+
+
+def _export(list_id):
+    chunks = ShoppingListService.export_list(list_id)
+    next(chunks)  # The list fields, read before any item
+    for _ in chunks:
+        yield
+
+
+def _pages(list_id):
+    cursor = None
+    while True:
+        _, cursor = ItemService.get_items_page(list_id, cursor=cursor)
+        yield
+        if cursor is None:
+            return
+
+
+def _timed(read, list_id):
+    started = time.perf_counter()
+    steps = read(list_id)
+    next(steps)
+    first = time.perf_counter() - started
+    for _ in steps:
+        pass
+    return first * 1000, (time.perf_counter() - started) * 1000
+
+
+def _peak(read, list_id):
+    tracemalloc.start()
+    for _ in read(list_id):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def _workload(sizes):
+    results = []
+    pseudos = pseudo_pool(8)
+    for size in sizes:
+        list_id = generate_list(size, pseudos).list_id
+        for name, read in (
+            ("get_list", _get_list),
+            ("export", _export),
+            ("pages", _pages),
+        ):
+            first_ms, total_ms = _timed(read, list_id)
+            results.append(
+                {
+                    "read": name,
+                    "items": size,
+                    "first_ms": first_ms,
+                    "total_ms": total_ms,
+                    "peak_kib": _peak(read, list_id),
+                }
+            )
+    return results
+
+
+class Command(BaseCommand):
+    help = "Benchmark memory and latency of full, streamed and paged list reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,50000")
+        parser.add_argument(
+            "--worker", action="store_true", help="Internal: run in this process."
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(n) for n in options["sizes"].split(",")]
+        if options["worker"]:
+            call_command("migrate", verbosity=0)
+            self.stdout.write(json.dumps({"results": _workload(sizes)}))
+            return
+
+        results = run_on_scratch_database(
+            "bench_large_lists", [f"--sizes={options['sizes']}"]
+        )["results"]
+        headers = list(results[0])
+        self.stdout.write(format_table(headers, [list(r.values()) for r in results]))
@@ -0,0 +1,154 @@
+"""
+List creation throughput as the list table fills up.
+
+Runs in a child process on a fresh SQLite file. For each occupancy, the table
+is first filled with that many lists carrying random codes, as created before
+``api.list_ids``, then ``--creates`` lists are created two ways:
+
+- ``allocator``: ``ShoppingListService.create_list``, keyed permutation of a
+  reserved counter block
+- ``random``: the former random draw, retried here on IntegrityError (the
+  former code did not retry at all)
+
+``collisions`` counts codes already taken; ``p_collision`` is the chance a
+single random draw hits an existing list at that occupancy.
+
+    python manage.py bench_list_ids --occupancies 0,100000,1000000 --creates 2000
+"""
+import json
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from api import list_ids
+from api.bench import format_table, run_on_scratch_database, summarize
+from api.models import ShoppingList
+from api.services import ShoppingListService
+
+
+def _fill(count, chunk=50000):
+    """Insert ``count`` lists with random codes, as fast as SQLite allows."""
+    now = timezone.now()
+    table = ShoppingList._meta.db_table
+    sql = (
+        f"INSERT OR IGNORE INTO {table} (list_id, created_at, revision, "
+        "last_active_at) VALUES (%s, %s, 0, %s)"
+    )
+    while count > 0:
+        size = min(chunk, count)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                sql, [(list_ids.random_code(), now, now) for _ in range(size)]
+            )
+        count -= size
+
+
+def _random_create(collisions):
+    while True:
+        try:
+            with transaction.atomic():
+                return ShoppingList.objects.create(list_id=list_ids.random_code())
+        except IntegrityError:
+            collisions[0] += 1
+
+
+def _measure(create, creates):
+    latencies = []
+    for _ in range(creates):
+        started = time.perf_counter()
+        create()
+        latencies.append(time.perf_counter() - started)
+    stats = summarize(latencies)
+    return {
+        "creates_per_s": len(latencies) / sum(latencies),
+        "p50_ms": stats["p50_ms"],
+        "p99_ms": stats["p99_ms"],
+    }
+
+
+def _workload(occupancies, creates):
+    collisions = [0]
+    discard = list_ids.allocator.discard_block
+
+    def counting_discard():
+        collisions[0] += 1
+        discard()
+
+    list_ids.allocator.discard_block = counting_discard
+    results, filled = [], 0
+    for occupancy in occupancies:
+        _fill(occupancy - filled)
+        filled = ShoppingList.objects.count()
+        for name, create in (
+            ("allocator", ShoppingListService.create_list),
+            ("random", lambda: _random_create(collisions)),
+        ):
+            collisions[0] = 0
+            stats = _measure(create, creates)
+            results.append(
+                {
+                    "method": name,
+                    "lists": filled,
+                    **stats,
+                    "collisions": collisions[0],
+                    "p_collision": f"{filled / list_ids.SPACE:.2e}",
+                }
+            )
+            filled += creates
+    return results
+
+
+class Command(BaseCommand):
+    help = "Benchmark list creation at increasing table occupancy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--occupancies", default="0,100000,1000000")
+        parser.add_argument("--creates", type=int, default=2000)
+        parser.add_argument(
+            "--worker", action="store_true", help="Internal: run in this process."
+        )
+
+    def handle(self, *args, **options):
+        if options["worker"]:
+            call_command("migrate", verbosity=0)
+            occupancies = [int(n) for n in options["occupancies"].split(",")]
+            results = _workload(occupancies, options["creates"])
+            self.stdout.write(json.dumps({"results": results}))
+            return
+
+        started = time.perf_counter()
+        per_create = _per_code_us()
+        results = run_on_scratch_database(
+            "bench_list_ids",
+            [
+                f"--occupancies={options['occupancies']}",
+                f"--creates={options['creates']}",
+            ],
+        )["results"]
+        headers = list(results[0])
+        self.stdout.write(format_table(headers, [list(r.values()) for r in results]))
+        self.stdout.write(
+            f"Code generation: allocator {per_create['allocator']:.2f} us, "
+            f"random {per_create['random']:.2f} us "
+            f"({time.perf_counter() - started:.0f}s total)."
+        )
+
+
+def _per_code_us(iterations=20000):
+    """Cost of computing one code, without the database."""
+    allocator = list_ids.ListCodeAllocator()
+    allocator._permutation = list_ids.FeistelPermutation(
+        list_ids.derive_key(allocator.config)
+    )
+    allocator._end = list_ids.SPACE
+    timings = {}
+    for name, generate in (
+        ("allocator", allocator.next_code),
+        ("random", list_ids.random_code),
+    ):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            generate()
+        timings[name] = (time.perf_counter() - started) / iterations * 1e6
+    return timings
@@ -0,0 +1,103 @@
+"""
+DRF serializers against the fast serializers of ``api.fast_serializers``.
+
+Runs in a child process on a fresh SQLite file. For each list size, the same
+work is timed with the DRF serializers and with the fast ones:
+
+- ``list``: read and render a whole list, as an uncached ``GET
+  /api/lists/{list_id}/`` does
+- ``items``: serialize already loaded items, as the paginated listing does
+- ``item``: serialize one item, as every broadcast and write response does
+
+Times are the median of ``--repeat`` runs, in milliseconds.
+
+    python manage.py bench_serializers --sizes 10,1000,10000
+"""
+import json
+import statistics
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from api import fast_serializers
+from api.bench import format_table, run_on_scratch_database
+from api.datagen import generate_list, pseudo_pool
+from api.models import ShoppingList
+from api.serializers import ItemSerializer, ShoppingListSerializer
+
+
+def _drf(shopping_list, items):
+    return {
+        "list": lambda: JSONRenderer().render(
+            ShoppingListSerializer(ShoppingList.objects.get(pk=shopping_list.pk)).data
+        ),
+        "items": lambda: ItemSerializer(items, many=True).data,
+        "item": lambda: ItemSerializer(items[0]).data,
+    }
+
+
+def _fast(shopping_list, items):
+    return {
+        "list": lambda: fast_serializers.render(
+            fast_serializers.list_data(ShoppingList.objects.get(pk=shopping_list.pk))
+        ),
+        "items": lambda: fast_serializers.items_data(items),
+        "item": lambda: fast_serializers.item_data(items[0]),
+    }
+
+
+def _median_ms(work, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        work()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def _workload(sizes, repeat):
+    results = []
+    pseudos = pseudo_pool(8)
+    for size in sizes:
+        shopping_list = generate_list(size, pseudos)
+        items = list(shopping_list.items.all())
+        drf, fast = _drf(shopping_list, items), _fast(shopping_list, items)
+        for name in drf:
+            drf_ms = _median_ms(drf[name], repeat)
+            fast_ms = _median_ms(fast[name], repeat)
+            results.append(
+                {
+                    "work": name,
+                    "items": size,
+                    "drf_ms": drf_ms,
+                    "fast_ms": fast_ms,
+                    "speedup": drf_ms / fast_ms,
+                }
+            )
+    return results
+
+
+class Command(BaseCommand):
+    help = "Benchmark the DRF serializers against the fast serializers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,1000,10000")
+        parser.add_argument("--repeat", type=int, default=15)
+        parser.add_argument(
+            "--worker", action="store_true", help="Internal: run in this process."
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(n) for n in options["sizes"].split(",")]
+        if options["worker"]:
+            call_command("migrate", verbosity=0)
+            results = _workload(sizes, options["repeat"])
+            self.stdout.write(json.dumps({"results": results}))
+            return
+
+        results = run_on_scratch_database(
+            "bench_serializers",
+            [f"--sizes={options['sizes']}", f"--repeat={options['repeat']}"],
+        )["results"]
+        headers = list(results[0])
+        self.stdout.write(format_table(headers, [list(r.values()) for r in results]))
@@ -0,0 +1,167 @@
+"""
+Concurrent writers on SQLite, with and without the SQLite performance mode.
+
+Each mode runs in a child process on a fresh temporary database file, so the
+settings are applied at startup exactly as in production: ``default`` is the
+stock configuration, ``performance`` sets ``SQLITE_PERFORMANCE=True`` (PRAGMAs
+plus the single-writer queue) and ``pragmas`` the PRAGMAs alone. Writer
+threads add, claim and validate items on a few shared lists while reader
+threads fetch their snapshots, as ``GET /api/lists/{list_id}/`` does.
+
+    python manage.py bench_sqlite --writers 16 --cycles 30 --readers 4
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from api.bench import format_table, run_on_scratch_database, summarize
+from api.metrics import write_group_size
+from api.models import ShoppingList
+from api.services import ConflictError, ItemService, ShoppingListService
+
+WORKLOAD = ("writers", "cycles", "readers", "lists")
+MODES = {
+    "default": {"SQLITE_PERFORMANCE": "False"},
+    "pragmas": {"SQLITE_PERFORMANCE": "True", "SQLITE_WRITE_QUEUE": "False"},
+    "performance": {"SQLITE_PERFORMANCE": "True"},
+}
+
+
+def _workload(writers, cycles, readers, lists):
+    """Run the threads in this process; return the measurements as a dict."""
+    list_ids = [ShoppingListService.create_list().list_id for _ in range(lists)]
+    barrier = threading.Barrier(writers + readers)
+    stop = threading.Event()
+    outcomes = Counter()
+    latencies, read_latencies = [], []
+    lock = threading.Lock()
+
+    def record(samples, outcome, started):
+        with lock:
+            samples.append(time.perf_counter() - started)
+            outcomes[outcome] += 1
+
+    def writer(n):
+        rng = random.Random(n)
+        pseudo = f"Shopper {n}"
+        barrier.wait()
+        try:
+            for cycle in range(cycles):
+                shopping_list = ShoppingList.objects.get(list_id=rng.choice(list_ids))
+                item = None
+                for step in ("add", "claim", "validate"):
+                    started = time.perf_counter()
+                    try:
+                        if step == "add":
+                            item = ItemService.create_item(
+                                shopping_list, f"Article {n}-{cycle}"
+                            )
+                        elif step == "claim":
+                            item = ItemService.claim_item(item, pseudo)
+                        else:
+                            item = ItemService.validate_item(item, pseudo)
+                        outcome = "ok"
+                    except (ConflictError, ValueError):
+                        outcome = "conflict"
+                    except OperationalError:
+                        outcome = "db_error"
+                    record(latencies, outcome, started)
+                    if outcome != "ok":
+                        break
+        finally:
+            connection.close()
+
+    def reader(n):
+        rng = random.Random(-n)
+        barrier.wait()
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    ShoppingListService.get_list_snapshot(rng.choice(list_ids))
+                    outcome = "read"
+                except OperationalError:
+                    outcome = "read_error"
+                record(read_latencies, outcome, started)
+                # A client polling, not a busy loop holding the GIL
+                stop.wait(0.002)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    readers_threads = [
+        threading.Thread(target=reader, args=(n,)) for n in range(readers)
+    ]
+    started = time.perf_counter()
+    for thread in threads + readers_threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in readers_threads:
+        thread.join()
+
+    groups = write_group_size._unlabelled.totals()
+    writes, reads = summarize(latencies), summarize(read_latencies)
+    return {
+        "writes_per_s": outcomes["ok"] / elapsed,
+        "write_p50_ms": writes["p50_ms"],
+        "write_p99_ms": writes["p99_ms"],
+        "db_errors": outcomes["db_error"],
+        "read_p99_ms": reads["p99_ms"],
+        "read_errors": outcomes["read_error"],
+        "avg_group": groups[-1] / max(sum(groups[:-1]), 1),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent SQLite writers with and without performance mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument("--cycles", type=int, default=30)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--lists", type=int, default=4)
+        parser.add_argument(
+            "--modes",
+            default="default,pragmas,performance",
+            help=f"Comma-separated: {', '.join(MODES)}.",
+        )
+        parser.add_argument(
+            "--worker", action="store_true", help="Internal: run one mode here."
+        )
+
+    def handle(self, *args, **options):
+        workload = [options[key] for key in WORKLOAD]
+        if options["worker"]:
+            call_command("migrate", verbosity=0)
+            self.stdout.write(json.dumps(_workload(*workload)))
+            return
+
+        rows = []
+        for mode in options["modes"].split(","):
+            if mode not in MODES:
+                raise CommandError(f"Unknown mode {mode!r}.")
+            result = run_on_scratch_database(
+                "bench_sqlite",
+                [f"--{key}={value}" for key, value in zip(WORKLOAD, workload)],
+                **MODES[mode],
+            )
+            rows.append([mode, *result.values()])
+
+        headers = [
+            "mode",
+            "writes_per_s",
+            "write_p50_ms",
+            "write_p99_ms",
+            "db_errors",
+            "read_p99_ms",
+            "read_errors",
+            "avg_group",
+        ]
+        self.stdout.write(format_table(headers, rows))
@@ -0,0 +1,79 @@
+"""
+Cold-start time of the ASGI entry point, with a time budget.
+
+Starts ``--runs`` fresh interpreters per startup profile (see ``api.startup``),
+each importing ``teamshop.asgi`` and serving a first request, and reports the
+median and p95, in milliseconds, of:
+
+- ``import_ms``: importing ``teamshop.asgi`` (Django setup included)
+- ``request_ms``: serving the first request
+- ``first_request_ms``: both, the time to first response once Python runs
+- ``process_ms``: the whole process, interpreter startup and exit included
+
+Fails when the median ``first_request_ms`` of a profile exceeds ``--max-ms``
+(``STARTUP_BUDGET_MS``), so CI catches startup regressions.
+
+    python manage.py bench_startup --runs 10
+    python manage.py bench_startup --profiles lean --max-ms 300
+"""
+import statistics
+from django.core.management.base import BaseCommand, CommandError
+from api import startup
+from api.bench import format_table, percentile
+
+STARTUP_BUDGET_MS = 500
+
+PROFILES = {"default": {}, "lean": {"LEAN_STARTUP": "True"}}
+
+TIMINGS = ["import_ms", "request_ms", "first_request_ms", "process_ms"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark cold starts of the ASGI application against a time budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument("--profiles", default=",".join(PROFILES))
+        parser.add_argument(
+            "--max-ms",
+            type=float,
+            default=STARTUP_BUDGET_MS,
+            help="Budget for the median first_request_ms of every profile.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["profiles"].split(",")
+        unknown = set(names) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        rows, over_budget = [], []
+        with startup.migrated_database() as url:
+            for name in names:
+                runs = [
+                    startup.cold_start(url, **PROFILES[name])
+                    for _ in range(options["runs"])
+                ]
+                if any(run["status"] >= 500 for run in runs):
+                    raise CommandError(f"{name}: the first request failed")
+                for timing in TIMINGS:
+                    samples = sorted(run[timing] for run in runs)
+                    rows.append(
+                        [
+                            name,
+                            timing,
+                            statistics.median(samples),
+                            percentile(samples, 95),
+                        ]
+                    )
+                median = statistics.median(run["first_request_ms"] for run in runs)
+                if median > options["max_ms"]:
+                    over_budget.append(f"{name} {median:.1f} ms")
+
+        self.stdout.write(format_table(["profile", "timing", "p50_ms", "p95_ms"], rows))
+        if over_budget:
+            raise CommandError(
+                "First request over the {:.0f} ms budget: {}".format(
+                    options["max_ms"], "; ".join(over_budget)
+                )
+            )
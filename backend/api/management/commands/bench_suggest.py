@@ -0,0 +1,98 @@
+"""
+Latency of item-name autocomplete for common prefixes.
+
+Runs in a child process on a fresh SQLite file filled with ``--lists`` lists
+of ``--items`` generated items each. Lookups for one- and two-letter prefixes
+of common products are timed four ways:
+
+- ``like``: the query autocomplete would need without an index, a
+  case-insensitive ``LIKE 'prefix%'`` over the list's ``Item.name``
+- ``cold``: ``api.suggest.suggest`` with no index in memory, which loads the
+  list's names (and the global index, on the first lookup)
+- ``no_memo``: indexes in memory, prefix results not memoized
+- ``warm``: indexes in memory with their memo, the steady state
+
+    python manage.py bench_suggest --lists 200 --items 500
+"""
+import json
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+from api import suggest
+from api.bench import format_table, run_on_scratch_database, summarize
+from api.datagen import generate_list, pseudo_pool
+from api.models import Item
+
+PREFIXES = ["p", "pa", "c", "ca", "ch", "b", "be", "s", "sa", "t", "to", "l", "la"]
+
+
+def _like(list_id, prefix):
+    list(
+        Item.objects.filter(shopping_list__list_id=list_id, name__istartswith=prefix)
+        .values("name")
+        .annotate(uses=Count("pk"))
+        .order_by("-uses")[:8]
+    )
+
+
+def _cold(list_id, prefix):
+    suggest.list_indexes.clear()
+    suggest.suggest(list_id, prefix)
+
+
+def _lookup(list_id, prefix):
+    suggest.suggest(list_id, prefix)
+
+
+def _time(lookup, list_ids, rounds):
+    samples = []
+    for _ in range(rounds):
+        for list_id in list_ids:
+            for prefix in PREFIXES:
+                started = time.perf_counter()
+                lookup(list_id, prefix)
+                samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _workload(lists, items, rounds):
+    pseudos = pseudo_pool(8)
+    list_ids = [generate_list(items, pseudos).list_id for _ in range(lists)]
+    sample = list_ids[:20]
+    results = {"like": _time(_like, sample, 1), "cold": _time(_cold, sample, 1)}
+    memo_off = {**suggest.get_config(), "MEMO_SIZE": 0}
+    for name, config in (("no_memo", memo_off), ("warm", suggest.get_config())):
+        with override_settings(ITEM_SUGGEST=config):
+            suggest.list_indexes.clear()
+            suggest.global_index.clear()
+            _time(_lookup, sample, 1)
+            results[name] = _time(_lookup, sample, rounds)
+    return [{"lookup": name, **summarize(s)} for name, s in results.items()]
+
+
+class Command(BaseCommand):
+    help = "Benchmark item-name autocomplete against LIKE queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lists", type=int, default=200)
+        parser.add_argument("--items", type=int, default=500)
+        parser.add_argument("--rounds", type=int, default=20)
+        parser.add_argument(
+            "--worker", action="store_true", help="Internal: run in this process."
+        )
+
+    def handle(self, *args, **options):
+        lists, items, rounds = options["lists"], options["items"], options["rounds"]
+        if options["worker"]:
+            call_command("migrate", verbosity=0)
+            self.stdout.write(json.dumps({"results": _workload(lists, items, rounds)}))
+            return
+
+        results = run_on_scratch_database(
+            "bench_suggest",
+            [f"--lists={lists}", f"--items={items}", f"--rounds={rounds}"],
+        )["results"]
+        headers = list(results[0])
+        self.stdout.write(format_table(headers, [list(r.values()) for r in results]))
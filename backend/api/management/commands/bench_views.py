@@ -0,0 +1,135 @@
+"""
+Load test of the hot API endpoints, sync views versus native async views.
+
+For each mode, starts daphne with ``API_ASYNC_VIEWS`` set accordingly, creates
+a list of ``--items`` items, then sends ``--requests`` requests per scenario
+from ``--concurrency`` keep-alive clients and reports throughput and latency
+percentiles.
+
+    python manage.py bench_views --concurrency 32 --requests 2000
+
+The database must be a file (or server) database that daphne can share.
+"""
+import http.client
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from api.bench import HOST, daphne_processes, format_table, http_json, summarize
+
+MODES = {"sync": "False", "async": "True"}
+
+
+def _scenarios(list_id, item_ids):
+    """Return request factories ``(counter) -> (method, path, body)`` by name."""
+    items = itertools.cycle(item_ids)
+    return {
+        "get_list": lambda n: ("GET", f"/api/lists/{list_id}/", None),
+        "add_item": lambda n: (
+            "POST",
+            f"/api/lists/{list_id}/items/",
+            {"name": f"Article {n}"},
+        ),
+        "update_item": lambda n: (
+            "PATCH",
+            f"/api/items/{next(items)}/",
+            {"name": f"Renommé {n}"},
+        ),
+        "mixed": lambda n: (
+            ("GET", f"/api/lists/{list_id}/", None)
+            if n % 10 < 8
+            else ("PATCH", f"/api/items/{next(items)}/", {"name": f"Mix {n}"})
+        ),
+    }
+
+
+def _load(port, make_request, total, concurrency):
+    """Send ``total`` requests from ``concurrency`` clients; return stats."""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        conn = http.client.HTTPConnection(HOST, port, timeout=30)
+        while True:
+            with lock:
+                n = next(counter)
+                if n >= total:
+                    break
+                method, path, body = make_request(n)
+            started = time.perf_counter()
+            try:
+                status, _ = http_json(port, method, path, body, connection=conn)
+            except (OSError, http.client.HTTPException):
+                errors.append(n)
+                conn.close()
+                conn = http.client.HTTPConnection(HOST, port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(n)
+        conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - started
+    stats = summarize(latencies)
+    stats.update(rps=len(latencies) / elapsed, errors=len(errors))
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Compare throughput and p99 latency of the sync and async API views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--items", type=int, default=50)
+        parser.add_argument("--port", type=int, default=8750)
+        parser.add_argument(
+            "--scenarios",
+            default="get_list,add_item,update_item,mixed",
+            help="Comma-separated scenarios to run.",
+        )
+
+    def handle(self, *args, **options):
+        port = options["port"]
+        names = options["scenarios"].split(",")
+        rows = []
+        for mode, flag in MODES.items():
+            with daphne_processes([port], API_ASYNC_VIEWS=flag):
+                _, created = http_json(port, "POST", "/api/lists/", {})
+                list_id = created["list_id"]
+                item_ids = [
+                    http_json(
+                        port, "POST", f"/api/lists/{list_id}/items/", {"name": str(i)}
+                    )[1]["id"]
+                    for i in range(options["items"])
+                ]
+                scenarios = _scenarios(list_id, item_ids)
+                for name in names:
+                    if name not in scenarios:
+                        raise CommandError(f"Unknown scenario: {name}")
+                    stats = _load(
+                        port,
+                        scenarios[name],
+                        options["requests"],
+                        options["concurrency"],
+                    )
+                    rows.append(
+                        [
+                            name,
+                            mode,
+                            stats["rps"],
+                            stats["p50_ms"],
+                            stats["p99_ms"],
+                            stats["errors"],
+                        ]
+                    )
+
+        rows.sort(key=lambda row: names.index(row[0]))
+        headers = ["scenario", "mode", "req_per_s", "p50_ms", "p99_ms", "errors"]
+        self.stdout.write(format_table(headers, rows))
@@ -0,0 +1,124 @@
+"""
+Frame size and encode time of the WebSocket wire formats, per event type.
+
+Compares the default JSON text frames with the ``teamshop.msgpack.v1`` binary
+frames of ``api.wire``, raw and deflated (as with the permessage-deflate
+extension). Encode times are per frame: ``json`` renders the event as the
+publisher does, ``msgpack`` builds the binary frame from that JSON text as
+``ListConsumer`` does on a cache miss.
+
+    python manage.py bench_wire --iterations 2000
+"""
+import json
+import time
+import zlib
+from django.core.management.base import BaseCommand
+from api import wire
+from api.bench import format_table, sample_item
+from api.broadcast import encode_frame
+
+
+def _events():
+    """One published event of each type, as ``ListConsumer`` receives it."""
+    claimed = sample_item(7, "claimed", "Alice")
+    return {
+        "ITEM_ADDED": {
+            "type": "item_added",
+            "event": "ITEM_ADDED",
+            "item": sample_item(7),
+            "revision": 42,
+        },
+        "ITEM_UPDATED": {
+            "type": "item_updated",
+            "event": "ITEM_UPDATED",
+            "item": claimed,
+            "revision": 43,
+        },
+        "ITEM_DELETED": {
+            "type": "item_deleted",
+            "event": "ITEM_DELETED",
+            "item_id": 7,
+            "revision": 44,
+        },
+        "LIST_RESET": {
+            "type": "list_reset",
+            "event": "LIST_RESET",
+            "list_id": "AB12CD",
+            "deleted_ids": list(range(100, 120)),
+            "reset_ids": list(range(200, 210)),
+            "revision": 45,
+        },
+        "PSEUDO_RENAMED": {
+            "type": "pseudo_renamed",
+            "event": "PSEUDO_RENAMED",
+            "old_pseudo": "Alice",
+            "new_pseudo": "Alice B.",
+            "revision": 46,
+        },
+        "BATCH(40)": encode_frame(
+            [
+                {"event": "ITEM_ADDED", "item": sample_item(i), "revision": 47 + i}
+                for i in range(40)
+            ]
+        ),
+    }
+
+
+def _deflated(data):
+    compressor = zlib.compressobj(wbits=-15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+def _per_frame_us(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare JSON and MessagePack WebSocket frames by size and encode time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=2000, help="Encodes per timing."
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        encode = wire.binary_frame.__wrapped__  # Bypass the per-frame cache
+        rows = []
+        for name, event in _events().items():
+            if event.get("type") == "list_frame":
+                text = event["text"]
+                messages = json.loads(text)["events"]
+                render = lambda: encode_frame(messages)  # noqa: E731
+            else:
+                text = encode_frame([event])["text"]
+                render = lambda: encode_frame([event])  # noqa: E731
+            data = text.encode()
+            binary = encode(text)
+            rows.append(
+                [
+                    name,
+                    len(data),
+                    len(binary),
+                    f"{len(binary) / len(data):.0%}",
+                    _deflated(data),
+                    _deflated(binary),
+                    _per_frame_us(render, iterations),
+                    _per_frame_us(lambda: encode(text), iterations),
+                ]
+            )
+
+        headers = [
+            "event",
+            "json_bytes",
+            "msgpack_bytes",
+            "ratio",
+            "json_deflate",
+            "msgpack_deflate",
+            "json_us",
+            "msgpack_us",
+        ]
+        self.stdout.write(format_table(headers, rows))
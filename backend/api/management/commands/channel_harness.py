@@ -0,0 +1,157 @@
+"""
+End-to-end check of the cross-process channel layer.
+
+Starts several daphne processes on consecutive ports, all sharing the current
+database and ``CHANNEL_LAYER=database``, opens a WebSocket on each of them, then
+adds items through every process in turn and checks that every socket sees
+every ``ITEM_ADDED`` event, whichever process handled the write. Finally every
+process serves the list, one more item is added through the first one, and all
+of them must then serve the same fresh snapshot and ETag.
+
+    python manage.py channel_harness --processes 3 --items 20
+
+The database must be reachable from several processes (PostgreSQL or a file
+SQLite database, not ``:memory:``) and already migrated.
+"""
+import asyncio
+import http.client
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api.bench import HOST, daphne_processes, format_table, http_json, summarize
+from api.wsclient import connect
+
+
+def _get_snapshot(port, path, etag=None):
+    """GET a list snapshot and return ``(status, etag, body)``."""
+    conn = http.client.HTTPConnection(HOST, port, timeout=10)
+    conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+    response = conn.getresponse()
+    content = response.read()
+    conn.close()
+    return response.status, response.getheader("ETag"), content
+
+
+def _check_snapshots(ports, list_id, items):
+    """
+    Have every process serve (and cache) the list, add one more item through
+    the first process, then check every process serves the new snapshot with
+    the same ETag. Returns the problems found.
+    """
+    path = f"/api/lists/{list_id}/"
+    stale_etags = {_get_snapshot(port, path)[1] for port in ports}
+    http_json(ports[0], "POST", f"{path}items/", {"name": "harness-last"})
+    items += 1
+
+    answers = {port: _get_snapshot(port, path) for port in ports}
+    problems = []
+    etags = {etag for _, etag, _ in answers.values()}
+    if len(etags) != 1:
+        problems.append(f"processes disagree on the ETag: {sorted(etags)}")
+    for port, (status, etag, content) in answers.items():
+        data = json.loads(content) if status == 200 else {}
+        if len(data.get("items", ())) != items:
+            problems.append(
+                f"port {port} served {len(data.get('items', ()))} items "
+                f"of {items} (status {status})"
+            )
+        if status == 200 and etag != f'"{list_id}-{data["revision"]}"':
+            problems.append(f"port {port} served revision {data['revision']} as {etag}")
+        if _get_snapshot(port, path, etag)[0] != 304:
+            problems.append(f"port {port} did not answer its own ETag with 304")
+        for stale in stale_etags:
+            if _get_snapshot(port, path, stale)[0] != 200:
+                problems.append(f"port {port} answered the stale ETag {stale} with 304")
+    return problems
+
+
+async def _collect(client, names, received, timeout):
+    """Record when each expected item name reaches this client."""
+    deadline = time.monotonic() + timeout
+    while names - received.keys():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            text = await asyncio.wait_for(client.recv(), remaining)
+        except asyncio.TimeoutError:
+            return
+        data = json.loads(text)
+        events = data["events"] if data.get("event") == "BATCH" else [data]
+        for event in events:
+            if event.get("event") == "ITEM_ADDED":
+                received.setdefault(event["item"]["name"], time.monotonic())
+
+
+async def _run(ports, list_id, items, timeout):
+    path = f"/ws/lists/{list_id}/"
+    clients = [await connect(HOST, port, path) for port in ports]
+    names = {f"harness-{i}" for i in range(items)}
+    received = [{} for _ in ports]
+    collectors = [
+        asyncio.create_task(_collect(client, names, seen, timeout))
+        for client, seen in zip(clients, received)
+    ]
+
+    sent = {}
+    for i in range(items):
+        name = f"harness-{i}"
+        port = ports[i % len(ports)]
+        sent[name] = (port, time.monotonic())
+        await asyncio.to_thread(
+            http_json, port, "POST", f"/api/lists/{list_id}/items/", {"name": name}
+        )
+
+    await asyncio.gather(*collectors)
+    for client in clients:
+        await client.close()
+    return sent, received
+
+
+class Command(BaseCommand):
+    help = "Run several daphne processes and check events reach every one of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=3)
+        parser.add_argument("--items", type=int, default=20)
+        parser.add_argument("--port", type=int, default=8700, help="First port.")
+        parser.add_argument(
+            "--timeout", type=float, default=10.0, help="Seconds to wait for events."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and ":memory:" in str(
+            settings.DATABASES["default"]["NAME"]
+        ):
+            raise CommandError("An in-memory SQLite database cannot be shared.")
+
+        ports = [options["port"] + i for i in range(options["processes"])]
+        with daphne_processes(ports, CHANNEL_LAYER="database"):
+            _, created = http_json(ports[0], "POST", "/api/lists/", {})
+            list_id = created["list_id"]
+            sent, received = asyncio.run(
+                _run(ports, list_id, options["items"], options["timeout"])
+            )
+            problems = _check_snapshots(ports, list_id, options["items"])
+
+        rows = []
+        missing = 0
+        for port, seen in zip(ports, received):
+            latencies = [seen[name] - sent[name][1] for name in seen]
+            lost = len(sent) - len(seen)
+            missing += lost
+            stats = summarize(latencies)
+            rows.append([port, len(seen), lost, stats["p50_ms"], stats["p99_ms"]])
+        self.stdout.write(
+            format_table(["port", "received", "missing", "p50_ms", "p99_ms"], rows)
+        )
+        if missing:
+            raise CommandError(f"{missing} events did not reach every process.")
+        self.stdout.write(self.style.SUCCESS("Every process received every event."))
+        if problems:
+            raise CommandError("Stale snapshots: " + "; ".join(problems))
+        self.stdout.write(
+            self.style.SUCCESS("Every process served the same fresh snapshot and ETag.")
+        )
@@ -0,0 +1,56 @@
+"""
+Fill the database with synthetic shopping lists.
+
+    python manage.py generate_data --lists 20 --min-items 10 --max-items 10000
+    python manage.py generate_data --sizes 10,100,1000,10000 --pseudos 40
+
+List sizes are drawn log-uniformly between ``--min-items`` and ``--max-items``
+(so small lists are as common as large ones), unless ``--sizes`` gives them
+explicitly. ``--seed`` makes a run repeatable.
+"""
+import math
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.datagen import generate_list, pseudo_pool
+
+
+class Command(BaseCommand):
+    help = "Generate shopping lists with realistic items, statuses and pseudos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lists", type=int, default=10)
+        parser.add_argument("--min-items", type=int, default=10)
+        parser.add_argument("--max-items", type=int, default=10000)
+        parser.add_argument(
+            "--sizes", help="Comma-separated list sizes; overrides --lists."
+        )
+        parser.add_argument("--pseudos", type=int, default=12)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["sizes"]:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        else:
+            low, high = options["min_items"], options["max_items"]
+            if not 0 < low <= high:
+                raise CommandError("Expected 0 < --min-items <= --max-items.")
+            sizes = [
+                round(math.exp(rng.uniform(math.log(low), math.log(high))))
+                for _ in range(options["lists"])
+            ]
+        pseudos = pseudo_pool(options["pseudos"], rng)
+
+        started = time.perf_counter()
+        for size in sizes:
+            with transaction.atomic():
+                shopping_list = generate_list(size, pseudos, rng)
+            self.stdout.write(f"{shopping_list.list_id}  {size} items")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(sizes)} lists, {sum(sizes)} items "
+                f"in {time.perf_counter() - started:.1f}s."
+            )
+        )
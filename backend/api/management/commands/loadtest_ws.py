@@ -0,0 +1,75 @@
+"""
+WebSocket fan-out load test: N lists x M subscribers.
+
+Opens the sockets, adds items to every list through the HTTP API and reports
+end-to-end delivery latency, dropped messages and server memory per
+connection, either in-process (``channels.testing`` communicators) or against
+a daphne process over real sockets.
+
+    python manage.py loadtest_ws --lists 10 --subscribers 50 --mutations 20
+    python manage.py loadtest_ws --transport daphne --lists 4 --subscribers 250
+
+The daphne transport needs a database the server process can share.
+"""
+import asyncio
+from django.core.management.base import BaseCommand
+from api.bench import daphne_processes, format_table
+from api.loadtest import CommunicatorTransport, DaphneTransport, run_fanout
+
+COLUMNS = [
+    "connections",
+    "delivered",
+    "dropped",
+    "failed_requests",
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "max_ms",
+    "kib_per_connection",
+]
+
+
+class Command(BaseCommand):
+    help = "Measure WebSocket fan-out latency, drops and memory per connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--transport",
+            choices=["communicator", "daphne", "both"],
+            default="communicator",
+        )
+        parser.add_argument("--lists", type=int, default=10)
+        parser.add_argument("--subscribers", type=int, default=20)
+        parser.add_argument("--mutations", type=int, default=10)
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=10.0,
+            help="Idle seconds before a socket's missing events count as dropped.",
+        )
+        parser.add_argument("--port", type=int, default=8760)
+
+    def handle(self, *args, **options):
+        scenario = (
+            options["lists"],
+            options["subscribers"],
+            options["mutations"],
+            options["timeout"],
+        )
+        transports = (
+            ["communicator", "daphne"]
+            if options["transport"] == "both"
+            else [options["transport"]]
+        )
+        rows = []
+        for name in transports:
+            if name == "communicator":
+                stats = asyncio.run(run_fanout(CommunicatorTransport(), *scenario))
+            else:
+                port = options["port"]
+                with daphne_processes([port]) as (process,):
+                    transport = DaphneTransport(port, process.pid)
+                    stats = asyncio.run(run_fanout(transport, *scenario))
+            rows.append([name] + [stats[column] for column in COLUMNS])
+
+        self.stdout.write(format_table(["transport"] + COLUMNS, rows))
@@ -0,0 +1,67 @@
+"""
+Report the slowest imports of a cold start of ``teamshop.asgi``.
+
+Starts ``--runs`` fresh interpreters with ``-X importtime`` (see
+``api.startup``), each importing the ASGI application and serving a first
+request, and prints the median time of the slowest modules, by time spent in
+the module itself (``self_ms``) and with the imports it triggered
+(``cumulative_ms``), then the same grouped by package.
+
+    python manage.py profile_startup --runs 5 --top 25
+    python manage.py profile_startup --lean   # with LEAN_STARTUP=True
+"""
+import statistics
+from collections import Counter
+from django.core.management.base import BaseCommand
+from api import startup
+from api.bench import format_table
+
+
+class Command(BaseCommand):
+    help = "Profile the imports of a cold start of the ASGI application."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--top", type=int, default=25)
+        parser.add_argument(
+            "--lean", action="store_true", help="Profile the lean startup profile."
+        )
+
+    def handle(self, *args, **options):
+        env = {"LEAN_STARTUP": "True"} if options["lean"] else {}
+        with startup.migrated_database() as url:
+            runs = [
+                startup.cold_start(url, importtime=True, **env)
+                for _ in range(options["runs"])
+            ]
+        imports = startup.median_imports(runs)
+        top = options["top"]
+
+        self.stdout.write(
+            "Median of {} cold starts: import {:.1f} ms, first request {:.1f} ms, "
+            "{} modules\n".format(
+                len(runs),
+                statistics.median(run["import_ms"] for run in runs),
+                statistics.median(run["request_ms"] for run in runs),
+                len(imports),
+            )
+        )
+        slowest = sorted(imports.items(), key=lambda entry: -entry[1][0])[:top]
+        self.stdout.write(
+            format_table(
+                ["module", "self_ms", "cumulative_ms"],
+                [[module, *times] for module, times in slowest],
+            )
+        )
+
+        packages, counts = Counter(), Counter()
+        for module, (self_ms, _) in imports.items():
+            packages[startup.package_of(module)] += self_ms
+            counts[startup.package_of(module)] += 1
+        self.stdout.write("")
+        self.stdout.write(
+            format_table(
+                ["package", "modules", "self_ms"],
+                [[name, counts[name], ms] for name, ms in packages.most_common(top)],
+            )
+        )
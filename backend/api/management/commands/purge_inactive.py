@@ -0,0 +1,53 @@
+"""
+Delete inactive shopping lists, with their items and events, and old sessions.
+
+    python manage.py purge_inactive --dry-run
+    python manage.py purge_inactive --list-days 60 --batch-size 200
+
+Defaults come from ``settings.LIST_RETENTION``; see ``api.retention`` for how
+activity is tracked and how deletion is batched.
+"""
+import time
+from django.core.management.base import BaseCommand
+from api import retention
+
+
+class Command(BaseCommand):
+    help = "Delete lists and sessions past their retention period, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count what would be deleted."
+        )
+        parser.add_argument("--list-days", type=int)
+        parser.add_argument("--empty-list-days", type=int)
+        parser.add_argument("--session-days", type=int)
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--pause", type=float, help="Seconds to wait between batches."
+        )
+
+    def handle(self, *args, **options):
+        config = retention.get_config(
+            LIST_DAYS=options["list_days"],
+            EMPTY_LIST_DAYS=options["empty_list_days"],
+            SESSION_DAYS=options["session_days"],
+            BATCH_SIZE=options["batch_size"],
+            PAUSE=options["pause"],
+        )
+        if options["dry_run"]:
+            counts = retention.stats(config)
+            self.stdout.write(
+                "Would delete " + ", ".join(f"{n} {t}" for t, n in counts.items())
+            )
+            return
+
+        started = time.perf_counter()
+        counts = retention.collect(config)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Deleted "
+                + ", ".join(f"{n} {t}" for t, n in counts.items())
+                + f" in {time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,363 @@
+"""
+Process metrics in the Prometheus text exposition format.
+Following SOLID principles - hot paths only bump preallocated counters, the
+``/api/metrics/`` view alone aggregates and renders them.
+
+Every metric keeps one value array per thread, written only by that thread, so
+recording a sample takes no lock and allocates nothing: a bucket lookup and an
+in-place increment. A scrape sums the arrays of all threads. Values such as
+queue depths that are cheap to read on demand are gauges with a callback,
+evaluated only when scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow resets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100)
+
+
+class _Series:
+    """Values of one label set, kept as one array per writing thread."""
+
+    __slots__ = ("size", "_local", "_arrays")
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._arrays = []
+
+    def values(self):
+        """This thread's array, created on its first write."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0] * self.size
+            # list.append is atomic; scrapes may run concurrently
+            self._arrays.append(values)
+            return values
+
+    def totals(self):
+        totals = [0] * self.size
+        for values in list(self._arrays):
+            for index, value in enumerate(values):
+                totals[index] += value
+        return totals
+
+
+class _Metric:
+    kind = None
+    size = 1
+
+    def __init__(self, name, documentation, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._series = {}
+        self._unlabelled = None if label else self._new_series()
+        REGISTRY.append(self)
+
+    def _new_series(self):
+        return _Series(self.size)
+
+    def _get(self, value):
+        """Series of a label value; the unlabelled series when there is no label."""
+        if value is None:
+            return self._unlabelled
+        series = self._series.get(value)
+        if series is None:
+            series = self._series.setdefault(value, self._new_series())
+        return series
+
+    def _samples(self):
+        """Yield ``(label_value, totals)`` pairs, skipping empty series."""
+        if self._unlabelled is not None:
+            yield None, self._unlabelled.totals()
+        for value, series in list(self._series.items()):
+            totals = series.totals()
+            if any(totals):
+                yield value, totals
+
+    def _labels(self, value, extra=""):
+        pairs = [f'{self.label}="{_escape(value)}"'] if value is not None else []
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for value, totals in self._samples():
+            lines.extend(self._render_series(value, totals))
+        return lines
+
+    def _render_series(self, value, totals):
+        return [f"{self.name}{self._labels(value)} {_number(totals[0])}"]
+
+
+class Counter(_Metric):
+    """Monotonic total, optionally split by one label."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, label=None):
+        self._get(label).values()[0] += amount
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. With ``collect``, the value is read from the
+    callback at scrape time instead; it returns a number or a dict of label
+    values to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, label=None, collect=None):
+        super().__init__(name, documentation, label)
+        self.collect = collect
+
+    def inc(self, amount=1, label=None):
+        self._get(label).values()[0] += amount
+
+    def dec(self, amount=1, label=None):
+        self._get(label).values()[0] -= amount
+
+    def _samples(self):
+        if self.collect is None:
+            yield from super()._samples()
+            return
+        collected = self.collect()
+        if isinstance(collected, dict):
+            for value, number in collected.items():
+                yield value, [number]
+        else:
+            yield None, [collected]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds, plus sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, label=None):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf and one for the sum
+        self.size = len(self.buckets) + 2
+        super().__init__(name, documentation, label)
+
+    def observe(self, amount, label=None):
+        values = self._get(label).values()
+        values[bisect_left(self.buckets, amount)] += 1
+        values[-1] += amount
+
+    def _render_series(self, value, totals):
+        lines = []
+        cumulative = 0
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, totals):
+            cumulative += count
+            labels = self._labels(value, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = self._labels(value)
+        lines.append(f"{self.name}_sum{labels} {_number(totals[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = []
+
+
+def render():
+    """Return every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Metrics
+
+http_request_duration = Histogram(
+    "teamshop_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by view.",
+    label="view",
+)
+db_queries_per_request = Histogram(
+    "teamshop_db_queries_per_request",
+    "Database queries run by one HTTP request, by view.",
+    buckets=QUERY_BUCKETS,
+    label="view",
+)
+db_time_per_request = Histogram(
+    "teamshop_db_query_duration_seconds_per_request",
+    "Time spent in database queries by one HTTP request, by view.",
+    label="view",
+)
+group_send_duration = Histogram(
+    "teamshop_group_send_duration_seconds",
+    "Time taken by channel layer group_send for one broadcast frame.",
+)
+websocket_connections = Gauge(
+    "teamshop_websocket_connections",
+    "Open WebSocket connections.",
+)
+websocket_rejections = Counter(
+    "teamshop_websocket_rejected_total",
+    "WebSocket connections refused by admission control, by limit reached.",
+    label="reason",
+)
+websocket_evictions = Counter(
+    "teamshop_websocket_evictions_total",
+    "WebSocket connections closed by the server: slow, overflow or idle.",
+    label="reason",
+)
+websocket_frames_dropped = Counter(
+    "teamshop_websocket_frames_dropped_total",
+    "Frames discarded from the send queue of evicted WebSocket connections.",
+)
+channel_messages_dropped = Counter(
+    "teamshop_channel_layer_messages_dropped_total",
+    "Channel layer messages dropped because a channel was at capacity.",
+)
+write_group_size = Histogram(
+    "teamshop_write_group_size",
+    "Service writes committed together by the single-writer queue.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+retention_rows_deleted = Counter(
+    "teamshop_retention_rows_deleted_total",
+    "Rows deleted by the retention of inactive lists, by table.",
+    label="table",
+)
+
+
+def _channel_layer_depth():
+    from channels.layers import get_channel_layer
+
+    queues = getattr(get_channel_layer(), "channels", {})
+    return sum(queue.qsize() for queue in list(queues.values()))
+
+
+def _websocket_lists():
+    from .admission import limiter
+
+    return len(limiter.groups)
+
+
+def _dispatcher_depth():
+    from .broadcast import dispatcher
+
+    return dispatcher.backlog
+
+
+channel_layer_queue_depth = Gauge(
+    "teamshop_channel_layer_queue_depth",
+    "Messages waiting in the channel layer queues of this process.",
+    collect=_channel_layer_depth,
+)
+websocket_lists = Gauge(
+    "teamshop_websocket_lists",
+    "Lists with at least one WebSocket connection open on this process.",
+    collect=_websocket_lists,
+)
+broadcast_queue_depth = Gauge(
+    "teamshop_broadcast_queue_depth",
+    "Committed broadcast batches waiting for the dispatcher.",
+    collect=_dispatcher_depth,
+)
+
+
+# Per-request database accounting
+
+# [queries, seconds] of the current request. A context variable follows the
+# request into the threads of sync_to_async, so async views are covered too.
+_request_db = ContextVar("request_db", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper installed on every connection."""
+    totals = _request_db.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver adding ``record_query`` to a connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """Records latency and database usage of every request, for sync and async views."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _request_db.reset(token)
+            self._record(request, time.perf_counter() - started, totals)
+
+    async def _acall(self, request):
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+            self._record(request, time.perf_counter() - started, totals)
+
+    @staticmethod
+    def _record(request, elapsed, totals):
+        match = getattr(request, "resolver_match", None)
+        view = (match and match.url_name) or "other"
+        http_request_duration.observe(elapsed, view)
+        db_queries_per_request.observe(totals[0], view)
+        db_time_per_request.observe(totals[1], view)
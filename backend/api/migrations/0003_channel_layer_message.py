@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_list_revision"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChannelLayerMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("group", models.CharField(blank=True, max_length=100)),
+                ("channel", models.CharField(blank=True, max_length=100)),
+                ("origin", models.CharField(max_length=32)),
+                ("payload", models.TextField()),
+                ("expires_at", models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
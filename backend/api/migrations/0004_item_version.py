@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_channel_layer_message"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_item_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["shopping_list", "created_at", "id"],
+                name="item_list_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["shopping_list", "status"], name="item_list_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["shopping_list", "claimed_by", "status"],
+                name="item_list_claimer_idx",
+            ),
+        ),
+        # Covered by the composite indexes above
+        migrations.AlterField(
+            model_name="item",
+            name="shopping_list",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="items",
+                to="api.shoppinglist",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:46
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_last_active(apps, schema_editor):
+    """Existing lists were last active at their latest item write or event."""
+    ShoppingList = apps.get_model("api", "ShoppingList")
+    Item = apps.get_model("api", "Item")
+    ListEvent = apps.get_model("api", "ListEvent")
+
+    def latest(model, field):
+        rows = model.objects.filter(shopping_list=OuterRef("pk")).order_by()
+        return Subquery(
+            rows.values("shopping_list").annotate(latest=Max(field)).values("latest")
+        )
+
+    # GREATEST returns NULL on SQLite as soon as one argument is NULL.
+    ShoppingList.objects.update(
+        last_active_at=Greatest(
+            "created_at",
+            Coalesce(latest(Item, "updated_at"), "created_at"),
+            Coalesce(latest(ListEvent, "created_at"), "created_at"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_item_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoppinglist",
+            name="last_active_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.RunPython(backfill_last_active, migrations.RunPython.noop),
+    ]
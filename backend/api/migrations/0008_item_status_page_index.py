@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_list_code_counter"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="item",
+            name="item_list_status_idx",
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                fields=["shopping_list", "status", "created_at", "id"],
+                name="item_list_status_idx",
+            ),
+        ),
+    ]
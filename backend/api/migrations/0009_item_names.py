@@ -0,0 +1,86 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:26
+
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize(name):
+    """Frozen copy of ``api.suggest.normalize`` as of this migration."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())[:255]
+
+
+def backfill_item_names(apps, schema_editor):
+    """Count the names of existing items, list by list."""
+    Item = apps.get_model("api", "Item")
+    ItemName = apps.get_model("api", "ItemName")
+
+    def flush(list_pk, counts):
+        ItemName.objects.bulk_create(
+            [
+                ItemName(shopping_list_id=list_pk, normalized=key, name=name, count=n)
+                for key, (name, n) in counts.items()
+            ],
+            batch_size=500,
+        )
+
+    list_pk, counts = None, {}
+    items = Item.objects.order_by("shopping_list", "created_at", "pk")
+    for pk, name in items.values_list("shopping_list", "name").iterator(2000):
+        if pk != list_pk:
+            flush(list_pk, counts)
+            list_pk, counts = pk, {}
+        key = normalize(name)
+        if key:
+            counts[key] = (name, counts.get(key, (None, 0))[1] + 1)
+    flush(list_pk, counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_item_status_page_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemName",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("normalized", models.CharField(max_length=255)),
+                ("name", models.CharField(max_length=255)),
+                ("count", models.PositiveIntegerField(default=1)),
+                (
+                    "shopping_list",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="item_names",
+                        to="api.shoppinglist",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["normalized"], name="item_name_normalized_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("shopping_list", "normalized"),
+                        name="unique_list_item_name",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_item_names, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,11 @@
-import string
-import random
 from django.db import models
+from django.utils import timezone
+from .list_ids import allocator
 
 
 def generate_list_code():
     """Generate a unique 6-character alphanumeric code for a shopping list."""
-    return "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    return allocator.next_code()
 
 
 class ShoppingList(models.Model):
@@ -15,6 +15,12 @@ class ShoppingList(models.Model):
         max_length=6, unique=True, default=generate_list_code, editable=False
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Incremented for every broadcast event, see api.events
+    revision = models.PositiveBigIntegerField(default=0)
+    # Last write or WebSocket connection, see api.retention
+    last_active_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Set once retention has started deleting the list, see api.retention
+    purging = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["-created_at"]
@@ -32,22 +38,106 @@ class Item(models.Model):
         ("bought", "Bought"),
     ]
 
+    # Indexed through the composite indexes below, which all start with it
     shopping_list = models.ForeignKey(
-        ShoppingList, on_delete=models.CASCADE, related_name="items"
+        ShoppingList, on_delete=models.CASCADE, related_name="items", db_index=False
     )
     name = models.CharField(max_length=255)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
     claimed_by = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every write, for compare-and-swap updates (see ItemService)
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # Items of a list in display order (nested list serializer)
+            models.Index(
+                fields=["shopping_list", "created_at", "id"],
+                name="item_list_created_idx",
+            ),
+            # reset_list: bought and claimed items of a list; items of a list
+            # with one status in display order (paginated listing)
+            models.Index(
+                fields=["shopping_list", "status", "created_at", "id"],
+                name="item_list_status_idx",
+            ),
+            # rename_pseudo: items of a list claimed by a pseudo
+            models.Index(
+                fields=["shopping_list", "claimed_by", "status"],
+                name="item_list_claimer_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.status})"
 
 
+class ItemName(models.Model):
+    """How often a name was added to a list; feeds autocomplete, see api.suggest."""
+
+    shopping_list = models.ForeignKey(
+        ShoppingList,
+        on_delete=models.CASCADE,
+        related_name="item_names",
+        db_index=False,
+    )
+    # Lookup key, see api.suggest.normalize
+    normalized = models.CharField(max_length=255)
+    # Spelling of the last item added under this key
+    name = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shopping_list", "normalized"], name="unique_list_item_name"
+            )
+        ]
+        indexes = [
+            # Global suggestions: lists per name
+            models.Index(fields=["normalized"], name="item_name_normalized_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} x{self.count}"
+
+
+class ListEvent(models.Model):
+    """A broadcast event kept so reconnecting clients can catch up."""
+
+    shopping_list = models.ForeignKey(
+        ShoppingList, on_delete=models.CASCADE, related_name="events"
+    )
+    revision = models.PositiveBigIntegerField()
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["revision"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shopping_list", "revision"], name="unique_list_revision"
+            )
+        ]
+
+    def __str__(self):
+        return f"Event {self.revision} of list {self.shopping_list_id}"
+
+
+class ListCodeCounter(models.Model):
+    """Counter behind list codes; see api.list_ids. Holds a single row."""
+
+    value = models.PositiveBigIntegerField(default=0)
+    # Random start of the sequence, drawn when the row is created
+    offset = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"List codes allocated: {self.value}"
+
+
 class UserSession(models.Model):
     """Tracks anonymous users via session identifiers."""
 
@@ -57,3 +147,16 @@ class UserSession(models.Model):
 
     def __str__(self):
         return f"Session {self.session_key} - {self.pseudo or 'Anonymous'}"
+
+
+class ChannelLayerMessage(models.Model):
+    """A channel layer message handed from one server process to the others."""
+
+    group = models.CharField(max_length=100, blank=True)
+    channel = models.CharField(max_length=100, blank=True)
+    origin = models.CharField(max_length=32)
+    payload = models.TextField()
+    expires_at = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"Message {self.id} to {self.group or self.channel}"
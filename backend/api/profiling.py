@@ -0,0 +1,379 @@
+"""
+On-demand profiling of HTTP requests and WebSocket commands.
+Following SOLID principles - selection, profiling and reporting live here; the
+rest of the code only marks timed sections with ``timed()``.
+
+Enable it with ``settings.REQUEST_PROFILING["ENABLED"]``. A request is then
+profiled when it sends ``X-Profile: <TOKEN>``, or at random with probability
+``RATE``. WebSocket commands are profiled when the socket was opened with
+``?profile=<TOKEN>``, or at ``RATE``. Each profiled request or command writes
+to ``DIR``:
+
+- ``<id>.json``: method, path, status, duration, time per section and every
+  SQL query with its duration
+- ``<id>.prof`` (cProfile, open with ``pstats`` or snakeviz) or
+  ``<id>.folded`` (sampling profiler, collapsed stacks for flame graphs)
+
+Only the newest ``KEEP`` profiles are kept. Profiled HTTP responses carry a
+``Server-Timing`` header (``db``, ``serialize``, ``broadcast``, ``app``) and an
+``X-Profile-Id`` header naming the files.
+
+When disabled, the middleware removes itself from the chain, the consumer is
+not wrapped, no execute wrapper is installed, and ``timed()`` is a context
+variable lookup returning a shared no-op.
+"""
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from urllib.parse import parse_qs
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    "ENABLED": False,
+    "RATE": 0.0,
+    "TOKEN": None,
+    "PROFILER": "cprofile",
+    "DIR": "profiles",
+    "KEEP": 200,
+    "SAMPLE_INTERVAL": 0.001,
+}
+# Sections reported in Server-Timing, in order
+SECTIONS = ("db", "serialize", "broadcast")
+
+_session = ContextVar("profile_session", default=None)
+_sequence = itertools.count(1)
+
+
+def get_config():
+    """Return ``settings.REQUEST_PROFILING`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "REQUEST_PROFILING", {})}
+
+
+# Timed sections
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    __slots__ = ("session", "name", "started")
+
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.session.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timed(name):
+    """
+    Context manager adding the time spent in its block to section ``name`` of
+    the profile being recorded, if any.
+    """
+    session = _session.get()
+    return _NO_TIMER if session is None else _Timer(session, name)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """DRF JSON renderer whose rendering counts as ``serialize`` time."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("serialize"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def capture_query(execute, sql, params, many, context):
+    """Execute wrapper recording the SQL of profiled requests."""
+    session = _session.get()
+    if session is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        session.add_query(sql, time.perf_counter() - started, many)
+
+
+def _install_capture(sender, connection, **kwargs):
+    if capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_query)
+
+
+def install_query_capture():
+    """Capture SQL on every connection; only called when profiling is enabled."""
+    connection_created.connect(_install_capture)
+    for connection in connections.all(initialized_only=True):
+        _install_capture(None, connection)
+
+
+# Profilers
+
+
+class CProfiler:
+    """Deterministic profile of the current thread."""
+
+    extension = ".prof"
+
+    def __init__(self, config):
+        # Imported here: cProfile loads the pure Python profile module, which
+        # is slow to import and unused by processes that never profile.
+        import cProfile
+
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    """
+    Samples the stack of the current thread every ``SAMPLE_INTERVAL`` seconds
+    from a helper thread. The profiled code runs at full speed; the result is
+    a collapsed-stack file for flame graph tools.
+    """
+
+    extension = ".folded"
+
+    def __init__(self, config):
+        self.interval = config["SAMPLE_INTERVAL"]
+        self.stacks = Counter()
+        self._stop = threading.Event()
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+PROFILERS = {"cprofile": CProfiler, "sampling": StackSampler}
+
+
+# Sessions
+
+
+class ProfileSession:
+    """One profiled request or command: section times, SQL and a profiler."""
+
+    def __init__(self, config, method, path):
+        self.config = config
+        self.method = method
+        self.path = path
+        self.times = dict.fromkeys(SECTIONS, 0.0)
+        self.queries = []
+        self.profiler = PROFILERS[config["PROFILER"]](config)
+        self.profile_id = self._new_id()
+
+    def _new_id(self):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", self.path).strip("_")[:60]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return f"{stamp}-{next(_sequence):06d}-{self.method}-{slug}"
+
+    def add_time(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def add_query(self, sql, seconds, many):
+        self.times["db"] += seconds
+        self.queries.append({"sql": sql, "ms": round(seconds * 1000, 3), "many": many})
+
+    def start(self):
+        self.token = _session.set(self)
+        self.started = time.perf_counter()
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+        self.duration = time.perf_counter() - self.started
+        _session.reset(self.token)
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` profiled in the current thread and return its result."""
+        self.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.stop()
+
+    def server_timing(self):
+        """``Server-Timing`` header value, durations in milliseconds."""
+        parts = [f"{name};dur={self.times[name] * 1000:.2f}" for name in self.times]
+        parts[0] += f';desc="{len(self.queries)} queries"'
+        parts.append(f"app;dur={self.duration * 1000:.2f}")
+        return ", ".join(parts)
+
+    def save(self, status, view=None):
+        """Write the report and the profile, then drop the oldest profiles."""
+        directory = Path(self.config["DIR"])
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = directory / self.profile_id
+        self.profiler.dump(str(stem) + self.profiler.extension)
+        report = {
+            "method": self.method,
+            "path": self.path,
+            "view": view,
+            "status": status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "timings_ms": {k: round(v * 1000, 3) for k, v in self.times.items()},
+            "queries": self.queries,
+            "profile": stem.name + self.profiler.extension,
+        }
+        with open(str(stem) + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        _rotate(directory, self.config["KEEP"])
+
+
+def _rotate(directory, keep):
+    # Ids start with a timestamp and a sequence number, so they sort by age.
+    stems = sorted({path.stem for path in directory.glob("*.json")})
+    for stem in stems[: max(len(stems) - keep, 0)]:
+        for path in directory.glob(f"{stem}.*"):
+            path.unlink(missing_ok=True)
+
+
+# HTTP
+
+
+class ProfilingMiddleware:
+    """Profiles selected requests and adds ``Server-Timing`` to their responses."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config["ENABLED"]:
+            raise MiddlewareNotUsed
+        install_query_capture()
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _selected(self, request):
+        token = self.config["TOKEN"]
+        if token and request.headers.get("X-Profile") == token:
+            return True
+        return random.random() < self.config["RATE"]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        if not self._selected(request):
+            return self.get_response(request)
+        session = ProfileSession(self.config, request.method, request.path)
+        response = session.call(self.get_response, request)
+        return self._finish(session, request, response)
+
+    async def _acall(self, request):
+        if not self._selected(request):
+            return await self.get_response(request)
+        session = ProfileSession(self.config, request.method, request.path)
+        session.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            session.stop()
+        return self._finish(session, request, response)
+
+    @staticmethod
+    def _finish(session, request, response):
+        match = getattr(request, "resolver_match", None)
+        session.save(response.status_code, match and match.url_name)
+        response["Server-Timing"] = session.server_timing()
+        response["X-Profile-Id"] = session.profile_id
+        return response
+
+
+# WebSocket
+
+
+def profile_consumer(consumer_class):
+    """
+    Return a subclass of ``consumer_class`` that profiles selected commands.
+    The consumer must run its commands through ``run_command(message)``.
+    """
+    install_query_capture()
+
+    class ProfiledConsumer(consumer_class):
+        async def connect(self):
+            self.profile_config = get_config()
+            query = parse_qs(self.scope.get("query_string", b"").decode())
+            token = self.profile_config["TOKEN"]
+            self.profile_all = bool(token) and query.get("profile") == [token]
+            await super().connect()
+
+        async def run_command(self, message):
+            config = self.profile_config
+            if not (self.profile_all or random.random() < config["RATE"]):
+                return await super().run_command(message)
+            session = ProfileSession(
+                config, "WS", f"{self.scope['path']}{message.get('action')}"
+            )
+            # Profile the worker thread that runs the command, not the loop.
+            profiled = database_sync_to_async(session.call)
+            ack = await profiled(self.execute, message)
+            await sync_to_async(session.save, thread_sensitive=False)(
+                ack.get("status", 200), message.get("action")
+            )
+            return ack
+
+    ProfiledConsumer.__name__ = f"Profiled{consumer_class.__name__}"
+    ProfiledConsumer.__qualname__ = ProfiledConsumer.__name__
+    return ProfiledConsumer
@@ -0,0 +1,235 @@
+"""
+Retention of abandoned shopping lists and anonymous sessions.
+Following SOLID principles - expiry rules and deletion live apart from the
+request path, which only records activity.
+
+A list is active when it is written to (``events.record_event`` stamps
+``ShoppingList.last_active_at`` in the same UPDATE as the revision) or when a
+WebSocket connects to it (``touch_list``, at most once per ``TOUCH_INTERVAL``
+and process, see ``touch_due``). Lists inactive for ``LIST_DAYS``, or for
+``EMPTY_LIST_DAYS`` when nothing was ever added to them, are deleted with their
+items, events and autocomplete names.
+``UserSession`` rows older than ``SESSION_DAYS`` are deleted too.
+
+A list is first marked ``purging`` by an UPDATE that re-checks it is still
+inactive, in a transaction of its own. Its items, events and names are then
+deleted in transactions of at most ``BATCH_SIZE`` rows, with a ``PAUSE``
+between them, and the list row last, so no write lock is held for a whole
+list. A list reopened before it is marked is kept whole; a write landing once
+it is marked is deleted with it. Marked lists stay expired, so a run that
+stops half way is finished by the next one. Lists are handled ``BATCH_SIZE`` at
+a time; sessions are deleted in transactions of at most ``BATCH_SIZE`` rows.
+
+Run it with ``manage.py purge_inactive``, or set ``ENABLED`` to collect every
+``INTERVAL`` seconds from a background thread of each ASGI process.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .metrics import retention_rows_deleted
+from .models import ShoppingList, Item, ItemName, ListEvent, UserSession
+from .signals import delete_without_broadcast
+from .suggest import list_indexes
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": False,
+    "LIST_DAYS": 90,
+    "EMPTY_LIST_DAYS": 7,
+    "SESSION_DAYS": 90,
+    "BATCH_SIZE": 500,
+    "PAUSE": 0.05,
+    "INTERVAL": 3600,
+    "TOUCH_INTERVAL": 3600,
+}
+
+# list_id -> monotonic time of the last recorded WebSocket activity
+_touched = {}
+_touched_lock = threading.Lock()
+
+
+def get_config(**overrides):
+    """Return ``settings.LIST_RETENTION`` merged over the defaults."""
+    config = {**DEFAULTS, **getattr(settings, "LIST_RETENTION", {})}
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+def touch_due(list_id):
+    """
+    True if WebSocket activity on a list should be recorded now, i.e. not
+    within the last ``TOUCH_INTERVAL`` seconds in this process.
+    """
+    interval = get_config()["TOUCH_INTERVAL"]
+    now = time.monotonic()
+    with _touched_lock:
+        last = _touched.get(list_id)
+        if last is not None and now - last < interval:
+            return False
+        if len(_touched) > 10000:
+            _touched.clear()
+        _touched[list_id] = now
+    return True
+
+
+def touch_list(list_id):
+    """Mark a list as active now."""
+    ShoppingList.objects.filter(list_id=list_id).update(last_active_at=timezone.now())
+
+
+def expired_lists(config, now=None):
+    """Lists past their retention period."""
+    now = now or timezone.now()
+    inactive = Q(last_active_at__lt=now - timedelta(days=config["LIST_DAYS"]))
+    # Lists created from the landing page and never used
+    unused = Q(
+        revision=0, last_active_at__lt=now - timedelta(days=config["EMPTY_LIST_DAYS"])
+    )
+    return ShoppingList.objects.filter(inactive | unused | Q(purging=True))
+
+
+def expired_sessions(config, now=None):
+    """Sessions past their retention period."""
+    now = now or timezone.now()
+    return UserSession.objects.filter(
+        created_at__lt=now - timedelta(days=config["SESSION_DAYS"])
+    )
+
+
+def stats(config, now=None):
+    """Count what a collection would delete, without deleting anything."""
+    lists = expired_lists(config, now)
+    return {
+        "lists": lists.count(),
+        "items": Item.objects.filter(shopping_list__in=lists).count(),
+        "events": ListEvent.objects.filter(shopping_list__in=lists).count(),
+        "names": ItemName.objects.filter(shopping_list__in=lists).count(),
+        "sessions": expired_sessions(config, now).count(),
+    }
+
+
+def _delete_chunk(queryset, size):
+    """Delete up to ``size`` rows of ``queryset`` in one transaction."""
+    model = queryset.model
+    with transaction.atomic():
+        pks = list(queryset.order_by().values_list("pk", flat=True)[:size])
+        if not pks:
+            return 0
+        # Nobody is watching an expired list: no ITEM_DELETED for each item
+        return delete_without_broadcast(model.objects.filter(pk__in=pks))[0]
+
+
+def _drain(queryset, config):
+    total = 0
+    while True:
+        deleted = _delete_chunk(queryset, config["BATCH_SIZE"])
+        total += deleted
+        if deleted < config["BATCH_SIZE"]:
+            return total
+        time.sleep(config["PAUSE"])
+
+
+def _delete_list(pk, config, now):
+    """
+    Delete one list with its items, events and names if it is still expired.
+    Returns the number of rows deleted per model label, or None if the list
+    was reopened (or deleted) since it was selected.
+    """
+    with transaction.atomic():
+        # Re-checks expiry and takes the write lock in one statement, SQLite
+        # included: a write reopening the list now waits for this commit.
+        marked = expired_lists(config, now).filter(pk=pk).update(purging=True)
+    if not marked:
+        return None
+    list_id = ShoppingList.objects.values_list("list_id", flat=True).get(pk=pk)
+    counts = {
+        model._meta.label: _drain(model.objects.filter(shopping_list_id=pk), config)
+        for model in (Item, ListEvent, ItemName)
+    }
+    # Only rows written since their table was drained are left to cascade.
+    # Nobody is watching an inactive list: no ITEM_DELETED for each item.
+    _, rest = delete_without_broadcast(ShoppingList.objects.filter(pk=pk))
+    for label, count in rest.items():
+        counts[label] = counts.get(label, 0) + count
+    list_indexes.forget(list_id)
+    return counts
+
+
+def collect(config, now=None):
+    """
+    Delete expired lists, with their items, events and names, and expired
+    sessions.
+    Returns the number of rows deleted per table.
+    """
+    now = now or timezone.now()
+    deleted = dict.fromkeys(("lists", "items", "events", "names", "sessions"), 0)
+    tables = {
+        ShoppingList: "lists",
+        Item: "items",
+        ListEvent: "events",
+        ItemName: "names",
+    }
+    batch = config["BATCH_SIZE"]
+    while True:
+        expired = expired_lists(config, now)
+        pks = list(expired.order_by("pk").values_list("pk", flat=True)[:batch])
+        for pk in pks:
+            counts = _delete_list(pk, config, now) or {}
+            for model, key in tables.items():
+                deleted[key] += counts.get(model._meta.label, 0)
+        if len(pks) < batch:
+            break
+        time.sleep(config["PAUSE"])
+
+    deleted["sessions"] = _drain(expired_sessions(config, now), config)
+    for table, count in deleted.items():
+        retention_rows_deleted.inc(count, table)
+    return deleted
+
+
+class RetentionCollector:
+    """Runs ``collect`` every ``INTERVAL`` seconds in a daemon thread."""
+
+    def __init__(self, config):
+        self.config = config
+
+    def start(self):
+        threading.Thread(target=self._run, name="list-retention", daemon=True).start()
+
+    def _run(self):
+        interval = self.config["INTERVAL"]
+        while True:
+            # Jitter keeps several processes from collecting in lockstep.
+            time.sleep(interval * random.uniform(0.5, 1.5))
+            try:
+                deleted = collect(self.config)
+                if any(deleted.values()):
+                    logger.info("Retention deleted %s", deleted)
+            except Exception:
+                logger.exception("Retention collection failed")
+            finally:
+                # This thread's connections are not closed by any request.
+                connections.close_all()
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def start_collector():
+    """Start the periodic collector of this process, once, if retention is enabled."""
+    global _collector
+    config = get_config()
+    if not config["ENABLED"]:
+        return
+    with _collector_lock:
+        if _collector is None:
+            _collector = RetentionCollector(config)
+            _collector.start()
@@ -2,9 +2,15 @@
 WebSocket URL routing for the API app.
 Maps WebSocket connections to appropriate consumers.
 """
+from django.conf import settings
 from django.urls import re_path
 from . import consumers
+from .profiling import profile_consumer
+
+list_consumer = consumers.ListConsumer
+if settings.REQUEST_PROFILING["ENABLED"]:
+    list_consumer = profile_consumer(list_consumer)
 
 websocket_urlpatterns = [
-    re_path(r"ws/lists/(?P<list_id>\w+)/$", consumers.ListConsumer.as_asgi()),
+    re_path(r"ws/lists/(?P<list_id>\w+)/$", list_consumer.as_asgi()),
 ]
@@ -7,8 +7,16 @@ class ItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Item
-        fields = ["id", "name", "status", "claimed_by", "created_at", "updated_at"]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        fields = [
+            "id",
+            "name",
+            "status",
+            "claimed_by",
+            "created_at",
+            "updated_at",
+            "version",
+        ]
+        read_only_fields = ["id", "created_at", "updated_at", "version"]
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
@@ -18,8 +26,17 @@ class ShoppingListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ShoppingList
-        fields = ["id", "list_id", "created_at", "items"]
-        read_only_fields = ["id", "list_id", "created_at"]
+        fields = ["id", "list_id", "created_at", "revision", "items"]
+        read_only_fields = ["id", "list_id", "created_at", "revision"]
+
+
+class ShoppingListHeadSerializer(ShoppingListSerializer):
+    """ShoppingListSerializer without the items, for streamed exports."""
+
+    items = None
+
+    class Meta(ShoppingListSerializer.Meta):
+        fields = ["id", "list_id", "created_at", "revision"]
 
 
 class UserSessionSerializer(serializers.ModelSerializer):
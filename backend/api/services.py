@@ -2,18 +2,60 @@
 Service layer for business logic.
 Following SOLID principles - Single Responsibility.
 """
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from .broadcast import publish_encoded, publish_to_list
+from .cache import snapshot_cache
+from .etags import etag_matches, list_etag
+from .list_ids import allocator
+from .pagination import PAGE_SIZE, keyset_page
+from .profiling import timed
+from .suggest import record_names, suggest
+from .writer import serialized_write
+from . import events
 from .models import ShoppingList, Item
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on the operations accepted by one batch request
+MAX_BATCH_OPERATIONS = 500
+# Codes tried by create_list before giving up; see api.list_ids
+LIST_CODE_ATTEMPTS = 5
+
+
+class ConflictError(Exception):
+    """An item changed since it was read; the write was not applied (HTTP 409)."""
+
+    def __init__(self, message="L'article a été modifié par un autre utilisateur"):
+        super().__init__(message)
+
 
 class ShoppingListService:
     """Service for managing shopping lists."""
 
     @staticmethod
+    @serialized_write
     def create_list():
-        """Create a new shopping list."""
-        shopping_list = ShoppingList.objects.create()
-        return shopping_list
+        """
+        Create a new shopping list.
+        If its code is already taken (by a list created before the allocator),
+        the rest of the allocator's block is skipped and a new code tried.
+        The code is drawn before the INSERT's transaction, so a failed INSERT
+        never rolls back the block reservation it may have made.
+        """
+        for attempt in range(LIST_CODE_ATTEMPTS):
+            list_id = allocator.next_code()
+            try:
+                with transaction.atomic():
+                    return ShoppingList.objects.create(list_id=list_id)
+            except IntegrityError:
+                if attempt == LIST_CODE_ATTEMPTS - 1:
+                    raise
+                allocator.discard_block()
 
     @staticmethod
     def get_list_by_id(list_id):
@@ -24,92 +66,158 @@ class ShoppingListService:
         return get_object_or_404(ShoppingList, list_id=list_id)
 
     @staticmethod
+    def get_list_snapshot(list_id, if_none_match=None):
+        """
+        Return ``(etag, payload)``: the ETag and rendered JSON of a shopping
+        list and its items. ``payload`` is None when ``if_none_match`` already
+        matches the ETag; items are not loaded then.
+        Raises Http404 if not found.
+        """
+        shopping_list = ShoppingListService.get_list_by_id(list_id)
+        etag = list_etag(list_id, shopping_list.revision)
+        if etag_matches(if_none_match, etag):
+            return etag, None
+        return etag, ShoppingListService.render_snapshot(shopping_list)
+
+    @staticmethod
+    def render_snapshot(shopping_list):
+        """
+        Return the rendered JSON of a shopping list and its items at the
+        revision ``shopping_list`` was read at. Served from the snapshot cache
+        when that revision has already been rendered.
+        """
+        from .fast_serializers import list_data_with_revision, render
+
+        revision = shopping_list.revision
+        payload = snapshot_cache.get(shopping_list.pk, revision)
+        if payload is None:
+            with timed("serialize"):
+                data, current = list_data_with_revision(shopping_list)
+                payload = render(data)
+            # A write between the list read and the items read would store
+            # newer items under the older revision, and its ETag.
+            if current == revision:
+                snapshot_cache.set(shopping_list.pk, revision, payload)
+        return payload
+
+    @staticmethod
+    def export_list(list_id):
+        """
+        Return the JSON of a shopping list and all its items as an iterator of
+        byte strings, read and rendered in chunks (see ``api.export``).
+        Raises Http404 if not found.
+        """
+        from .export import export_chunks
+
+        return export_chunks(ShoppingListService.get_list_by_id(list_id))
+
+    @staticmethod
+    def get_changes(list_id, since):
+        """
+        Return the events a client at revision ``since`` missed, or a snapshot
+        when they are no longer available. Raises Http404 if not found.
+        """
+        try:
+            return events.get_changes(list_id, since)
+        except ShoppingList.DoesNotExist:
+            raise Http404("No ShoppingList matches the given query.")
+
+    @staticmethod
+    @serialized_write
     def reset_list(shopping_list):
         """
         Reset a shopping list after shopping:
         - Delete all 'bought' items
         - Reset 'claimed' items to 'pending'
-        - Broadcast LIST_RESET event
+        - Broadcast a LIST_RESET diff with the deleted and reset item IDs
+        Returns ``(payload, text)``: the event payload, and the JSON of the
+        broadcast event, which the views send back as their response.
         """
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from .serializers import ShoppingListSerializer
-        import time
+        from .signals import delete_items_without_broadcast
 
-        # Perform bulk updates
-        shopping_list.items.filter(status="bought").delete()
-        shopping_list.items.filter(status="claimed").update(
-            status="pending", claimed_by=None
-        )
+        items = Item.objects.filter(shopping_list=shopping_list)
+        bought = items.filter(status="bought")
+        claimed = items.filter(status="claimed")
+
+        with transaction.atomic():
+            # Lock the affected rows so the IDs we report are the ones we change
+            affected = (
+                items.select_for_update()
+                .filter(status__in=["bought", "claimed"])
+                .order_by()  # no sort, so (shopping_list, status) is used
+                .values_list("id", "status")
+            )
+            deleted_ids, reset_ids = [], []
+            for item_id, item_status in affected:
+                if item_status == "bought":
+                    deleted_ids.append(item_id)
+                else:
+                    reset_ids.append(item_id)
+            # One statement each; the LIST_RESET diff replaces the
+            # ITEM_DELETED of each item
+            delete_items_without_broadcast(bought)
+            claimed.update(
+                status="pending",
+                claimed_by=None,
+                updated_at=timezone.now(),
+                version=F("version") + 1,
+            )
 
-        print(f"Resetting list {shopping_list.list_id}")
-        for item in shopping_list.items.all():
-            print(f"Item {item.name} is now {item.status}")
-
-        # Broadcast reset event with fresh list data
-        channel_layer = get_channel_layer()
-        
-        # Re-fetch the list to ensure we have the latest items state
-        # This prevents sending stale data if the relation was cached
-        updated_list = ShoppingList.objects.get(pk=shopping_list.pk)
-        serializer = ShoppingListSerializer(updated_list)
-        
-        print(f"Broadcasting LIST_RESET for {shopping_list.list_id}")
-
-        for item in shopping_list.items.all():
-            print(f"Item {item.name} is now {item.status}")
-        
-        # Small delay to ensure HTTP response completes before WebSocket event
-        # This prevents race conditions where frontend state changes interrupt WebSocket
-        time.sleep(0.1)
-        
-        async_to_sync(channel_layer.group_send)(
-            f"list_{shopping_list.list_id}",
-            {
-                "type": "list_reset",
+            payload = {
                 "event": "LIST_RESET",
-                "list": serializer.data,
-            },
-        )
+                "list_id": shopping_list.list_id,
+                "deleted_ids": deleted_ids,
+                "reset_ids": reset_ids,
+            }
+            message = {"type": "list_reset", **payload}
+            payload["revision"], text = publish_encoded(
+                shopping_list.list_id, message
+            )
+
+        return payload, text
 
     @staticmethod
+    @serialized_write
     def rename_pseudo(shopping_list, old_pseudo, new_pseudo):
         """
         Rename a user's pseudo and update all their claimed items.
         Validates uniqueness within active list session.
         Broadcasts PSEUDO_RENAMED event to all connected users.
         """
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
-        # Validate that new_pseudo is not already in use by another user
-        # Check if any items are claimed by the new pseudo (excluding the current user's items)
-        existing_items = shopping_list.items.filter(
-            claimed_by=new_pseudo, status='claimed'
-        ).exclude(claimed_by=old_pseudo)
-
-        if existing_items.exists():
-            raise ValueError(f"Le pseudo '{new_pseudo}' est déjà utilisé")
-
-        # Update all items claimed by old_pseudo to new_pseudo
-        updated_count = shopping_list.items.filter(
-            claimed_by=old_pseudo, status='claimed'
-        ).update(claimed_by=new_pseudo)
-
-        print(f"Renamed pseudo from '{old_pseudo}' to '{new_pseudo}' for {updated_count} items")
-
-        # Broadcast rename event
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"list_{shopping_list.list_id}",
-            {
-                "type": "pseudo_renamed",
-                "event": "PSEUDO_RENAMED",
-                "old_pseudo": old_pseudo,
-                "new_pseudo": new_pseudo,
-            },
-        )
+        # The renamed items and their PSEUDO_RENAMED event commit together
+        with transaction.atomic():
+            # Validate that new_pseudo is not already in use by another user
+            # Check if any items are claimed by the new pseudo
+            # (excluding the current user's items)
+            existing_items = shopping_list.items.filter(
+                claimed_by=new_pseudo, status='claimed'
+            ).exclude(claimed_by=old_pseudo)
+
+            if existing_items.exists():
+                raise ValueError(f"Le pseudo '{new_pseudo}' est déjà utilisé")
+
+            # Update all items claimed by old_pseudo to new_pseudo
+            updated_count = shopping_list.items.filter(
+                claimed_by=old_pseudo, status='claimed'
+            ).update(claimed_by=new_pseudo, version=F("version") + 1)
 
+            # Broadcast rename event
+            publish_to_list(
+                shopping_list.list_id,
+                {
+                    "type": "pseudo_renamed",
+                    "event": "PSEUDO_RENAMED",
+                    "old_pseudo": old_pseudo,
+                    "new_pseudo": new_pseudo,
+                },
+            )
+
+        logger.debug(
+            "Renamed pseudo %r to %r for %d items",
+            old_pseudo,
+            new_pseudo,
+            updated_count,
+        )
         return updated_count
 
 
@@ -117,38 +225,131 @@ class ItemService:
     """Service for managing items."""
 
     @staticmethod
+    def get_items_page(list_id, status=None, cursor=None, limit=PAGE_SIZE):
+        """
+        Return ``(items, next_cursor)``: a page of the items of a list in
+        display order, optionally only those with ``status``, and the cursor
+        of the next page (None on the last one). See ``api.pagination``.
+        Raises Http404 if the list is not found, ValueError for a bad cursor.
+        """
+        list_pk = (
+            ShoppingList.objects.filter(list_id=list_id)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if list_pk is None:
+            raise Http404("No ShoppingList matches the given query.")
+        items = Item.objects.filter(shopping_list_id=list_pk)
+        if status is not None:
+            items = items.filter(status=status)
+        return keyset_page(items, cursor, limit)
+
+    @staticmethod
+    def suggest_names(list_id, prefix):
+        """
+        Return item names starting with ``prefix`` for the add-item box of a
+        list, from memory. See ``api.suggest``.
+        Raises Http404 if the list is not found.
+        """
+        return suggest(list_id, prefix)
+
+    @staticmethod
+    @serialized_write
     def create_item(shopping_list, name):
         """Create a new item in a shopping list."""
-        item = Item.objects.create(shopping_list=shopping_list, name=name)
+        # The item and its ITEM_ADDED event (see signals) commit together
+        with transaction.atomic():
+            item = Item.objects.create(shopping_list=shopping_list, name=name)
         return item
 
     @staticmethod
-    def update_item(item, **kwargs):
+    @serialized_write
+    def update_item(item, expected_version=None, **kwargs):
         """
         Update an item with provided fields.
-        Validates ownership for status changes.
+        The write only applies if the item is still at ``expected_version``
+        (by default the version it was read at); raises ConflictError otherwise.
         """
-        for key, value in kwargs.items():
-            setattr(item, key, value)
-        item.save()
+        if expected_version is None:
+            expected_version = item.version
+        return ItemService._compare_and_set(
+            item, {"version": expected_version}, **kwargs
+        )
+
+    @staticmethod
+    def _compare_and_set(item, expected, **changes):
+        """
+        Write ``changes`` to the item in a single conditional UPDATE that only
+        matches if the row still has the version it was read at and the
+        ``expected`` field values. Updates the instance and broadcasts
+        ITEM_UPDATED on success; raises ConflictError if no row matched.
+        """
+        from .signals import broadcast_item_saved
+
+        now = timezone.now()
+        expected = {"version": item.version, **expected}
+        with transaction.atomic():
+            matched = Item.objects.filter(pk=item.pk, **expected).update(
+                updated_at=now, version=F("version") + 1, **changes
+            )
+            if not matched:
+                raise ConflictError()
+            for key, value in changes.items():
+                setattr(item, key, value)
+            item.updated_at = now
+            item.version = expected["version"] + 1
+            broadcast_item_saved(item)
         return item
 
     @staticmethod
+    def is_valid_name(name):
+        """Return True if name can name an item: a non-empty string."""
+        return isinstance(name, str) and bool(name)
+
+    @staticmethod
+    def is_locked_for(item, pseudo):
+        """Return True if the item is claimed by someone other than pseudo."""
+        return bool(
+            item.status == "claimed" and item.claimed_by and item.claimed_by != pseudo
+        )
+
+    @staticmethod
+    @serialized_write
     def delete_item(item):
         """Delete an item."""
         item.delete()
 
     @staticmethod
+    @serialized_write
     def claim_item(item, pseudo):
-        """Claim an item (set status to claimed and assign pseudo)."""
+        """
+        Claim an item (set status to claimed and assign pseudo).
+        Of several concurrent claimers only one wins; the others get ConflictError.
+        """
         if item.status != "pending":
             raise ValueError("Item is not available for claiming")
-        item.status = "claimed"
-        item.claimed_by = pseudo
-        item.save()
-        return item
+        return ItemService._compare_and_set(
+            item, {"status": "pending"}, status="claimed", claimed_by=pseudo
+        )
 
     @staticmethod
+    @serialized_write
+    def unclaim_item(item, pseudo):
+        """
+        Release a claimed item back to pending.
+        Only the user who claimed it can release it.
+        """
+        if item.status != "claimed" or item.claimed_by != pseudo:
+            raise ValueError("Only the user who claimed the item can release it")
+        return ItemService._compare_and_set(
+            item,
+            {"status": "claimed", "claimed_by": pseudo},
+            status="pending",
+            claimed_by=None,
+        )
+
+    @staticmethod
+    @serialized_write
     def validate_item(item, pseudo):
         """
         Validate an item (set status to bought).
@@ -158,6 +359,132 @@ class ItemService:
             raise ValueError("Item must be claimed before validation")
         if item.claimed_by != pseudo:
             raise ValueError("Only the user who claimed the item can validate it")
+        return ItemService._compare_and_set(
+            item, {"status": "claimed", "claimed_by": pseudo}, status="bought"
+        )
+
+    @staticmethod
+    @serialized_write
+    def apply_batch(shopping_list, operations):
+        """
+        Apply a mixed list of add/claim/validate/update/delete operations in one
+        transaction with bulk statements, and broadcast them as one BATCH event.
+        Each operation is checked like its single-item counterpart; a rejected
+        operation is reported in its result and does not stop the others.
+        Results carry each item as it is once the whole batch is applied.
+        Returns ``{"results": [...], "revision": R}``.
+        """
+        from .fast_serializers import item_data
+        from .signals import delete_without_broadcast
+
+        item_ids = [
+            op.get("item_id")
+            for op in operations
+            if isinstance(op.get("item_id"), int) and op.get("op") != "add"
+        ]
+        results, applied = [], []
+        created, changed, deleted = [], {}, []
+
+        with transaction.atomic():
+            items = Item.objects.select_for_update().filter(
+                shopping_list=shopping_list
+            ).in_bulk(item_ids)
+
+            for index, op in enumerate(operations):
+                try:
+                    kind, item = _apply_batch_operation(
+                        shopping_list, op, items, created, changed, deleted
+                    )
+                except ValueError as e:
+                    results.append({"index": index, "ok": False, "error": str(e)})
+                else:
+                    result = {"index": index, "ok": True, "op": kind}
+                    results.append(result)
+                    applied.append((result, kind, item))
+
+            Item.objects.bulk_create(created)
+            # bulk_create sends no post_save: count the names as signals would
+            record_names(
+                shopping_list.pk, shopping_list.list_id, [i.name for i in created]
+            )
+            now = timezone.now()
+            for item in changed.values():
+                item.updated_at = now
+                item.version += 1
+            # The rows are locked above, so bumping the version is safe here
+            Item.objects.bulk_update(
+                changed.values(),
+                ["name", "status", "claimed_by", "updated_at", "version"],
+            )
+            # The BATCH event replaces the ITEM_DELETED of each item
+            delete_without_broadcast(Item.objects.filter(id__in=deleted))
+
+            # Serialize once the bulk writes have assigned IDs and timestamps
+            events = []
+            for result, kind, item in applied:
+                if kind == "delete":
+                    result["item_id"] = item.pk
+                    events.append({"event": "ITEM_DELETED", "item_id": item.pk})
+                else:
+                    result["item"] = item_data(item)
+                    event = "ITEM_ADDED" if kind == "add" else "ITEM_UPDATED"
+                    events.append({"event": event, "item": result["item"]})
+
+            revision = None
+            if events:
+                revision = publish_to_list(
+                    shopping_list.list_id,
+                    {"type": "list_batch", "event": "BATCH", "events": events},
+                )
+
+        return {"results": results, "revision": revision}
+
+
+def _apply_batch_operation(shopping_list, op, items, created, changed, deleted):
+    """
+    Apply one batch operation to the in-memory items and record what to write.
+    Returns ``(kind, item)``; raises ValueError if the operation is rejected.
+    """
+    kind = op.get("op")
+    if kind == "add":
+        name = op.get("name")
+        if not ItemService.is_valid_name(name):
+            raise ValueError("Le nom de l'article est requis")
+        item = Item(shopping_list=shopping_list, name=name)
+        created.append(item)
+        return kind, item
+
+    if kind not in ("claim", "validate", "update", "delete"):
+        raise ValueError(f"Opération inconnue : {kind}")
+    item = items.get(op.get("item_id"))
+    if item is None or item.pk in deleted:
+        raise ValueError("Article introuvable")
+
+    if kind == "claim":
+        if not op.get("pseudo"):
+            raise ValueError("Le pseudo est requis")
+        if item.status != "pending":
+            raise ValueError("Item is not available for claiming")
+        item.status = "claimed"
+        item.claimed_by = op["pseudo"]
+    elif kind == "validate":
+        if item.status != "claimed":
+            raise ValueError("Item must be claimed before validation")
+        if item.claimed_by != op.get("pseudo"):
+            raise ValueError("Only the user who claimed the item can validate it")
         item.status = "bought"
-        item.save()
-        return item
+    else:
+        if ItemService.is_locked_for(item, op.get("current_pseudo")):
+            raise ValueError("Cet article est verrouillé par un autre utilisateur")
+        if kind == "delete":
+            deleted.append(item.pk)
+            changed.pop(item.pk, None)
+            return kind, item
+        if "name" in op and not ItemService.is_valid_name(op["name"]):
+            raise ValueError("Le nom de l'article est requis")
+        for field in ("name", "status", "claimed_by"):
+            if field in op:
+                setattr(item, field, op[field])
+
+    changed[item.pk] = item
+    return kind, item
@@ -2,50 +2,117 @@
 Django signals for broadcasting real-time updates.
 Signals trigger WebSocket events when items are created, updated, or deleted.
 """
-from django.db.models.signals import post_save, post_delete
+import threading
+from functools import lru_cache
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Item
-from .serializers import ItemSerializer
+from .broadcast import publish_to_list
+from .models import ShoppingList, Item
+from .fast_serializers import item_data
+from .suggest import record_names
+
+# Set in a thread while delete_without_broadcast runs
+_silenced = threading.local()
+
+
+@lru_cache(maxsize=4096)
+def _list_code(shopping_list_pk):
+    # ShoppingList.list_id never changes, so the mapping can be cached for good.
+    return ShoppingList.objects.values_list("list_id", flat=True).get(
+        pk=shopping_list_pk
+    )
+
+
+def list_id_of(item):
+    """
+    Return the ``list_id`` of an item's list without loading the list.
+    Uses the related object when it is already loaded.
+    """
+    if Item.shopping_list.is_cached(item):
+        return item.shopping_list.list_id
+    return _list_code(item.shopping_list_id)
 
 
 @receiver(post_save, sender=Item)
 def item_saved(sender, instance, created, **kwargs):
     """
     Broadcast item_added or item_updated event when an item is saved.
+    New items also count their name for autocomplete (see api.suggest).
     """
-    channel_layer = get_channel_layer()
-    room_group_name = f"list_{instance.shopping_list.list_id}"
-    
+    if created:
+        record_names(instance.shopping_list_id, list_id_of(instance), [instance.name])
+    broadcast_item_saved(instance, created)
+
+
+def broadcast_item_saved(instance, created=False):
+    """
+    Broadcast item_added or item_updated for an item.
+    Also called by writes that bypass ``save()``, such as conditional updates.
+    """
+    list_id = list_id_of(instance)
+
     # Serialize the item data
-    item_data = ItemSerializer(instance).data
+    data = item_data(instance)
     
     # Determine event type
     event_type = "item_added" if created else "item_updated"
     
-    # Broadcast to WebSocket group
-    async_to_sync(channel_layer.group_send)(
-        room_group_name,
+    # Broadcast to WebSocket group once the write commits
+    publish_to_list(
+        list_id,
         {
             "type": event_type,
             "event": event_type.upper(),
-            "item": item_data,
+            "item": data,
         },
     )
 
 
+def delete_without_broadcast(queryset):
+    """
+    Delete ``queryset`` with ``QuerySet.delete()``, but without broadcasting
+    ITEM_DELETED for each deleted item. For writes that report all their
+    deletions in one event (list resets, batches), and for lists deleted whole
+    (retention). Returns what ``delete()`` returns.
+    """
+    previous = getattr(_silenced, "active", False)
+    _silenced.active = True
+    try:
+        return queryset.delete()
+    finally:
+        _silenced.active = previous
+
+
+def delete_items_without_broadcast(queryset):
+    """
+    Delete the items of ``queryset`` with a single DELETE statement, without
+    broadcasting ITEM_DELETED. Unlike ``delete_without_broadcast`` no row is
+    read first, which is only safe while nothing references items and
+    ``item_deleted`` is their only delete receiver: the deletion collector
+    would then load every item just to call it. Raises TypeError for other
+    models, or once items gain dependent rows or a ``pre_delete`` receiver;
+    ``ResetTests`` also pins the ``post_delete`` receivers. For list resets
+    only. Returns the number of deleted items.
+    """
+    if queryset.model is not Item:
+        raise TypeError("Only items can be deleted without the collector")
+    if Item._meta.related_objects or pre_delete.has_listeners(Item):
+        raise TypeError("Items have dependents: delete them with delete()")
+    return queryset._raw_delete(queryset.db)
+
+
 @receiver(post_delete, sender=Item)
 def item_deleted(sender, instance, **kwargs):
     """
     Broadcast item_deleted event when an item is deleted.
     """
-    channel_layer = get_channel_layer()
-    room_group_name = f"list_{instance.shopping_list.list_id}"
-    
-    # Broadcast to WebSocket group
-    async_to_sync(channel_layer.group_send)(
-        room_group_name,
+    if getattr(_silenced, "active", False):
+        return
+    list_id = list_id_of(instance)
+
+    # Broadcast to WebSocket group once the write commits
+    publish_to_list(
+        list_id,
         {
             "type": "item_deleted",
             "event": "ITEM_DELETED",
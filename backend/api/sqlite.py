@@ -0,0 +1,71 @@
+"""
+Opt-in SQLite performance mode for single-server deployments.
+Following SOLID principles - connection tuning lives here, write ordering in
+``api.writer``.
+
+With ``settings.SQLITE_PERFORMANCE["ENABLED"]``, every SQLite connection is
+set up on ``connection_created`` with:
+
+- ``journal_mode=WAL``: readers no longer block the writer, nor the reverse
+- ``synchronous=NORMAL``: no fsync per commit in WAL mode, only at
+  checkpoints; a power loss may drop the last commits but never corrupts
+- ``busy_timeout``: wait for a lock instead of failing with "database is
+  locked"
+- ``mmap_size`` and ``cache_size``: serve reads from memory
+
+and the service writes are funnelled through the single-writer queue of
+``api.writer``. Other backends are left untouched.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DEFAULTS = {
+    "ENABLED": False,
+    "BUSY_TIMEOUT": 5000,  # milliseconds
+    "MMAP_SIZE": 256 * 1024 * 1024,  # bytes
+    "CACHE_SIZE": -64 * 1024,  # negative: KiB, i.e. 64 MiB
+    "WRITE_QUEUE": True,
+    "MAX_BATCH": 64,
+    "WRITE_TIMEOUT": 30,  # seconds
+}
+
+
+def get_config():
+    """Return ``settings.SQLITE_PERFORMANCE`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "SQLITE_PERFORMANCE", {})}
+
+
+def pragmas(config):
+    """The PRAGMA statements run on every new connection."""
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(config['BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(config['MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['CACHE_SIZE'])}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver applying the PRAGMAs to SQLite connections."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in pragmas(get_config()):
+            cursor.execute(statement)
+
+
+def install():
+    """Enable performance mode if configured; called from ``AppConfig.ready``."""
+    from . import writer
+
+    config = get_config()
+    if not config["ENABLED"] or connections["default"].vendor != "sqlite":
+        return
+    connection_created.connect(configure_connection)
+    for connection in connections.all(initialized_only=True):
+        configure_connection(None, connection)
+    if config["WRITE_QUEUE"]:
+        writer.enable(config["MAX_BATCH"], config["WRITE_TIMEOUT"])
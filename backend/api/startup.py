@@ -0,0 +1,154 @@
+"""
+Cold-start measurement of the ASGI entry point.
+Following SOLID principles - the commands decide what to report, this module
+starts fresh interpreters and measures them.
+
+A cold start is a new Python process that imports ``teamshop.asgi`` and then
+serves one HTTP request through the ASGI application, in-process, as after a
+scale-from-zero or a restart. Every measurement runs in its own interpreter,
+so only the bytecode cache is warm, as on a real host. The first request
+(``REQUEST_PATH``, a list lookup) pays what the import deferred: the URLconf,
+the views, the first database connection.
+
+With ``importtime``, the interpreter runs with ``-X importtime`` and its
+report is parsed by ``parse_importtime``; that option slows imports down, so
+time budgets are checked on runs without it.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+# Missing list: resolves the API URLconf, imports the views, runs one query
+REQUEST_PATH = "/api/lists/NOLIST/"
+
+# Run by each cold interpreter; prints one JSON line
+CHILD = """
+import asyncio, json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "teamshop.settings")
+from teamshop.asgi import application
+imported = time.perf_counter()
+
+async def request(path):
+    sent, body_read = [], asyncio.Event()
+
+    async def receive():
+        if body_read.is_set():
+            await asyncio.Future()  # No disconnect
+        body_read.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path,
+        "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    await application(scope, receive, send)
+    return sent[0]["status"]
+
+status = asyncio.run(request(sys.argv[1]))
+done = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - started) * 1000,
+    "request_ms": (done - imported) * 1000,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+@contextmanager
+def migrated_database():
+    """Yield the URL of a fresh, migrated SQLite database for cold starts."""
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{directory}/startup.sqlite3"
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "migrate"]
+            + ["--verbosity=0"],
+            env=dict(os.environ, DATABASE_URL=url),
+            capture_output=True,
+            check=True,
+        )
+        yield url
+
+
+def cold_start(database_url, importtime=False, path=REQUEST_PATH, **env):
+    """
+    Start a fresh interpreter with ``env`` overrides, request ``path`` and
+    return its timings: ``import_ms``, ``request_ms``, ``first_request_ms``
+    (their sum) and ``process_ms`` (the whole process, interpreter startup and
+    exit included), the response ``status``, the imported ``modules``, and,
+    with ``importtime``, the parsed ``-X importtime`` report as ``imports``.
+    """
+    env = dict(os.environ, **env, DATABASE_URL=database_url)
+    env["ALLOWED_HOSTS"] = ",".join(
+        filter(None, [env.get("ALLOWED_HOSTS"), "localhost"])
+    )
+    flags = ["-X", "importtime"] if importtime else []
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *flags, "-c", CHILD, path],
+        cwd=settings.BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    process_ms = (time.perf_counter() - started) * 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["first_request_ms"] = result["import_ms"] + result["request_ms"]
+    result["process_ms"] = process_ms
+    if importtime:
+        result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def parse_importtime(text):
+    """
+    Parse a ``-X importtime`` report into ``{module: (self_us, cumulative_us)}``.
+    Cumulative times include the imports a module triggered.
+    """
+    imports = {}
+    for line in text.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            imports[match[4]] = (int(match[1]), int(match[2]))
+    return imports
+
+
+def package_of(module):
+    """Group a module under its distribution, or its Django contrib app."""
+    parts = module.split(".")
+    if parts[0] == "django":
+        return ".".join(parts[:3] if parts[1:2] == ["contrib"] else parts[:2])
+    return parts[0]
+
+
+def median_imports(runs):
+    """
+    ``{module: (self_ms, cumulative_ms)}``, medians over the ``imports`` of
+    several ``cold_start`` results, so one slow run does not skew the report.
+    """
+    modules = {module for run in runs for module in run["imports"]}
+    medians = {}
+    for module in modules:
+        times = [run["imports"].get(module, (0, 0)) for run in runs]
+        medians[module] = tuple(
+            statistics.median(sample[index] for sample in times) / 1000
+            for index in (0, 1)
+        )
+    return medians
@@ -0,0 +1,269 @@
+"""
+Item-name autocomplete for the add-item box.
+Following SOLID principles - signals count names as items are added, this
+module answers prefix lookups from memory.
+
+Every added name is counted in ``ItemName``, one row per list and normalized
+name (see ``normalize``), with a single upsert per add or batch. Lookups never
+scan ``Item.name``:
+
+- the names of a list are loaded once into a ``PrefixIndex``, a sorted array
+  of keys searched with ``bisect``, kept in an LRU of ``MAX_LISTS`` lists for
+  ``TTL`` seconds. Adds made by this process update the cached index when they
+  commit; adds made by other processes show up once it expires.
+- names used in at least ``GLOBAL_MIN_LISTS`` lists, ranked by their number of
+  lists, make up a global index rebuilt every ``GLOBAL_TTL`` seconds. It fills
+  in suggestions for lists with little history; the threshold keeps a name
+  typed in a single list from showing up in anyone else's.
+
+Each index remembers the results of its last ``MEMO_SIZE`` prefixes, so a
+common prefix costs a dictionary lookup.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Min
+from django.http import Http404
+from .models import ShoppingList, ItemName
+
+DEFAULTS = {
+    "LIMIT": 8,
+    "MAX_LISTS": 1024,
+    "TTL": 300,  # seconds
+    "GLOBAL_MIN_LISTS": 3,
+    "GLOBAL_MAX_NAMES": 20000,
+    "GLOBAL_TTL": 600,  # seconds
+    "MEMO_SIZE": 256,  # prefixes per index
+}
+
+# Rows per upsert statement, well under SQLite's limit on parameters
+UPSERT_ROWS = 200
+# Sorts after any character a key can continue with
+_KEY_END = "\U0010ffff"
+
+
+def get_config():
+    """Return ``settings.ITEM_SUGGEST`` merged over the defaults."""
+    return {**DEFAULTS, **getattr(settings, "ITEM_SUGGEST", {})}
+
+
+def normalize(name):
+    """
+    Lookup key of a name: accents stripped, case folded and whitespace
+    collapsed, so "  Pâtes" and "pates" are one name.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())[:255]
+
+
+class PrefixIndex:
+    """Names ranked by count, searchable by a prefix of their key."""
+
+    def __init__(self, entries=(), memo_size=DEFAULTS["MEMO_SIZE"]):
+        # key -> (count, name)
+        self._entries = {key: (count, name) for key, name, count in entries}
+        self._keys = sorted(self._entries)
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, name, count=1):
+        """Count ``name`` ``count`` more times under ``key``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                insort(self._keys, key)
+                self._entries[key] = (count, name)
+            else:
+                self._entries[key] = (entry[0] + count, name)
+            self._memo.clear()
+
+    def search(self, prefix, limit):
+        """
+        Return the ``limit`` most counted ``(key, name)`` whose key starts with
+        ``prefix``; ties in alphabetical order.
+        """
+        with self._lock:
+            memo_key = (prefix, limit)
+            results = self._memo.get(memo_key)
+            if results is not None:
+                self._memo.move_to_end(memo_key)
+                return results
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + _KEY_END, start)
+            entries = self._entries
+            keys = heapq.nlargest(
+                limit, self._keys[start:end], key=lambda key: entries[key][0]
+            )
+            results = [(key, entries[key][1]) for key in keys]
+            self._memo[memo_key] = results
+            if len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+            return results
+
+
+def _load_list_index(list_id, config):
+    list_pk = (
+        ShoppingList.objects.filter(list_id=list_id)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if list_pk is None:
+        raise Http404("No ShoppingList matches the given query.")
+    rows = ItemName.objects.filter(shopping_list_id=list_pk).values_list(
+        "normalized", "name", "count"
+    )
+    return PrefixIndex(rows, config["MEMO_SIZE"])
+
+
+def _load_global_index(config):
+    rows = (
+        ItemName.objects.values("normalized")
+        .annotate(lists=Count("pk"), spelling=Min("name"))
+        .filter(lists__gte=config["GLOBAL_MIN_LISTS"])
+        .order_by("-lists", "normalized")
+        .values_list("normalized", "spelling", "lists")[: config["GLOBAL_MAX_NAMES"]]
+    )
+    return PrefixIndex(rows, config["MEMO_SIZE"])
+
+
+class ListIndexCache:
+    """LRU of the ``PrefixIndex`` of recently used lists, by list_id."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, list_id, config):
+        """The index of a list, loaded if needed. Raises Http404."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(list_id)
+            if entry is not None and now - entry[0] < config["TTL"]:
+                self._entries.move_to_end(list_id)
+                return entry[1]
+        index = _load_list_index(list_id, config)
+        with self._lock:
+            self._entries[list_id] = (now, index)
+            self._entries.move_to_end(list_id)
+            while len(self._entries) > config["MAX_LISTS"]:
+                self._entries.popitem(last=False)
+        return index
+
+    def add(self, list_id, added):
+        """Apply ``{key: (name, count)}`` to the index of a list, if cached."""
+        with self._lock:
+            entry = self._entries.get(list_id)
+        if entry is not None:
+            for key, (name, count) in added.items():
+                entry[1].add(key, name, count)
+
+    def forget(self, list_id):
+        with self._lock:
+            self._entries.pop(list_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class GlobalIndex:
+    """The global index, rebuilt in the background of lookups when expired."""
+
+    def __init__(self):
+        self._index = None
+        self._built_at = 0.0
+        self._rebuilding = threading.Lock()
+
+    def get(self, config):
+        index = self._index
+        if (
+            index is not None
+            and time.monotonic() - self._built_at < config["GLOBAL_TTL"]
+        ):
+            return index
+        # Only one thread rebuilds; the others keep using the expired index.
+        if not self._rebuilding.acquire(blocking=index is None):
+            return index
+        try:
+            if self._index is index:
+                self._index = _load_global_index(config)
+                self._built_at = time.monotonic()
+            return self._index
+        finally:
+            self._rebuilding.release()
+
+    def clear(self):
+        self._index = None
+
+
+list_indexes = ListIndexCache()
+global_index = GlobalIndex()
+
+
+def record_names(shopping_list_pk, list_id, names):
+    """
+    Count ``names`` as added to a list, in the current transaction. The cached
+    index of the list, if any, is updated once it commits.
+    """
+    added = {}
+    for name in names:
+        key = normalize(name)
+        if key:
+            added[key] = (name, added.get(key, (None, 0))[1] + 1)
+    if not added:
+        return
+
+    alias = router.db_for_write(ItemName)
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    table = qn(ItemName._meta.db_table)
+    list_column, key, name, count = (
+        qn(ItemName._meta.get_field(field).column)
+        for field in ("shopping_list", "normalized", "name", "count")
+    )
+    rows = [(shopping_list_pk, k, spelling, n) for k, (spelling, n) in added.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_ROWS):
+            chunk = rows[start : start + UPSERT_ROWS]
+            cursor.execute(
+                f"INSERT INTO {table} ({list_column}, {key}, {name}, {count}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT ({list_column}, {key}) DO UPDATE SET "
+                f"{count} = {table}.{count} + excluded.{count}, "
+                f"{name} = excluded.{name}",
+                [value for row in chunk for value in row],
+            )
+    transaction.on_commit(lambda: list_indexes.add(list_id, added), using=alias)
+
+
+def suggest(list_id, prefix, limit=None):
+    """
+    Names starting with ``prefix`` for the add-item box of a list: the names
+    added to the list, most added first, then the most common names of all
+    lists. Raises Http404 if the list is not found.
+    """
+    config = get_config()
+    limit = limit or config["LIMIT"]
+    key = normalize(prefix)
+    results = list_indexes.get(list_id, config).search(key, limit)
+    if len(results) < limit:
+        seen = {k for k, _ in results}
+        results = (
+            results
+            + [
+                result
+                for result in global_index.get(config).search(key, limit)
+                if result[0] not in seen
+            ][: limit - len(results)]
+        )
+    return [name for _, name in results]
@@ -1,3 +1,2034 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from channels.layers import get_channel_layer
+from unittest import mock, skipUnless
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient,
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from teamshop.lean import AdminOnlyMiddleware
+from . import admission, async_views, broadcast, fast_serializers, list_ids, metrics
+from . import pagination, profiling
+from . import retention, sqlite, startup, suggest, wire, writer
+from .broadcast import list_group_name
+from .cache import ListSnapshotCache, snapshot_cache
+from .channel_layer import DatabaseChannelLayer, MemoryChannelLayer
+from .commands import execute_command
+from .datagen import generate_list, pseudo_pool
+from .loadtest import CommunicatorTransport, run_fanout
+from .consumers import ListConsumer
+from .models import (
+    Item,
+    ItemName,
+    ListCodeCounter,
+    ListEvent,
+    ShoppingList,
+    UserSession,
+)
+from .serializers import ItemSerializer, ShoppingListSerializer
+from .services import (
+    MAX_BATCH_OPERATIONS,
+    ConflictError,
+    ItemService,
+    ShoppingListService,
+)
 
-# Create your tests here.
+
+class SnapshotCacheTests(TestCase):
+    """List snapshots are served from memory while the list revision is unchanged."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.path = f"/api/lists/{self.shopping_list.list_id}/"
+        snapshot_cache.clear()
+
+    def test_second_get_is_a_cache_hit(self):
+        Item.objects.create(shopping_list=self.shopping_list, name="Pain")
+        first = self.client.get(self.path)
+        # Only the list row is read, for its revision
+        with self.assertNumQueries(1):
+            second = self.client.get(self.path)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.json()["items"][0]["name"], "Pain")
+
+    def test_write_is_served_once_committed(self):
+        self.client.get(self.path)
+        ItemService.create_item(self.shopping_list, "Lait")
+        items = self.client.get(self.path).json()["items"]
+        self.assertEqual([item["name"] for item in items], ["Lait"])
+
+    def test_write_from_another_process_is_served(self):
+        first = self.client.get(self.path)
+        # What another worker's write leaves behind: new rows and a new
+        # revision, and nothing in this process's cache.
+        Item.objects.bulk_create([Item(shopping_list=self.shopping_list, name="Sel")])
+        ShoppingList.objects.filter(pk=self.shopping_list.pk).update(
+            revision=F("revision") + 1
+        )
+        second = self.client.get(self.path, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second.json()["items"][0]["name"], "Sel")
+
+    def test_render_overtaken_by_a_write_is_not_cached(self):
+        list_data_with_revision = fast_serializers.list_data_with_revision
+
+        def write_then_render(shopping_list):
+            # Another process writes between the list and the items reads
+            ShoppingList.objects.filter(pk=shopping_list.pk).update(
+                revision=F("revision") + 1
+            )
+            return list_data_with_revision(shopping_list)
+
+        with mock.patch.object(
+            fast_serializers, "list_data_with_revision", write_then_render
+        ):
+            self.client.get(self.path)
+        self.assertIsNone(snapshot_cache.get(self.shopping_list.pk, 0))
+        self.client.get(self.path)
+        self.assertIsNotNone(snapshot_cache.get(self.shopping_list.pk, 1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ListSnapshotCache(max_entries=2)
+        for list_pk in (1, 2, 3):
+            cache.set(list_pk, 5, str(list_pk).encode())
+        self.assertIsNone(cache.get(1, 5))
+        self.assertEqual(cache.get(3, 5), b"3")
+        self.assertIsNone(cache.get(3, 6))
+        # An older render never replaces a newer one
+        cache.set(3, 4, b"old")
+        self.assertEqual(cache.get(3, 5), b"3")
+
+
+class CommandTests(TestCase):
+    """WebSocket commands answer with an ACK mirroring the HTTP statuses."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.list_id = self.shopping_list.list_id
+        self.item = Item.objects.create(shopping_list=self.shopping_list, name="Riz")
+
+    def _run(self, action, list_id=None, **payload):
+        message = {"action": action, "request_id": "r1", **payload}
+        return execute_command(list_id or self.list_id, message)
+
+    def test_successful_command_returns_its_data(self):
+        ack = self._run("add_item", name="Pain")
+        self.assertEqual(ack["event"], "ACK")
+        self.assertEqual(ack["request_id"], "r1")
+        self.assertTrue(ack["ok"])
+        self.assertEqual(ack["data"]["name"], "Pain")
+        self.assertTrue(self.shopping_list.items.filter(name="Pain").exists())
+
+    def test_error_statuses(self):
+        other_item = Item.objects.create(
+            shopping_list=ShoppingList.objects.create(), name="Sel"
+        )
+        ItemService.claim_item(self.item, "Alice")
+        cases = [
+            (400, "nope", {}),
+            (400, "add_item", {"name": ""}),
+            (400, "claim", {"item_id": self.item.id}),
+            (403, "claim", {"item_id": self.item.id, "pseudo": "Bob"}),
+            (403, "update", {"item_id": self.item.id, "current_pseudo": "Bob"}),
+            (404, "delete", {"item_id": other_item.id}),
+            (404, "delete", {"item_id": "x"}),
+            (409, "update", {"item_id": self.item.id, "version": 0, "name": "X"}),
+        ]
+        for status, action, payload in cases:
+            ack = self._run(action, **{"current_pseudo": "Alice", **payload})
+            self.assertFalse(ack["ok"], (action, payload))
+            self.assertEqual(ack["status"], status, (action, payload))
+            self.assertTrue(ack["error"])
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.name, "Riz")
+
+    def test_unexpected_failure_is_answered_with_500(self):
+        failure = RuntimeError("database is locked")
+        with mock.patch.object(ItemService, "create_item", side_effect=failure):
+            with self.assertLogs("api.commands", "ERROR"):
+                ack = self._run("add_item", name="Pain")
+        self.assertEqual((ack["ok"], ack["status"]), (False, 500))
+        self.assertEqual(ack["request_id"], "r1")
+        self.assertNotIn("locked", ack["error"])
+
+    def test_missing_list(self):
+        ack = self._run("reset", list_id="NOLIST")
+        self.assertEqual((ack["ok"], ack["status"]), (False, 404))
+        self.assertEqual(ack["error"], "Liste introuvable")
+
+
+class OutboxTests(TestCase):
+    """Broadcasts leave once their transaction commits, one frame per list."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.group = list_group_name(self.shopping_list.list_id)
+
+    def _events(self, frames):
+        self.assertTrue(all(group == self.group for group, _ in frames))
+        return [json.loads(frame["text"]) for _, frame in frames]
+
+    def test_rolled_back_write_broadcasts_nothing(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    ItemService.create_item(self.shopping_list, "Pain")
+                    raise RuntimeError("rollback")
+                ItemService.create_item(self.shopping_list, "Lait")
+                # Nothing leaves before the commit
+                self.assertEqual(frames, [])
+        (event,) = self._events(frames)
+        self.assertEqual(event["event"], "ITEM_ADDED")
+        self.assertEqual(event["item"]["name"], "Lait")
+        self.assertEqual(event["revision"], 1)
+        self.assertEqual(ListEvent.objects.count(), 1)
+
+    def test_failed_rename_event_rolls_back_the_rename(self):
+        item = Item.objects.create(
+            shopping_list=self.shopping_list,
+            name="Pain",
+            status="claimed",
+            claimed_by="Alice",
+        )
+        with mock.patch("api.services.publish_to_list", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                ShoppingListService.rename_pseudo(self.shopping_list, "Alice", "Bob")
+        item.refresh_from_db()
+        self.assertEqual((item.claimed_by, item.version), ("Alice", 0))
+
+    def test_events_of_a_rolled_back_savepoint_are_not_sent(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    ItemService.create_item(self.shopping_list, "Pain")
+                    with self.assertRaises(RuntimeError), transaction.atomic():
+                        ItemService.create_item(self.shopping_list, "Lait")
+                        raise RuntimeError("rollback")
+        (event,) = self._events(frames)
+        self.assertEqual((event["item"]["name"], event["revision"]), ("Pain", 1))
+        revisions = ListEvent.objects.values_list("revision", flat=True)
+        self.assertEqual(list(revisions), [1])
+
+        # The next write gets the next committed revision
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                ItemService.create_item(self.shopping_list, "Sel")
+        (event,) = self._events(frames)
+        self.assertEqual(event["revision"], 2)
+
+    def test_events_of_a_released_savepoint_share_the_frame(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    with transaction.atomic():
+                        ItemService.create_item(self.shopping_list, "Pain")
+                    with self.assertRaises(RuntimeError), transaction.atomic():
+                        ItemService.create_item(self.shopping_list, "Lait")
+                        raise RuntimeError("rollback")
+                    ItemService.create_item(self.shopping_list, "Sel")
+        (frame,) = self._events(frames)
+        self.assertEqual(
+            [(e["item"]["name"], e["revision"]) for e in frame["events"]],
+            [("Pain", 1), ("Sel", 2)],
+        )
+
+    def test_events_of_one_transaction_share_a_frame(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    ItemService.create_item(self.shopping_list, "Pain")
+                    ItemService.create_item(self.shopping_list, "Lait")
+                    self.assertEqual(frames, [])
+        (frame,) = self._events(frames)
+        self.assertEqual(frame["event"], "BATCH")
+        self.assertEqual(
+            [(e["item"]["name"], e["revision"]) for e in frame["events"]],
+            [("Pain", 1), ("Lait", 2)],
+        )
+
+    def test_dispatcher_sends_on_the_attached_loop(self):
+        message = {"type": "item_deleted", "event": "ITEM_DELETED", "item_id": 1}
+
+        async def scenario():
+            dispatcher = broadcast.dispatcher
+            dispatcher.attach()
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(self.group, channel)
+            dispatcher.submit([(self.group, broadcast.encode_frame([message]))])
+            # Sent before the loop closes: no task is left pending
+            await dispatcher.join()
+            self.assertEqual(dispatcher.backlog, 0)
+            return await asyncio.wait_for(layer.receive(channel), 2)
+
+        frame = async_to_sync(scenario)()
+        self.assertEqual(json.loads(frame["text"]), message)
+
+
+class ResetTests(TestCase):
+    """A reset deletes bought items, releases claimed ones, and sends a diff."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        # No signals: nothing is published before the test starts
+        items = Item.objects.bulk_create(
+            Item(
+                shopping_list=self.shopping_list,
+                name=status,
+                status=status,
+                claimed_by=None if status == "pending" else "Alice",
+            )
+            for status in ("pending", "claimed", "bought")
+        )
+        self.items = {item.status: item for item in items}
+
+    def test_reset_broadcasts_one_diff(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                payload, text = ShoppingListService.reset_list(self.shopping_list)
+
+        self.assertEqual(payload["deleted_ids"], [self.items["bought"].id])
+        self.assertEqual(payload["reset_ids"], [self.items["claimed"].id])
+        self.assertEqual(
+            list(self.shopping_list.items.values_list("name", "status", "claimed_by")),
+            [("pending", "pending", None), ("claimed", "pending", None)],
+        )
+        claimed = Item.objects.get(pk=self.items["claimed"].pk)
+        self.assertEqual(claimed.version, 1)
+
+        # No ITEM_DELETED per item: the diff is the only event
+        ((_, frame),) = frames
+        event = json.loads(frame["text"])
+        self.assertEqual(event, {"type": "list_reset", **payload})
+        self.assertEqual(frame["text"], text)
+        self.assertEqual(ListEvent.objects.get().revision, payload["revision"])
+
+    def test_reset_view_answers_with_the_broadcast_text(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f"/api/lists/{self.shopping_list.list_id}/reset/"
+                )
+        ((_, frame),) = frames
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), frame["text"])
+        self.assertEqual(response.json()["deleted_ids"], [self.items["bought"].id])
+
+    def test_reset_of_a_clean_list_changes_nothing(self):
+        Item.objects.exclude(status="pending").update(status="pending")
+        payload, _ = ShoppingListService.reset_list(self.shopping_list)
+        self.assertEqual((payload["deleted_ids"], payload["reset_ids"]), ([], []))
+        self.assertEqual(
+            list(self.shopping_list.items.values_list("version", flat=True)), [0, 0, 0]
+        )
+
+    def test_items_are_deleted_in_one_statement_only_while_safe(self):
+        from django.db.models.signals import post_delete, pre_delete
+        from .signals import delete_items_without_broadcast, item_deleted
+
+        # What the single DELETE relies on: no row references an item, and
+        # item_deleted, silenced anyway, is the only delete receiver.
+        self.assertEqual(Item._meta.related_objects, ())
+        sync_receivers, async_receivers = post_delete._live_receivers(Item)
+        self.assertEqual(sync_receivers + async_receivers, [item_deleted])
+
+        with self.assertRaises(TypeError):
+            delete_items_without_broadcast(ShoppingList.objects.all())
+        pre_delete.connect(print, sender=Item, weak=False)
+        self.addCleanup(pre_delete.disconnect, print, sender=Item)
+        with self.assertRaises(TypeError):
+            delete_items_without_broadcast(Item.objects.all())
+        self.assertEqual(Item.objects.count(), 3)
+
+
+class ChangesTests(TestCase):
+    """Reconnecting clients get the events they missed, or a snapshot."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.path = f"/api/lists/{self.shopping_list.list_id}/changes/"
+        for name in ("Pain", "Lait", "Oeufs"):
+            ItemService.create_item(self.shopping_list, name)
+
+    def _changes(self, since):
+        return self.client.get(self.path, {"since": since})
+
+    def test_missed_events_in_order(self):
+        changes = self._changes(1).json()
+        self.assertEqual(changes["revision"], 3)
+        self.assertEqual([e["revision"] for e in changes["events"]], [2, 3])
+        self.assertEqual(changes["events"][0]["item"]["name"], "Lait")
+        self.assertEqual(self._changes(3).json(), {"revision": 3, "events": []})
+
+    @override_settings(LIST_EVENT_LOG={"MAX_EVENTS": 2, "PRUNE_EVERY": 1})
+    def test_snapshot_when_the_log_no_longer_has_the_gap(self):
+        ItemService.create_item(self.shopping_list, "Sel")
+        self.assertEqual(
+            list(ListEvent.objects.values_list("revision", flat=True)), [3, 4]
+        )
+        self.assertEqual(len(self._changes(2).json()["events"]), 2)
+        for since in (0, 1, 99, -1):
+            changes = self._changes(since).json()
+            self.assertNotIn("events", changes, since)
+            self.assertEqual(changes["revision"], 4)
+            self.assertEqual(len(changes["snapshot"]["items"]), 4)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._changes("x").status_code, 400)
+        self.assertEqual(self.client.get(self.path).status_code, 400)
+        missing = self.client.get("/api/lists/NOLIST/changes/", {"since": 0})
+        self.assertEqual(missing.status_code, 404)
+
+
+class BatchTests(TestCase):
+    """Batches apply what they can and report each operation's outcome."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.path = f"/api/lists/{self.shopping_list.list_id}/items/batch/"
+        self.riz, self.sel = Item.objects.bulk_create(
+            Item(shopping_list=self.shopping_list, name=name) for name in ("Riz", "Sel")
+        )
+
+    def _post(self, operations):
+        return self.client.post(
+            self.path, {"operations": operations}, content_type="application/json"
+        )
+
+    def test_rejected_operations_do_not_stop_the_others(self):
+        operations = [
+            {"op": "add", "name": "Pain"},
+            {"op": "add"},
+            {"op": "claim", "item_id": self.riz.id, "pseudo": "Alice"},
+            {"op": "validate", "item_id": self.riz.id, "pseudo": "Bob"},
+            {"op": "claim", "item_id": 10**9, "pseudo": "Alice"},
+            {"op": "delete", "item_id": self.sel.id},
+            {"op": "update", "item_id": self.sel.id, "name": "Poivre"},
+            {"op": "explode"},
+        ]
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._post(operations)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["index"] for r in results], list(range(8)))
+        self.assertEqual(
+            [r["ok"] for r in results],
+            [True, False, True, False, False, True, False, False],
+        )
+        self.assertEqual(results[2]["item"]["claimed_by"], "Alice")
+        self.assertEqual(results[5]["item_id"], self.sel.id)
+        self.assertEqual(results[7]["error"], "Opération inconnue : explode")
+
+        self.assertEqual(
+            list(self.shopping_list.items.values_list("name", "status")),
+            [("Riz", "claimed"), ("Pain", "pending")],
+        )
+        ((_, frame),) = frames
+        event = json.loads(frame["text"])
+        self.assertEqual(event["event"], "BATCH")
+        self.assertEqual(
+            [e["event"] for e in event["events"]],
+            ["ITEM_ADDED", "ITEM_UPDATED", "ITEM_DELETED"],
+        )
+        self.assertEqual(event["revision"], response.json()["revision"])
+
+    def test_batch_with_nothing_applied_broadcasts_nothing(self):
+        with broadcast.capture() as frames:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._post([{"op": "delete", "item_id": 10**9}])
+        self.assertEqual(response.json()["revision"], None)
+        self.assertFalse(response.json()["results"][0]["ok"])
+        self.assertEqual(frames, [])
+
+    def test_invalid_batches_are_refused(self):
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post(["add"]).status_code, 400)
+        too_many = [{"op": "add", "name": "x"}] * (MAX_BATCH_OPERATIONS + 1)
+        self.assertEqual(self._post(too_many).status_code, 400)
+        self.assertEqual(self.shopping_list.items.count(), 2)
+
+
+class FrameTests(TransactionTestCase):
+    """A broadcast is encoded once and forwarded to every socket as is."""
+
+    def _connect(self, list_id):
+        from teamshop.asgi import application
+
+        return WebsocketCommunicator(
+            application,
+            f"/ws/lists/{list_id}/",
+            headers=[(b"host", b"localhost"), (b"origin", b"http://localhost")],
+        )
+
+    def test_encode_frame_batches_several_events(self):
+        events = [{"event": "ITEM_DELETED", "item_id": n} for n in (1, 2)]
+        single = broadcast.encode_frame(events[:1])
+        self.assertEqual(single["type"], "list_frame")
+        self.assertEqual(json.loads(single["text"]), events[0])
+        batch = json.loads(broadcast.encode_frame(events)["text"])
+        self.assertEqual(batch["event"], "BATCH")
+        self.assertEqual(batch["events"], events)
+
+    def test_every_socket_gets_the_same_text(self):
+        list_id = ShoppingList.objects.create().list_id
+        request = AsyncRequestFactory().post(
+            "/", data=json.dumps({"name": "Lait"}), content_type="application/json"
+        )
+
+        async def scenario():
+            sockets = [self._connect(list_id) for _ in range(3)]
+            for socket in sockets:
+                await socket.connect()
+            await async_views.add_item(request, list_id)
+            texts = [await socket.receive_from(timeout=5) for socket in sockets]
+            for socket in sockets:
+                await socket.disconnect()
+            return texts
+
+        encoded, encode_frame = [], broadcast.encode_frame
+
+        def encode(messages):
+            encoded.append(encode_frame(messages))
+            return encoded[-1]
+
+        with mock.patch.object(broadcast, "encode_frame", side_effect=encode):
+            texts = async_to_sync(scenario)()
+        self.assertEqual(len(encoded), 1)
+        self.assertEqual(texts, [encoded[0]["text"]] * 3)
+        self.assertEqual(json.loads(texts[0])["item"]["name"], "Lait")
+
+
+class DatabaseChannelLayerTests(TransactionTestCase):
+    """Two layer instances stand in for two daphne processes."""
+
+    def _layers(self):
+        return (
+            DatabaseChannelLayer(poll_interval=0.01, expiry=5),
+            DatabaseChannelLayer(poll_interval=0.01, expiry=5),
+        )
+
+    def test_group_send_reaches_other_process(self):
+        async def scenario():
+            a, b = self._layers()
+            local = await a.new_channel()
+            remote = await b.new_channel()
+            await a.group_add("list_ABC", local)
+            await b.group_add("list_ABC", remote)
+            await asyncio.sleep(0.05)
+
+            await a.group_send("list_ABC", {"type": "list.frame", "text": "hi"})
+            received = await asyncio.wait_for(b.receive(remote), 2)
+            own = await asyncio.wait_for(a.receive(local), 2)
+            return received, own, a.channels.get(local)
+
+        received, own, leftover = asyncio.run(scenario())
+        self.assertEqual(received["text"], "hi")
+        self.assertEqual(own["text"], "hi")
+        # The sender does not get its own row back from the table.
+        self.assertFalse(leftover)
+
+    def test_send_to_channel_of_other_process(self):
+        async def scenario():
+            a, b = self._layers()
+            await a.new_channel()
+            remote = await b.new_channel()
+            await asyncio.sleep(0.05)
+            await a.send(remote, {"type": "test", "data": b"\x00\x01"})
+            return await asyncio.wait_for(b.receive(remote), 2)
+
+        message = asyncio.run(scenario())
+        self.assertEqual(message["data"], b"\x00\x01")
+
+
+class AsyncViewsTests(TransactionTestCase):
+    """The async views keep the contracts of their sync counterparts."""
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.shopping_list = ShoppingList.objects.create()
+        self.list_id = self.shopping_list.list_id
+
+    def _json(self, method, path, data=None):
+        return getattr(self.factory, method)(
+            path, data=json.dumps(data or {}), content_type="application/json"
+        )
+
+    def test_add_item_broadcasts_and_returns_item(self):
+        async def scenario():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add(list_group_name(self.list_id), channel)
+            request = self._json("post", "/", {"name": "Lait"})
+            response = await async_views.add_item(request, self.list_id)
+            frame = await asyncio.wait_for(layer.receive(channel), 2)
+            return response, json.loads(frame["text"])
+
+        response, event = async_to_sync(scenario)()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)["name"], "Lait")
+        self.assertEqual(event["event"], "ITEM_ADDED")
+        self.assertEqual(event["revision"], 1)
+
+    def test_get_list_matches_sync_view(self):
+        Item.objects.create(shopping_list=self.shopping_list, name="Pain")
+        path = f"/api/lists/{self.list_id}/"
+        expected = self.client.get(path).content
+        response = async_to_sync(async_views.get_list)(
+            self.factory.get(path), self.list_id
+        )
+        self.assertEqual(response.content, expected)
+        missing = async_to_sync(async_views.get_list)(self.factory.get(path), "NOPE")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_update_and_delete_respect_lock(self):
+        item = Item.objects.create(
+            shopping_list=self.shopping_list,
+            name="Oeufs",
+            status="claimed",
+            claimed_by="Alice",
+        )
+        request = self._json("patch", "/", {"current_pseudo": "Bob", "name": "X"})
+        response = async_to_sync(async_views.update_item)(request, item.id)
+        self.assertEqual(response.status_code, 403)
+
+        request = self._json("patch", "/", {"current_pseudo": "Alice", "name": "X"})
+        response = async_to_sync(async_views.update_item)(request, item.id)
+        self.assertEqual(json.loads(response.content)["name"], "X")
+
+        request = self._json("delete", "/", {"current_pseudo": "Alice"})
+        response = async_to_sync(async_views.delete_item)(request, item.id)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Item.objects.filter(id=item.id).exists())
+
+
+class ItemCompareAndSetTests(TestCase):
+    """Claims and updates only apply to the item state they were decided on."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.item = Item.objects.create(shopping_list=self.shopping_list, name="Riz")
+
+    def _stale_copy(self):
+        return Item.objects.select_related("shopping_list").get(id=self.item.id)
+
+    def test_only_one_of_two_racing_claims_wins(self):
+        first, second = self._stale_copy(), self._stale_copy()
+        ItemService.claim_item(first, "Alice")
+        with self.assertRaises(ConflictError):
+            ItemService.claim_item(second, "Bob")
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.claimed_by, "Alice")
+        self.assertEqual(self.item.version, 1)
+
+    def test_claim_endpoints(self):
+        url = f"/api/items/{self.item.id}/"
+        response = self.client.post(
+            url + "claim/", {"pseudo": "Alice"}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["status"], "claimed")
+        response = self.client.post(
+            url + "claim/", {"pseudo": "Bob"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            url + "unclaim/", {"pseudo": "Alice"}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["status"], "pending")
+        self.client.post(
+            url + "claim/", {"pseudo": "Bob"}, content_type="application/json"
+        )
+        response = self.client.post(
+            url + "validate/", {"pseudo": "Bob"}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["status"], "bought")
+        self.assertEqual(response.json()["version"], 4)
+
+    def test_patch_with_stale_version_conflicts(self):
+        url = f"/api/items/{self.item.id}/"
+        response = self.client.patch(
+            url, {"name": "Riz basmati", "version": 0}, content_type="application/json"
+        )
+        self.assertEqual(response.json()["version"], 1)
+        response = self.client.patch(
+            url, {"name": "Riz rond", "version": 0}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.name, "Riz basmati")
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every list operation runs a fixed number of queries, whatever the list size.
+    Budgets count the statements of a request inside the test transaction.
+    """
+
+    BUDGETS = {
+        # Savepoint, INSERT, release: the savepoint lets a taken code be retried
+        "create_list": 4,
+        # The list row, then the items joined to the revision again
+        "get_list": 2,
+        # The list row, for its revision
+        "get_list_cached": 1,
+        "get_changes": 1,
+        # add_item and batch: one more than the other writes, the upsert
+        # counting the added names
+        "add_item": 8,
+        "update_item": 7,
+        "claim": 7,
+        "unclaim": 7,
+        "validate": 7,
+        "delete_item": 5,
+        "batch": 8,
+        "rename_pseudo": 8,
+        "reset_list": 9,
+    }
+
+    def _make_list(self, size):
+        shopping_list = ShoppingList.objects.create()
+        statuses = ["pending", "claimed", "bought"]
+        Item.objects.bulk_create(
+            Item(
+                shopping_list=shopping_list,
+                name=f"Article {n}",
+                status=statuses[n % 3],
+                claimed_by="Alice" if n % 3 else None,
+            )
+            for n in range(size)
+        )
+        return shopping_list
+
+    def _requests(self, list_id, item_id):
+        url = f"/api/items/{item_id}/"
+        post = self.client.post
+        json_type = {"content_type": "application/json"}
+        return [
+            ("create_list", lambda: post("/api/lists/")),
+            ("get_list", lambda: self.client.get(f"/api/lists/{list_id}/")),
+            ("get_list_cached", lambda: self.client.get(f"/api/lists/{list_id}/")),
+            (
+                "get_changes",
+                lambda: self.client.get(f"/api/lists/{list_id}/changes/?since=0"),
+            ),
+            (
+                "add_item",
+                lambda: post(
+                    f"/api/lists/{list_id}/items/", {"name": "Sel"}, **json_type
+                ),
+            ),
+            (
+                "update_item",
+                lambda: self.client.patch(url, {"name": "Poivre"}, **json_type),
+            ),
+            ("claim", lambda: post(url + "claim/", {"pseudo": "Bob"}, **json_type)),
+            ("unclaim", lambda: post(url + "unclaim/", {"pseudo": "Bob"}, **json_type)),
+            ("claim", lambda: post(url + "claim/", {"pseudo": "Bob"}, **json_type)),
+            (
+                "validate",
+                lambda: post(url + "validate/", {"pseudo": "Bob"}, **json_type),
+            ),
+            (
+                "batch",
+                lambda: post(
+                    f"/api/lists/{list_id}/items/batch/",
+                    {"operations": [{"op": "add", "name": "Thé"}]},
+                    **json_type,
+                ),
+            ),
+            (
+                "rename_pseudo",
+                lambda: post(
+                    f"/api/lists/{list_id}/rename-pseudo/",
+                    {"old_pseudo": "Alice", "new_pseudo": "Carole"},
+                    **json_type,
+                ),
+            ),
+            ("delete_item", lambda: self.client.delete(url + "delete/")),
+            ("reset_list", lambda: post(f"/api/lists/{list_id}/reset/")),
+        ]
+
+    def _query_counts(self, size):
+        # Start a fresh code block, so its reservation is not measured below
+        list_ids.allocator.discard_block()
+        shopping_list = self._make_list(size)
+        item = shopping_list.items.filter(status="pending").first()
+        snapshot_cache.clear()
+        counts = {}
+        for name, send in self._requests(shopping_list.list_id, item.id):
+            with CaptureQueriesContext(connection) as queries:
+                response = send()
+            self.assertLess(response.status_code, 400, name)
+            counts[name] = max(counts.get(name, 0), len(queries))
+        return counts
+
+    def test_budgets_hold_for_small_and_large_lists(self):
+        small = self._query_counts(3)
+        large = self._query_counts(3000)
+        self.assertEqual(small, large)
+        for name, count in large.items():
+            self.assertLessEqual(count, self.BUDGETS[name], name)
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are checked on SQLite")
+class ItemIndexTests(TestCase):
+    """The hot item queries are served by the composite indexes."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertIn(index, queryset.explain())
+
+    def test_list_items_in_display_order(self):
+        self.assertUsesIndex(self.shopping_list.items.all(), "item_list_created_idx")
+
+    def test_reset_lookup(self):
+        queryset = self.shopping_list.items.filter(
+            status__in=["bought", "claimed"]
+        ).order_by()
+        self.assertUsesIndex(queryset, "item_list_status_idx")
+
+    def test_cursor_pages_seek_the_index(self):
+        item = Item.objects.create(shopping_list=self.shopping_list, name="Sel")
+        cursor = pagination.encode_cursor(item)
+        items = self.shopping_list.items.all()
+        for queryset, index in (
+            (items, "item_list_created_idx"),
+            (items.filter(status="pending"), "item_list_status_idx"),
+        ):
+            plan = pagination.seek(queryset, cursor)[:101].explain()
+            self.assertIn(index, plan)
+            self.assertIn("created_at>", plan)
+
+    def test_rename_lookup(self):
+        queryset = self.shopping_list.items.filter(
+            claimed_by="Alice", status="claimed"
+        ).order_by()
+        self.assertUsesIndex(queryset, "item_list_claimer_idx")
+
+
+class WebSocketLoadTests(TransactionTestCase):
+    """A small run of the fan-out load test delivers every event."""
+
+    def test_fanout_delivers_every_event(self):
+        # One list: the in-memory test database cannot take concurrent writers.
+        stats = async_to_sync(run_fanout)(
+            CommunicatorTransport(), lists=1, subscribers=6, mutations=4, timeout=2
+        )
+        self.assertEqual(stats["connections"], 6)
+        self.assertEqual(stats["failed_requests"], 0)
+        self.assertEqual(stats["delivered"], 24)
+        self.assertEqual(stats["dropped"], 0)
+
+
+class DataGenerationTests(TestCase):
+    """Generated lists look like lists the app produces."""
+
+    def test_statuses_and_pseudos_are_consistent(self):
+        rng = random.Random(1)
+        pseudos = pseudo_pool(20, rng)
+        self.assertEqual(len(set(pseudos)), 20)
+        shopping_list = generate_list(500, pseudos, rng)
+        items = shopping_list.items.all()
+        self.assertEqual(items.count(), 500)
+        self.assertFalse(items.filter(status="pending").exclude(claimed_by=None))
+        self.assertFalse(items.exclude(status="pending").filter(claimed_by=None))
+        self.assertEqual(
+            set(items.values_list("status", flat=True)),
+            {"pending", "claimed", "bought"},
+        )
+
+    def test_bench_api_runs_every_endpoint(self):
+        out = io.StringIO()
+        call_command("bench_api", sizes="5", iterations=2, stdout=out)
+        self.assertIn("reset_list", out.getvalue())
+        self.assertFalse(ShoppingList.objects.exists())
+
+
+class BenchmarkBaselineTests(TransactionTestCase):
+    """
+    The endpoints still run the queries of ``benchmarks/api_baseline.json``.
+    Outside a test transaction, as from the command line: no savepoints.
+    """
+
+    def test_query_counts_match_the_baseline(self):
+        from .management.commands.bench_api import DEFAULT_BASELINE
+
+        with open(DEFAULT_BASELINE) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        smallest = min(int(key.rsplit("@", 1)[1]) for key in baseline)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.json")
+            # Timings depend on the machine: only the query counts must match.
+            # As many iterations as the baseline, for the event log pruned
+            # every PRUNE_EVERY revisions to cost the same requests a query.
+            call_command(
+                "bench_api",
+                sizes=str(smallest),
+                iterations=stored["meta"]["iterations"],
+                compare=str(DEFAULT_BASELINE),
+                save_baseline=path,
+                stdout=io.StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)["results"]
+        self.assertEqual(
+            {key: result["queries"] for key, result in results.items()},
+            {
+                key: result["queries"]
+                for key, result in baseline.items()
+                if key.endswith(f"@{smallest}")
+            },
+        )
+
+
+class MetricsTests(TransactionTestCase):
+    """Hot paths feed the metrics exposed at /api/metrics/."""
+
+    def _scrape(self, **headers):
+        return self.client.get("/api/metrics/", **headers)
+
+    def _value(self, text, sample):
+        for line in text.splitlines():
+            if line.startswith(sample + " "):
+                return float(line.rsplit(" ", 1)[1])
+        return 0.0
+
+    def test_histogram_sums_every_thread(self):
+        histogram = metrics.Histogram("test_seconds", "Test.", buckets=(1, 2))
+        metrics.REGISTRY.remove(histogram)
+        thread = threading.Thread(target=histogram.observe, args=(1.5,))
+        thread.start()
+        thread.join()
+        histogram.observe(0.5)
+        histogram.observe(3)
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{le="1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="2"} 2', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("test_seconds_sum 5.0", lines)
+        self.assertIn("test_seconds_count 3", lines)
+
+    def test_requests_record_latency_and_queries(self):
+        list_id = ShoppingList.objects.create().list_id
+        sample = 'teamshop_db_queries_per_request_count{view="get_list"}'
+        before = self._value(self._scrape().content.decode(), sample)
+        snapshot_cache.clear()
+        self.client.get(f"/api/lists/{list_id}/")
+
+        response = self._scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertEqual(self._value(text, sample), before + 1)
+        self.assertIn(
+            'teamshop_http_request_duration_seconds_bucket{view="get_list",le="+Inf"}',
+            text,
+        )
+
+    def test_async_requests_count_queries_in_worker_threads(self):
+        async def view(request):
+            await sync_to_async(ShoppingList.objects.count)()
+            return HttpResponse()
+
+        middleware = metrics.MetricsMiddleware(view)
+        request = AsyncRequestFactory().get("/")
+        histogram = metrics.db_queries_per_request
+        before = histogram._get("other").totals()
+        async_to_sync(middleware)(request)
+        after = histogram._get("other").totals()
+        # One more request in the "1 query" bucket
+        index = metrics.QUERY_BUCKETS.index(1)
+        self.assertEqual(after[index], before[index] + 1)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self._scrape().status_code, 403)
+        response = self._scrape(HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_websocket_gauges_are_not_labelled_by_list(self):
+        from teamshop.asgi import application
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                application,
+                "/ws/lists/GAUGE1/",
+                headers=[(b"host", b"localhost"), (b"origin", b"http://localhost")],
+            )
+            await communicator.connect()
+            during = metrics.render()
+            await communicator.disconnect()
+            return during
+
+        before = metrics.render()
+        during = async_to_sync(scenario)()
+        after = metrics.render()
+        for sample in ("teamshop_websocket_connections", "teamshop_websocket_lists"):
+            self.assertEqual(
+                self._value(during, sample), self._value(before, sample) + 1
+            )
+            self.assertEqual(self._value(after, sample), self._value(before, sample))
+        self.assertNotIn("GAUGE1", after)
+
+    def test_messages_dropped_at_capacity_are_counted(self):
+        layer = MemoryChannelLayer(capacity=1)
+        dropped = metrics.channel_messages_dropped
+        before = dropped._unlabelled.totals()[0]
+
+        async def scenario():
+            await layer.group_add("full", "full.channel")
+            await layer.group_send("full", {"type": "list.frame"})
+            await layer.group_send("full", {"type": "list.frame"})
+
+        async_to_sync(scenario)()
+        # The refused message and the backlog it replaces
+        self.assertEqual(dropped._unlabelled.totals()[0], before + 2)
+        notice = async_to_sync(layer.receive)("full.channel")
+        self.assertEqual(notice["type"], "channel.overflow")
+
+
+class ProfilingTests(TransactionTestCase):
+    """Selected requests and commands are profiled and reported."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.list_id = ShoppingList.objects.create().list_id
+
+    def _config(self, **overrides):
+        config = {"ENABLED": True, "TOKEN": "t0k", "DIR": self.directory.name}
+        return override_settings(REQUEST_PROFILING={**config, **overrides})
+
+    def _reports(self):
+        names = sorted(os.listdir(self.directory.name))
+        return [name for name in names if name.endswith(".json")], names
+
+    def test_header_selects_request(self):
+        with self._config():
+            plain = self.client.get(f"/api/lists/{self.list_id}/")
+            snapshot_cache.clear()
+            response = self.client.get(
+                f"/api/lists/{self.list_id}/", HTTP_X_PROFILE="t0k"
+            )
+        self.assertNotIn("Server-Timing", plain)
+        timing = response["Server-Timing"]
+        for section in ("db;dur=", "serialize;dur=", "broadcast;dur=", "app;dur="):
+            self.assertIn(section, timing)
+
+        reports, names = self._reports()
+        self.assertEqual(len(reports), 1)
+        self.assertIn(reports[0].replace(".json", ".prof"), names)
+        self.assertTrue(reports[0].startswith(response["X-Profile-Id"]))
+        with open(os.path.join(self.directory.name, reports[0])) as f:
+            report = json.load(f)
+        self.assertEqual(report["view"], "get_list")
+        self.assertEqual(report["status"], 200)
+        self.assertTrue(report["queries"])
+
+    def test_rate_sampling_profiler_and_rotation(self):
+        with self._config(RATE=1.0, KEEP=2, PROFILER="sampling"):
+            for n in range(3):
+                self.client.post(
+                    f"/api/lists/{self.list_id}/items/",
+                    json.dumps({"name": f"Article {n}"}),
+                    content_type="application/json",
+                )
+        reports, names = self._reports()
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(len([n for n in names if n.endswith(".folded")]), 2)
+
+    def test_disabled_middleware_is_removed(self):
+        with self._config(ENABLED=False):
+            response = self.client.get(
+                f"/api/lists/{self.list_id}/", HTTP_X_PROFILE="t0k"
+            )
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self._reports(), ([], []))
+
+    def test_consumer_wrapper_profiles_commands(self):
+        from channels.routing import URLRouter
+        from django.urls import re_path
+
+        with self._config():
+            application = URLRouter(
+                [
+                    re_path(
+                        r"ws/lists/(?P<list_id>\w+)/$",
+                        profiling.profile_consumer(ListConsumer).as_asgi(),
+                    )
+                ]
+            )
+
+            async def scenario():
+                communicator = WebsocketCommunicator(
+                    application, f"/ws/lists/{self.list_id}/?profile=t0k"
+                )
+                await communicator.connect()
+                await communicator.send_json_to(
+                    {"action": "add_item", "request_id": "1", "name": "Pain"}
+                )
+                while True:
+                    message = await communicator.receive_json_from(timeout=5)
+                    if message.get("event") == "ACK":
+                        break
+                await communicator.disconnect()
+                return message
+
+            ack = async_to_sync(scenario)()
+        self.assertTrue(ack["ok"])
+        reports, _ = self._reports()
+        self.assertEqual(len(reports), 1)
+        with open(os.path.join(self.directory.name, reports[0])) as f:
+            report = json.load(f)
+        self.assertEqual(report["method"], "WS")
+        self.assertEqual(report["view"], "add_item")
+        self.assertTrue(report["queries"])
+
+
+class ETagTests(TestCase):
+    """List snapshots carry revision ETags and answer conditional GETs."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        self.list_id = self.shopping_list.list_id
+        self.path = f"/api/lists/{self.list_id}/"
+        self.item = Item.objects.create(shopping_list=self.shopping_list, name="Pain")
+        snapshot_cache.clear()
+
+    def _post(self, path, data=None):
+        # Run the on-commit broadcasts, as a real commit would.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                path, json.dumps(data or {}), content_type="application/json"
+            )
+
+    def test_conditional_get_returns_304_without_loading_items(self):
+        response = self.client.get(self.path)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        revision = json.loads(response.content)["revision"]
+        self.assertEqual(etag, f'"{self.list_id}-{revision}"')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+        self.assertEqual(cached["ETag"], etag)
+
+        snapshot_cache.clear()
+        with self.assertNumQueries(1):
+            uncached = self.client.get(self.path, HTTP_IF_NONE_MATCH=f"W/{etag}")
+        self.assertEqual(uncached.status_code, 304)
+        stale = self.client.get(self.path, HTTP_IF_NONE_MATCH='"other-1"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_mutations_return_the_new_etag(self):
+        etag = self.client.get(self.path)["ETag"]
+        mutations = [
+            (f"{self.path}items/", {"name": "Lait"}),
+            (f"/api/items/{self.item.id}/claim/", {"pseudo": "Alice"}),
+            (
+                f"{self.path}rename-pseudo/",
+                {"old_pseudo": "Alice", "new_pseudo": "Bob"},
+            ),
+            (f"{self.path}reset/", {}),
+        ]
+        for path, data in mutations:
+            response = self._post(path, data)
+            self.assertLess(response.status_code, 300)
+            self.assertNotEqual(response["ETag"], etag)
+            # The old tag no longer matches; the new one does.
+            self.assertEqual(
+                self.client.get(self.path, HTTP_IF_NONE_MATCH=etag).status_code, 200
+            )
+            etag = response["ETag"]
+            self.assertEqual(
+                self.client.get(self.path, HTTP_IF_NONE_MATCH=etag).status_code, 304
+            )
+
+        failed = self._post(f"/api/items/{self.item.id}/claim/", {})
+        self.assertEqual(failed.status_code, 400)
+        self.assertNotIn("ETag", failed)
+
+    def test_async_view_answers_conditional_get(self):
+        etag = self.client.get(self.path)["ETag"]
+        request = AsyncRequestFactory().get(self.path, headers={"If-None-Match": etag})
+        response = async_to_sync(async_views.get_list)(request, self.list_id)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+
+class WireTests(TransactionTestCase):
+    """Clients offering the MessagePack subprotocol get compact binary frames."""
+
+    event = {
+        "type": "item_updated",
+        "event": "ITEM_UPDATED",
+        "item": {
+            "id": 7,
+            "name": "Café",
+            "status": "claimed",
+            "claimed_by": "Alice",
+            "created_at": "2025-11-29T15:04:05.123456Z",
+            "updated_at": "2025-11-29T15:20:00.654321Z",
+            "version": 300,
+        },
+        "revision": -70000,
+        "ok": True,
+        "error": None,
+        "ratio": 0.5,
+    }
+
+    def _connect(self, list_id, subprotocols=None):
+        from teamshop.asgi import application
+
+        return WebsocketCommunicator(
+            application,
+            f"/ws/lists/{list_id}/",
+            headers=[(b"host", b"localhost"), (b"origin", b"http://localhost")],
+            subprotocols=subprotocols,
+        )
+
+    def test_compact_interns_keys_and_timestamps(self):
+        compact = wire.compact(self.event)
+        self.assertNotIn(wire.KEY_IDS["type"], compact)
+        item = compact[wire.KEY_IDS["item"]]
+        self.assertEqual(item[wire.KEY_IDS["created_at"]], 1764428645123)
+        self.assertEqual(compact["ratio"], 0.5)
+        expanded = wire.expand(compact)
+        self.assertEqual(expanded["event"], "ITEM_UPDATED")
+        self.assertEqual(expanded["item"]["claimed_by"], "Alice")
+
+    def test_pack_round_trip(self):
+        compact = wire.compact(self.event)
+        data = wire.pack(compact)
+        self.assertEqual(wire.unpack(data), compact)
+        with self.assertRaises(ValueError):
+            wire.unpack(data[:-1])
+
+    def test_binary_subscriber_receives_and_sends_msgpack(self):
+        list_id = ShoppingList.objects.create().list_id
+
+        async def scenario():
+            communicator = self._connect(list_id, [wire.MSGPACK_PROTOCOL])
+            connected, subprotocol = await communicator.connect()
+            request = AsyncRequestFactory().post(
+                "/", data=json.dumps({"name": "Lait"}), content_type="application/json"
+            )
+            await async_views.add_item(request, list_id)
+            frame = await communicator.receive_output(timeout=5)
+            command = {"action": "add_item", "request_id": "1", "name": "Pain"}
+            await communicator.send_to(bytes_data=wire.pack(wire.compact(command)))
+            while True:
+                reply = wire.expand(wire.unpack(await communicator.receive_from(5)))
+                if reply.get("event") == "ACK":
+                    break
+            await communicator.send_to(bytes_data=b"\xc1")
+            # The broadcast of "Pain" may come before or after its ACK
+            while True:
+                invalid = wire.expand(wire.unpack(await communicator.receive_from(5)))
+                if invalid.get("event") == "ACK":
+                    break
+            await communicator.disconnect()
+            return connected, subprotocol, frame, reply, invalid
+
+        connected, subprotocol, frame, ack, invalid = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, wire.MSGPACK_PROTOCOL)
+        self.assertNotIn("text", frame)
+        event = wire.expand(wire.unpack(frame["bytes"]))
+        self.assertEqual(event["event"], "ITEM_ADDED")
+        self.assertEqual(event["item"]["name"], "Lait")
+        self.assertIsInstance(event["item"]["created_at"], int)
+        self.assertTrue(ack["ok"])
+        self.assertEqual(invalid["error"], "MessagePack invalide")
+
+    def test_json_is_the_default(self):
+        list_id = ShoppingList.objects.create().list_id
+
+        async def scenario():
+            communicator = self._connect(list_id)
+            connected, subprotocol = await communicator.connect()
+            await communicator.send_json_to({"action": "nope", "request_id": "1"})
+            reply = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            return subprotocol, reply
+
+        subprotocol, reply = async_to_sync(scenario)()
+        self.assertIsNone(subprotocol)
+        self.assertEqual(reply["event"], "ACK")
+
+
+class RetentionTests(TestCase):
+    """Inactive lists and old sessions are deleted in bounded batches."""
+
+    def setUp(self):
+        self.config = retention.get_config(BATCH_SIZE=2, PAUSE=0)
+        self.now = timezone.now()
+
+    def _list(self, items, days_idle):
+        shopping_list = ShoppingList.objects.create()
+        for n in range(items):
+            Item.objects.create(shopping_list=shopping_list, name=f"Article {n}")
+        ShoppingList.objects.filter(pk=shopping_list.pk).update(
+            last_active_at=self.now - timedelta(days=days_idle)
+        )
+        return shopping_list
+
+    def test_collect_deletes_only_expired_lists(self):
+        old = self._list(5, days_idle=100)
+        unused = self._list(0, days_idle=10)
+        recent = self._list(3, days_idle=10)
+        session = UserSession.objects.create(session_key="old")
+        UserSession.objects.filter(pk=session.pk).update(
+            created_at=self.now - timedelta(days=100)
+        )
+        UserSession.objects.create(session_key="new")
+
+        expected = {"lists": 2, "items": 5, "events": 5, "names": 5, "sessions": 1}
+        self.assertEqual(retention.stats(self.config, self.now), expected)
+        self.assertEqual(retention.collect(self.config, self.now), expected)
+        self.assertEqual(list(ShoppingList.objects.all()), [recent])
+        self.assertFalse(Item.objects.filter(shopping_list_id=old.pk).exists())
+        self.assertFalse(ListEvent.objects.filter(shopping_list_id=old.pk).exists())
+        self.assertFalse(ItemName.objects.filter(shopping_list_id=old.pk).exists())
+        self.assertFalse(ShoppingList.objects.filter(pk=unused.pk).exists())
+        self.assertEqual(
+            list(UserSession.objects.values_list("session_key", flat=True)), ["new"]
+        )
+
+    def test_writes_and_connections_keep_a_list_active(self):
+        written = self._list(1, days_idle=100)
+        Item.objects.create(shopping_list=written, name="Pain")
+        connected = self._list(1, days_idle=100)
+        self.assertTrue(retention.touch_due(connected.list_id))
+        retention.touch_list(connected.list_id)
+        self.assertFalse(retention.touch_due(connected.list_id))
+
+        self.assertEqual(retention.stats(self.config, self.now)["lists"], 0)
+
+    def test_list_reopened_mid_run_is_kept_whole(self):
+        reopened = self._list(3, days_idle=100)
+        expired = self._list(2, days_idle=100)
+        delete_list = retention._delete_list
+
+        def reopen_first(pk, config, now):
+            # Another process writes to the list after it was selected
+            if pk == reopened.pk:
+                Item.objects.create(shopping_list=reopened, name="Pain")
+            return delete_list(pk, config, now)
+
+        with mock.patch.object(retention, "_delete_list", reopen_first):
+            deleted = retention.collect(self.config, self.now)
+
+        self.assertEqual(deleted["lists"], 1)
+        self.assertEqual(deleted["items"], 2)
+        self.assertFalse(ShoppingList.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(reopened.items.count(), 4)
+        self.assertEqual(ListEvent.objects.filter(shopping_list=reopened).count(), 4)
+        self.assertEqual(ItemName.objects.filter(shopping_list=reopened).count(), 4)
+
+    def test_list_is_deleted_in_bounded_chunks(self):
+        old = self._list(5, days_idle=100)
+        with CaptureQueriesContext(connection) as queries:
+            deleted = retention.collect(self.config, self.now)
+
+        self.assertEqual(deleted["items"], 5)
+        self.assertFalse(ShoppingList.objects.filter(pk=old.pk).exists())
+        item_deletes = [
+            q["sql"] for q in queries if q["sql"].startswith('DELETE FROM "api_item"')
+        ]
+        # BATCH_SIZE is 2: three chunks by primary key, none left to cascade
+        self.assertEqual(len(item_deletes), 3)
+        self.assertTrue(all('"api_item"."id" IN' in sql for sql in item_deletes))
+
+    def test_interrupted_purge_is_finished_by_the_next_run(self):
+        marked = self._list(3, days_idle=1)
+        ShoppingList.objects.filter(pk=marked.pk).update(purging=True)
+        Item.objects.filter(shopping_list=marked).first().delete()
+
+        deleted = retention.collect(self.config, self.now)
+        self.assertEqual((deleted["lists"], deleted["items"]), (1, 2))
+        self.assertFalse(ShoppingList.objects.filter(pk=marked.pk).exists())
+
+    def test_command_dry_run_deletes_nothing(self):
+        self._list(2, days_idle=100)
+        out = io.StringIO()
+        call_command("purge_inactive", dry_run=True, stdout=out)
+        self.assertIn("Would delete 1 lists, 2 items", out.getvalue())
+        self.assertEqual(ShoppingList.objects.count(), 1)
+        call_command("purge_inactive", stdout=out)
+        self.assertFalse(ShoppingList.objects.exists())
+
+
+class SQLitePerformanceTests(TransactionTestCase):
+    """Performance mode tunes connections and group-commits service writes."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        writer.enable()
+        self.addCleanup(writer.disable)
+
+    def test_queued_writes_commit_together(self):
+        entered, gate = threading.Event(), threading.Event()
+
+        def hold():
+            entered.set()
+            gate.wait()
+
+        # Keep the writer busy while five writes queue up behind it
+        blocker = threading.Thread(target=writer._queue.run, args=(hold,))
+        blocker.start()
+        entered.wait()
+        threads = [
+            threading.Thread(
+                target=ItemService.create_item, args=(self.shopping_list, f"A{n}")
+            )
+            for n in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while writer._queue._calls.qsize() < 5:
+            time.sleep(0.001)
+        groups = metrics.write_group_size._unlabelled
+        before = groups.totals()
+        gate.set()
+        for thread in threads + [blocker]:
+            thread.join()
+
+        self.assertEqual(self.shopping_list.items.count(), 5)
+        after = groups.totals()
+        # The five waiting writes made one group, in the "up to 8" bucket
+        self.assertEqual(after[3] - before[3], 1)
+        self.assertEqual(sum(after[:-1]) - sum(before[:-1]), 2)
+
+    def test_failed_write_of_a_group_broadcasts_nothing(self):
+        entered, gate = threading.Event(), threading.Event()
+
+        def hold():
+            entered.set()
+            gate.wait()
+
+        def add_then_fail():
+            ItemService.create_item(self.shopping_list, "Perdu")
+            raise RuntimeError("rollback")
+
+        errors = []
+
+        def run_failing():
+            try:
+                writer._queue.run(add_then_fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        blocker = threading.Thread(target=writer._queue.run, args=(hold,))
+        blocker.start()
+        entered.wait()
+        # A good write and a failing one queue up and commit as one group
+        threads = [
+            threading.Thread(
+                target=ItemService.create_item, args=(self.shopping_list, "Pain")
+            ),
+            threading.Thread(target=run_failing),
+        ]
+        with mock.patch.object(broadcast, "_submit") as submit:
+            for queued, thread in enumerate(threads, 1):
+                thread.start()
+                while writer._queue._calls.qsize() < queued:
+                    time.sleep(0.001)
+            gate.set()
+            for thread in threads + [blocker]:
+                thread.join()
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(
+            list(self.shopping_list.items.values_list("name", flat=True)), ["Pain"]
+        )
+        ((batch,), _) = submit.call_args
+        ((_, frame),) = batch
+        event = json.loads(frame["text"])
+        self.assertEqual((event["item"]["name"], event["revision"]), ("Pain", 1))
+        self.assertEqual(
+            [(e.revision, e.payload["item"]["name"]) for e in ListEvent.objects.all()],
+            [(1, "Pain")],
+        )
+
+    def test_failed_write_is_rolled_back_and_raised(self):
+        item = ItemService.create_item(self.shopping_list, "Lait")
+        stale = Item.objects.get(pk=item.pk)
+        ItemService.claim_item(item, "Alice")
+        with self.assertRaises(ConflictError):
+            ItemService.update_item(stale, name="Beurre")
+        item.refresh_from_db()
+        self.assertEqual((item.name, item.claimed_by), ("Lait", "Alice"))
+
+    def test_views_keep_their_etag(self):
+        response = self.client.post(
+            f"/api/lists/{self.shopping_list.list_id}/items/",
+            {"name": "Pain"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["ETag"], f'"{self.shopping_list.list_id}-1"')
+
+    def test_stuck_writer_times_out_and_skips_the_write(self):
+        entered, gate = threading.Event(), threading.Event()
+
+        def hold():
+            entered.set()
+            gate.wait()
+
+        blocker = threading.Thread(target=writer._queue.run, args=(hold,))
+        blocker.start()
+        entered.wait()
+        writer._queue.timeout = writer._queue.poll_interval = 0.05
+        try:
+            with self.assertRaises(writer.WriterUnavailable), self.assertLogs(
+                "api.writer", "ERROR"
+            ):
+                ItemService.create_item(self.shopping_list, "Lait")
+        finally:
+            gate.set()
+            blocker.join()
+        # The abandoned write is dropped, the next one goes through
+        ItemService.create_item(self.shopping_list, "Pain")
+        names = self.shopping_list.items.values_list("name", flat=True)
+        self.assertEqual(list(names), ["Pain"])
+
+    def test_dead_writer_gives_500_and_is_restarted(self):
+        queue = writer._queue
+        queue.poll_interval = 0.01
+        client = self.client
+        client.raise_request_exception = False
+        path = f"/api/lists/{self.shopping_list.list_id}/items/"
+        # An error escaping the writer loop ends the thread
+        with mock.patch.object(queue, "_commit", side_effect=SystemExit):
+            with self.assertLogs("api.writer", "ERROR"):
+                response = client.post(
+                    path, {"name": "Lait"}, content_type="application/json"
+                )
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(queue._thread.is_alive())
+        with self.assertLogs("api.writer", "ERROR") as logs:
+            response = client.post(
+                path, {"name": "Pain"}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("restarting", logs.output[0])
+
+    def test_pragmas_are_applied_to_sqlite_connections(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper(
+                {**connection.settings_dict, "NAME": os.path.join(directory, "t.db")}
+            )
+            sqlite.configure_connection(None, wrapper)
+            with wrapper.cursor() as cursor:
+                values = []
+                for pragma in ("journal_mode", "synchronous", "busy_timeout"):
+                    cursor.execute(f"PRAGMA {pragma}")
+                    values.append(cursor.fetchone()[0])
+            wrapper.close()
+        self.assertEqual(values, ["wal", 1, 5000])
+
+
+class ListCodeTests(TestCase):
+    """List codes come from a keyed permutation of a shared counter."""
+
+    def test_permutation_is_a_bijection(self):
+        permutation = list_ids.FeistelPermutation(b"k" * 32)
+        numbers = [0, 1, 2, list_ids.HALF, list_ids.SPACE - 1] + list(range(5000))
+        codes = [permutation.permute(n) for n in numbers[5:]]
+        self.assertEqual(len(set(codes)), 5000)
+        for number in numbers:
+            permuted = permutation.permute(number)
+            self.assertTrue(0 <= permuted < list_ids.SPACE)
+            self.assertEqual(permutation.invert(permuted), number)
+        self.assertEqual(list_ids.encode(list_ids.SPACE - 1), "999999")
+
+    def test_allocators_never_hand_out_the_same_code(self):
+        config = {**list_ids.get_config(), "BLOCK_SIZE": 3}
+        first = list_ids.ListCodeAllocator(config)
+        second = list_ids.ListCodeAllocator(config)
+        codes = [a.next_code() for _ in range(20) for a in (first, second)]
+        self.assertEqual(len(set(codes)), 40)
+        self.assertTrue(all(len(code) == 6 and code.isalnum() for code in codes))
+
+    def test_create_list_skips_a_taken_code(self):
+        allocator = list_ids.allocator
+        taken = allocator.next_code()
+        ShoppingList.objects.create(list_id=taken)
+        allocator._next -= 1  # Hand out the taken code again
+        discarded = []
+
+        def discard_block():
+            discarded.append(allocator._next)
+            list_ids.ListCodeAllocator.discard_block(allocator)
+
+        allocator.discard_block = discard_block
+        self.addCleanup(vars(allocator).pop, "discard_block")
+        shopping_list = ShoppingListService.create_list()
+        self.assertNotEqual(shopping_list.list_id, taken)
+        self.assertEqual(len(discarded), 1)
+
+    def test_create_list_skips_a_taken_first_code_of_a_new_block(self):
+        allocator = list_ids.allocator
+        allocator.discard_block()
+        allocator.next_code()  # Reserve a block so the counter row exists
+        allocator.discard_block()
+        value, offset = ListCodeCounter.objects.values_list("value", "offset").get()
+        taken = list_ids.encode(
+            allocator._permutation.permute((offset + value) % list_ids.SPACE)
+        )
+        ShoppingList.objects.create(list_id=taken)
+
+        shopping_list = ShoppingListService.create_list()
+        self.assertNotEqual(shopping_list.list_id, taken)
+        counter = ListCodeCounter.objects.get()
+        self.assertEqual(counter.value, value + 2 * allocator.config["BLOCK_SIZE"])
+
+
+class SlowListConsumer(ListConsumer):
+    """A consumer whose socket never finishes writing a frame."""
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        await asyncio.Event().wait()
+
+
+class AdmissionTests(TransactionTestCase):
+    """Connection limits, slow consumers and idle sockets are closed."""
+
+    def setUp(self):
+        self.list_id = ShoppingList.objects.create().list_id
+
+    def _connect(self, list_id, consumer=None):
+        from django.urls import re_path
+        from channels.routing import URLRouter
+        from teamshop.asgi import application
+
+        app = application
+        if consumer is not None:
+            route = re_path(r"ws/lists/(?P<list_id>\w+)/$", consumer.as_asgi())
+            app = URLRouter([route])
+        return WebsocketCommunicator(
+            app,
+            f"/ws/lists/{list_id}/",
+            headers=[(b"host", b"localhost"), (b"origin", b"http://localhost")],
+        )
+
+    def _evictions(self, reason):
+        return metrics.websocket_evictions._get(reason).totals()[0]
+
+    @override_settings(WEBSOCKET_LIMITS={"MAX_PER_LIST": 2, "RETRY_AFTER": 3})
+    def test_sockets_over_the_list_limit_are_told_to_retry(self):
+        other_list = ShoppingList.objects.create().list_id
+
+        async def scenario():
+            first = self._connect(self.list_id)
+            second = self._connect(self.list_id)
+            await first.connect()
+            await second.connect()
+            refused = self._connect(self.list_id)
+            connected, _ = await refused.connect()
+            close = await refused.receive_output(timeout=5)
+            other = self._connect(other_list)
+            await other.connect()
+            await first.disconnect()
+            again = self._connect(self.list_id)
+            await again.connect()
+            await again.send_json_to({"action": "nope", "request_id": "1"})
+            ack = await again.receive_json_from(timeout=5)
+            for communicator in (second, other, again):
+                await communicator.disconnect()
+            return connected, close, ack
+
+        connected, close, ack = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual(close["code"], admission.CLOSE_TRY_AGAIN)
+        self.assertIn(close["reason"], [f"retry-after={n}" for n in range(3, 7)])
+        self.assertEqual(ack["event"], "ACK")
+        self.assertEqual(admission.limiter.total, 0)
+        self.assertEqual(admission.limiter.groups, {})
+
+    @override_settings(WEBSOCKET_LIMITS={"SEND_QUEUE": 2})
+    def test_slow_consumer_is_evicted_when_its_queue_is_full(self):
+        before = self._evictions("slow")
+
+        async def scenario():
+            communicator = self._connect(self.list_id, SlowListConsumer)
+            await communicator.connect()
+            group = list_group_name(self.list_id)
+            for n in range(4):
+                frame = {"type": "list_frame", "text": json.dumps({"n": n})}
+                await get_channel_layer().group_send(group, frame)
+            close = await communicator.receive_output(timeout=5)
+            await communicator.disconnect()
+            return close
+
+        close = async_to_sync(scenario)()
+        self.assertEqual(
+            close, {"type": "websocket.close", "code": 4008, "reason": "slow"}
+        )
+        self.assertEqual(self._evictions("slow"), before + 1)
+
+    @override_settings(WEBSOCKET_LIMITS={"SEND_TIMEOUT": 0.05})
+    def test_stalled_send_evicts_the_socket(self):
+        async def scenario():
+            communicator = self._connect(self.list_id, SlowListConsumer)
+            await communicator.connect()
+            await communicator.send_json_to({"action": "nope", "request_id": "1"})
+            close = await communicator.receive_output(timeout=5)
+            await communicator.disconnect()
+            return close
+
+        self.assertEqual(async_to_sync(scenario)()["code"], admission.CLOSE_SLOW)
+
+    def test_channel_overflow_evicts_the_socket(self):
+        async def scenario():
+            communicator = self._connect(self.list_id)
+            await communicator.connect()
+            await get_channel_layer().group_send(
+                list_group_name(self.list_id), {"type": "channel.overflow"}
+            )
+            close = await communicator.receive_output(timeout=5)
+            await communicator.disconnect()
+            return close
+
+        close = async_to_sync(scenario)()
+        self.assertEqual(close["reason"], "overflow")
+
+    def test_unencoded_events_have_no_handler(self):
+        # Publishers send pre-encoded list frames, never the raw event
+        consumer = ListConsumer()
+        with self.assertRaisesMessage(ValueError, "No handler for message type"):
+            async_to_sync(consumer.dispatch)(
+                {"type": "item_added", "event": "ITEM_ADDED", "revision": 1}
+            )
+
+    @override_settings(WEBSOCKET_LIMITS={"PING_INTERVAL": 0.05, "IDLE_TIMEOUT": 0.2})
+    def test_silent_sockets_are_reaped(self):
+        before = self._evictions("idle")
+
+        async def scenario():
+            communicator = self._connect(self.list_id)
+            await communicator.connect()
+            started = time.monotonic()
+            pings = 0
+            # Answer pings for a while, past the idle timeout
+            while time.monotonic() - started < 0.4:
+                frame = await communicator.receive_json_from(timeout=5)
+                self.assertEqual(frame, admission.PING)
+                pings += 1
+                await communicator.send_json_to({"action": "pong"})
+            # Then fall silent
+            while True:
+                output = await communicator.receive_output(timeout=5)
+                if output["type"] == "websocket.close":
+                    break
+            await communicator.disconnect()
+            return pings, output
+
+        pings, close = async_to_sync(scenario)()
+        self.assertGreater(pings, 3)
+        self.assertEqual(close["code"], admission.CLOSE_IDLE)
+        self.assertEqual(self._evictions("idle"), before + 1)
+
+
+class LargeListTests(TestCase):
+    """Items can be read page by page, or exported as a stream."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        Item.objects.bulk_create(
+            Item(shopping_list=self.shopping_list, name=f"Article {n}")
+            for n in range(7)
+        )
+        items = self.shopping_list.items.order_by("id")
+        # Same timestamp for several items: pages must break ties on id
+        Item.objects.filter(
+            id__in=list(items.values_list("id", flat=True)[2:5])
+        ).update(created_at=items[2].created_at)
+        Item.objects.filter(id=items[6].id).update(status="bought")
+        self.url = f"/api/lists/{self.shopping_list.list_id}/items/"
+
+    def _pages(self, url, query=""):
+        names, cursor = [], ""
+        while True:
+            response = self.client.get(f"{url}?limit=3{query}&cursor={cursor}")
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names.extend(item["name"] for item in data["items"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return names
+
+    def test_cursor_pages_cover_the_list_in_display_order(self):
+        expected = [
+            item.name for item in self.shopping_list.items.order_by("created_at", "id")
+        ]
+        self.assertEqual(self._pages(self.url), expected)
+        self.assertEqual(len(expected), 7)
+        bought = self._pages(self.url, "&status=bought")
+        self.assertEqual(bought, ["Article 6"])
+
+    def test_async_view_pages_like_the_sync_one(self):
+        async def page():
+            request = AsyncRequestFactory().get(self.url, {"limit": 5})
+            return await async_views.add_item(request, self.shopping_list.list_id)
+
+        response = async_to_sync(page)()
+        data = json.loads(response.content)
+        self.assertEqual(len(data["items"]), 5)
+        self.assertIsNotNone(data["next_cursor"])
+
+    def test_bad_parameters_are_rejected(self):
+        for query in ("cursor=nope", "status=lost", "limit=0", "limit=501"):
+            response = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("error", response.json())
+        response = self.client.get("/api/lists/NOPE00/items/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_streams_the_same_document_as_get_list(self):
+        from .export import export_chunks
+
+        _, payload = ShoppingListService.get_list_snapshot(self.shopping_list.list_id)
+        chunks = list(export_chunks(self.shopping_list, chunk_size=2))
+        # Head, four chunks of items, closing brackets
+        self.assertEqual(len(chunks), 6)
+        self.assertEqual(b"".join(chunks), payload)
+        response = self.client.get(f"/api/lists/{self.shopping_list.list_id}/export/")
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), payload)
+
+        async def export_over_asgi():
+            response = await AsyncClient().get(
+                f"/api/lists/{self.shopping_list.list_id}/export/"
+            )
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(b"".join(async_to_sync(export_over_asgi)()), payload)
+        empty = ShoppingList.objects.create()
+        exported = json.loads(b"".join(export_chunks(empty)))
+        self.assertEqual(exported["items"], [])
+
+
+class SuggestTests(TestCase):
+    """Names added to lists are suggested by prefix, from memory."""
+
+    def setUp(self):
+        suggest.list_indexes.clear()
+        suggest.global_index.clear()
+        self.shopping_list = ShoppingList.objects.create()
+        self.url = f"/api/lists/{self.shopping_list.list_id}/suggest/"
+
+    def tearDown(self):
+        suggest.list_indexes.clear()
+        suggest.global_index.clear()
+
+    def _add(self, shopping_list, *names):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in names:
+                ItemService.create_item(shopping_list, name)
+
+    def _suggest(self, q):
+        response = self.client.get(self.url, {"q": q})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["suggestions"]
+
+    def test_list_names_are_ranked_by_use(self):
+        self._add(self.shopping_list, "Lardons", "Lait", "LAIT", "Pâtes")
+        self.assertEqual(self._suggest("la"), ["LAIT", "Lardons"])
+        self.assertEqual(self._suggest(" PA"), ["Pâtes"])
+        self.assertEqual(ItemName.objects.get(normalized="lait").count, 2)
+
+    def test_adds_update_the_cached_index(self):
+        self._add(self.shopping_list, "Pain")
+        self.assertEqual(self._suggest("p"), ["Pain"])
+        self._add(self.shopping_list, "Poires", "Poires")
+        list_id = self.shopping_list.list_id
+        with self.assertNumQueries(0):
+            names = ItemService.suggest_names(list_id, "p")
+        self.assertEqual(names, ["Poires", "Pain"])
+
+    def test_batch_adds_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemService.apply_batch(
+                self.shopping_list,
+                [{"op": "add", "name": "Café"}, {"op": "add", "name": "cafe"}],
+            )
+        self.assertEqual(self._suggest("caf"), ["cafe"])
+        self.assertEqual(ItemName.objects.get().count, 2)
+
+    def test_global_names_need_several_lists(self):
+        for n in range(3):
+            self._add(ShoppingList.objects.create(), "Chocolat noir")
+        self._add(ShoppingList.objects.create(), "Chorizo")
+        self._add(self.shopping_list, "Chips")
+        self.assertEqual(self._suggest("ch"), ["Chips", "Chocolat noir"])
+
+    def test_unknown_list(self):
+        response = self.client.get("/api/lists/NOPE00/suggest/", {"q": "a"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_names_must_be_non_empty_strings(self):
+        item = Item.objects.create(shopping_list=self.shopping_list, name="Riz")
+        list_id = self.shopping_list.list_id
+        factory = AsyncRequestFactory()
+        for name in (None, "", 12, ["Pain"], {"a": 1}):
+            body = json.dumps({"name": name})
+            response = self.client.post(
+                f"/api/lists/{list_id}/items/", body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, name)
+            response = self.client.patch(
+                f"/api/items/{item.id}/", body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400, name)
+            request = factory.post("/", body, content_type="application/json")
+            response = async_to_sync(async_views.add_item)(request, list_id)
+            self.assertEqual(response.status_code, 400, name)
+            request = factory.patch("/", body, content_type="application/json")
+            response = async_to_sync(async_views.update_item)(request, item.id)
+            self.assertEqual(response.status_code, 400, name)
+            for action, payload in (
+                ("add_item", {"name": name}),
+                ("update", {"item_id": item.id, "name": name}),
+            ):
+                ack = execute_command(list_id, {"action": action, **payload})
+                self.assertEqual(ack["status"], 400, (action, name))
+            batch = ItemService.apply_batch(
+                self.shopping_list,
+                [
+                    {"op": "add", "name": name},
+                    {"op": "update", "item_id": item.id, "name": name},
+                ],
+            )
+            self.assertEqual([r["ok"] for r in batch["results"]], [False, False])
+            self.assertIsNone(batch["revision"])
+        self.assertEqual(list(self.shopping_list.items.values_list("name")), [("Riz",)])
+
+    def test_migration_keeps_its_own_normalize(self):
+        migration = importlib.import_module("api.migrations.0009_item_names")
+        for name in ("  Pâtes  fraîches", "LAIT", "Œufs", ""):
+            self.assertEqual(migration.normalize(name), suggest.normalize(name))
+
+    def test_prefix_index_search(self):
+        index = suggest.PrefixIndex([("ab", "Ab", 1), ("abc", "Abc", 3), ("b", "B", 9)])
+        self.assertEqual(index.search("ab", 5), [("abc", "Abc"), ("ab", "Ab")])
+        index.add("abd", "Abd", 5)
+        self.assertEqual(index.search("ab", 1), [("abd", "Abd")])
+        self.assertEqual(index.search("", 1), [("b", "B")])
+        self.assertEqual(index.search("c", 5), [])
+
+
+class FastSerializerTests(TestCase):
+    """The fast serializers produce exactly the JSON of the DRF ones."""
+
+    def setUp(self):
+        self.shopping_list = ShoppingList.objects.create()
+        for name in ("Pâtes", 'Œufs "bio"', "Ligne\u2028suivante"):
+            ItemService.create_item(self.shopping_list, name)
+        Item.objects.filter(name__startswith="Œufs").update(
+            status="claimed", claimed_by="Zoé"
+        )
+        # Whole seconds: isoformat() drops the microseconds then
+        Item.objects.filter(name="Pâtes").update(
+            created_at=timezone.now().replace(microsecond=0)
+        )
+
+    def _fresh_list(self):
+        return ShoppingList.objects.get(pk=self.shopping_list.pk)
+
+    def test_list_and_bytes_match_drf(self):
+        expected = ShoppingListSerializer(self._fresh_list()).data
+        self.assertEqual(fast_serializers.list_data(self._fresh_list()), expected)
+        rendered = JSONRenderer().render(expected)
+        self.assertIn(b"\\u2028", rendered)
+        data = fast_serializers.list_data(self._fresh_list())
+        self.assertEqual(fast_serializers.render(data), rendered)
+        with mock.patch.object(fast_serializers, "orjson", None):
+            self.assertEqual(fast_serializers.render(data), rendered)
+
+    def test_items_match_drf_from_rows_and_instances(self):
+        items = list(Item.objects.order_by("id"))
+        created = ItemService.create_item(self.shopping_list, "Pain")
+        items.append(created)
+        expected = [ItemSerializer(item).data for item in items]
+        self.assertEqual(fast_serializers.items_data(items), expected)
+        rows = fast_serializers.ITEM_PLAN.rows(Item.objects.order_by("id"))
+        self.assertEqual(rows, expected)
+
+    def test_datetimes_use_the_current_time_zone(self):
+        item = Item.objects.first()
+        with timezone.override("Europe/Paris"):
+            expected = ItemSerializer(item).data
+            self.assertEqual(fast_serializers.item_data(item), expected)
+        self.assertFalse(expected["created_at"].endswith("Z"))
+
+
+class StartupTests(TestCase):
+    """Cold starts and the lean startup profile."""
+
+    def test_parse_importtime(self):
+        report = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     _io\n"
+            "import time:      2048 |      10240 | django.contrib.admin.sites\n"
+            "something else\n"
+        )
+        self.assertEqual(
+            startup.parse_importtime(report),
+            {"_io": (120, 120), "django.contrib.admin.sites": (2048, 10240)},
+        )
+        self.assertEqual(
+            startup.package_of("django.contrib.admin.sites"), "django.contrib.admin"
+        )
+        self.assertEqual(startup.package_of("django.db.models"), "django.db")
+        self.assertEqual(startup.package_of("rest_framework.views"), "rest_framework")
+
+    def test_admin_middleware_only_runs_for_admin_requests(self):
+        def view(request):
+            return HttpResponse(str(hasattr(request, "user")))
+
+        middleware = AdminOnlyMiddleware(view)
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get("/api/lists/")).content, b"False")
+        self.assertIsNone(middleware._admin_handler)
+        self.assertEqual(middleware(factory.get("/admin/login/")).content, b"True")
+
+    def test_lean_cold_start_defers_the_admin(self):
+        with startup.migrated_database() as url:
+            api = startup.cold_start(url, LEAN_STARTUP="True")
+            admin = startup.cold_start(url, path="/admin/login/", LEAN_STARTUP="True")
+        self.assertEqual(api["status"], 404)
+        for module in ("api.admin", "channels.auth", "cProfile"):
+            self.assertNotIn(module, api["modules"])
+        self.assertEqual(admin["status"], 200)
+        self.assertIn("api.admin", admin["modules"])
@@ -1,14 +1,30 @@
 """URL configuration for the API app."""
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# The hot endpoints can be served by native async views (settings.API_ASYNC_VIEWS).
+hot_views = async_views if settings.API_ASYNC_VIEWS else views
 
 urlpatterns = [
     path("lists/", views.create_list, name="create_list"),
-    path("lists/<str:list_id>/", views.get_list, name="get_list"),
-    path("lists/<str:list_id>/items/", views.add_item, name="add_item"),
+    path("lists/<str:list_id>/", hot_views.get_list, name="get_list"),
+    path("lists/<str:list_id>/changes/", views.get_changes, name="get_changes"),
+    path("lists/<str:list_id>/export/", views.export_list, name="export_list"),
+    path("lists/<str:list_id>/items/", hot_views.add_item, name="add_item"),
+    path(
+        "lists/<str:list_id>/suggest/", views.suggest_names, name="suggest_names"
+    ),
+    path(
+        "lists/<str:list_id>/items/batch/", views.batch_items, name="batch_items"
+    ),
     path("lists/<str:list_id>/reset/", views.reset_list, name="reset_list"),
     # Rename pseudo
     path("lists/<str:list_id>/rename-pseudo/", views.rename_pseudo, name="rename_pseudo"),
-    path("items/<int:item_id>/", views.update_item, name="update_item"),
-    path("items/<int:item_id>/delete/", views.delete_item, name="delete_item"),
+    path("items/<int:item_id>/", hot_views.update_item, name="update_item"),
+    path("items/<int:item_id>/delete/", hot_views.delete_item, name="delete_item"),
+    path("items/<int:item_id>/claim/", views.claim_item, name="claim_item"),
+    path("items/<int:item_id>/unclaim/", views.unclaim_item, name="unclaim_item"),
+    path("items/<int:item_id>/validate/", views.validate_item, name="validate_item"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -2,12 +2,24 @@
 API views for TeamShop.
 Following SOLID principles - views are thin and delegate to services.
 """
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from . import metrics as metrics_registry
+from .etags import sets_etag, snapshot_response
+from .export import streaming_response
 from .models import Item
-from .serializers import ShoppingListSerializer, ItemSerializer
-from .services import ShoppingListService, ItemService
+from .pagination import MAX_PAGE_SIZE, PAGE_SIZE
+from .fast_serializers import item_data, items_data, list_data
+from .services import (
+    ShoppingListService,
+    ItemService,
+    ConflictError,
+    MAX_BATCH_OPERATIONS,
+)
 
 
 @api_view(["POST"])
@@ -17,8 +29,7 @@ def create_list(request):
     Créer une nouvelle liste de courses.
     """
     shopping_list = ShoppingListService.create_list()
-    serializer = ShoppingListSerializer(shopping_list)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(list_data(shopping_list), status=status.HTTP_201_CREATED)
 
 
 @api_view(["GET"])
@@ -26,42 +37,165 @@ def get_list(request, list_id):
     """
     GET /api/lists/{list_id}/
     Récupérer les détails d'une liste de courses.
+    Répond 304 si l'en-tête If-None-Match correspond à l'ETag actuel.
     """
-    shopping_list = ShoppingListService.get_list_by_id(list_id)
-    serializer = ShoppingListSerializer(shopping_list)
-    return Response(serializer.data)
+    etag, payload = ShoppingListService.get_list_snapshot(
+        list_id, request.headers.get("If-None-Match")
+    )
+    return snapshot_response(etag, payload)
 
 
-@api_view(["POST"])
+@api_view(["GET"])
+def get_changes(request, list_id):
+    """
+    GET /api/lists/{list_id}/changes/?since=N
+    Récupérer les événements manqués depuis la révision N.
+    Renvoie un instantané complet si l'écart est trop grand.
+    """
+    try:
+        since = int(request.query_params.get("since", ""))
+    except ValueError:
+        return Response(
+            {"error": "Le paramètre since est requis"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    changes = ShoppingListService.get_changes(list_id, since)
+    return Response(changes)
+
+
+@api_view(["GET"])
+def export_list(request, list_id):
+    """
+    GET /api/lists/{list_id}/export/
+    Exporter une liste complète, au même format que GET /api/lists/{list_id}/,
+    en flux : les articles sont lus et envoyés par paquets.
+    """
+    return streaming_response(request, ShoppingListService.export_list(list_id))
+
+
+def parse_items_query(params):
+    """
+    Read ``status``, ``cursor`` and ``limit`` from the query string of
+    GET /api/lists/{list_id}/items/. Returns ``(kwargs, error)``.
+    """
+    status_filter = params.get("status") or None
+    if status_filter is not None and status_filter not in dict(Item.STATUS_CHOICES):
+        return None, "Statut invalide"
+    try:
+        limit = int(params.get("limit", PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return None, f"Le paramètre limit doit être entre 1 et {MAX_PAGE_SIZE}"
+    kwargs = {"status": status_filter, "cursor": params.get("cursor"), "limit": limit}
+    return kwargs, None
+
+
+def items_page_data(items, next_cursor):
+    return {
+        "items": items_data(items),
+        "next_cursor": next_cursor,
+    }
+
+
+def list_items(request, list_id):
+    """
+    GET /api/lists/{list_id}/items/?status=&cursor=&limit=
+    Parcourir les articles d'une liste page par page, dans l'ordre d'affichage.
+    Renvoie { "items": [...], "next_cursor": "..." | null }.
+    """
+    kwargs, error = parse_items_query(request.query_params)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        items, next_cursor = ItemService.get_items_page(list_id, **kwargs)
+    except ValueError:
+        return Response(
+            {"error": "Curseur invalide"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(items_page_data(items, next_cursor))
+
+
+@api_view(["GET"])
+def suggest_names(request, list_id):
+    """
+    GET /api/lists/{list_id}/suggest/?q=
+    Suggérer des noms d'articles commençant par q : ceux déjà ajoutés à la
+    liste d'abord, puis les plus courants dans toutes les listes.
+    """
+    prefix = request.query_params.get("q", "")
+    return Response({"suggestions": ItemService.suggest_names(list_id, prefix)})
+
+
+@api_view(["GET", "POST"])
+@sets_etag
 def add_item(request, list_id):
     """
     POST /api/lists/{list_id}/items/
     Ajouter un article à une liste de courses.
     Body: { "name": "Article name" }
+    GET sur la même adresse : voir list_items.
     """
+    if request.method == "GET":
+        return list_items(request, list_id)
     shopping_list = ShoppingListService.get_list_by_id(list_id)
     name = request.data.get("name")
 
-    if not name:
+    if not ItemService.is_valid_name(name):
         return Response(
             {"error": "Le nom de l'article est requis"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     item = ItemService.create_item(shopping_list, name)
-    serializer = ItemSerializer(item)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(item_data(item), status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+@sets_etag
+def batch_items(request, list_id):
+    """
+    POST /api/lists/{list_id}/items/batch/
+    Appliquer plusieurs opérations sur les articles en une seule transaction.
+    Body: { "operations": [
+        { "op": "add", "name": "..." },
+        { "op": "claim" | "validate", "item_id": 1, "pseudo": "..." },
+        { "op": "update", "item_id": 1, "current_pseudo": "...", "name": "..." },
+        { "op": "delete", "item_id": 1, "current_pseudo": "..." }
+    ] }
+    """
+    shopping_list = ShoppingListService.get_list_by_id(list_id)
+    operations = request.data.get("operations")
+
+    if not isinstance(operations, list) or not operations:
+        return Response(
+            {"error": "La liste des opérations est requise"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(operations) > MAX_BATCH_OPERATIONS or not all(
+        isinstance(op, dict) for op in operations
+    ):
+        return Response(
+            {"error": "Opérations invalides ou trop nombreuses"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    result = ItemService.apply_batch(shopping_list, operations)
+    return Response(result)
 
 
 @api_view(["PATCH"])
+@sets_etag
 def update_item(request, item_id):
     """
     PATCH /api/items/{item_id}/
     Mettre à jour un article.
-    Body: { "name": "...", "status": "...", "claimed_by": "..." }
+    Body: { "name": "...", "status": "...", "claimed_by": "...", "version": 3 }
+    Avec "version", la mise à jour échoue (409) si l'article a changé depuis.
     """
     try:
-        item = Item.objects.get(id=item_id)
+        item = Item.objects.select_related("shopping_list").get(id=item_id)
     except Item.DoesNotExist:
         return Response(
             {"error": "Article introuvable"}, status=status.HTTP_404_NOT_FOUND
@@ -69,11 +203,7 @@ def update_item(request, item_id):
 
     # Check if item is locked by another user
     current_pseudo = request.data.get("current_pseudo")
-    if (
-        item.status == "claimed"
-        and item.claimed_by
-        and item.claimed_by != current_pseudo
-    ):
+    if ItemService.is_locked_for(item, current_pseudo):
         return Response(
             {"error": "Cet article est verrouillé par un autre utilisateur"},
             status=status.HTTP_403_FORBIDDEN,
@@ -84,20 +214,90 @@ def update_item(request, item_id):
     update_data = {
         key: value for key, value in request.data.items() if key in allowed_fields
     }
+    if "name" in update_data and not ItemService.is_valid_name(update_data["name"]):
+        return Response(
+            {"error": "Le nom de l'article est requis"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    version = request.data.get("version")
+    try:
+        item = ItemService.update_item(
+            item,
+            expected_version=version if isinstance(version, int) else None,
+            **update_data,
+        )
+    except ConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(item_data(item))
+
+
+def _change_claim(request, item_id, transition):
+    """Apply a claim/unclaim/validate transition for ``request.data["pseudo"]``."""
+    try:
+        item = Item.objects.select_related("shopping_list").get(id=item_id)
+    except Item.DoesNotExist:
+        return Response(
+            {"error": "Article introuvable"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    pseudo = request.data.get("pseudo")
+    if not pseudo:
+        return Response(
+            {"error": "Le pseudo est requis"}, status=status.HTTP_400_BAD_REQUEST
+        )
 
-    item = ItemService.update_item(item, **update_data)
-    serializer = ItemSerializer(item)
-    return Response(serializer.data)
+    try:
+        item = transition(item, pseudo)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+    except ConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(item_data(item))
+
+
+@api_view(["POST"])
+@sets_etag
+def claim_item(request, item_id):
+    """
+    POST /api/items/{item_id}/claim/
+    Prendre en charge un article.
+    Body: { "pseudo": "..." }
+    """
+    return _change_claim(request, item_id, ItemService.claim_item)
+
+
+@api_view(["POST"])
+@sets_etag
+def unclaim_item(request, item_id):
+    """
+    POST /api/items/{item_id}/unclaim/
+    Libérer un article pris en charge.
+    Body: { "pseudo": "..." }
+    """
+    return _change_claim(request, item_id, ItemService.unclaim_item)
+
+
+@api_view(["POST"])
+@sets_etag
+def validate_item(request, item_id):
+    """
+    POST /api/items/{item_id}/validate/
+    Marquer comme acheté un article pris en charge.
+    Body: { "pseudo": "..." }
+    """
+    return _change_claim(request, item_id, ItemService.validate_item)
 
 
 @api_view(["DELETE"])
+@sets_etag
 def delete_item(request, item_id):
     """
     DELETE /api/items/{item_id}/
     Supprimer un article.
     """
     try:
-        item = Item.objects.get(id=item_id)
+        item = Item.objects.select_related("shopping_list").get(id=item_id)
     except Item.DoesNotExist:
         return Response(
             {"error": "Article introuvable"}, status=status.HTTP_404_NOT_FOUND
@@ -105,11 +305,7 @@ def delete_item(request, item_id):
 
     # Check if item is locked by another user
     current_pseudo = request.data.get("current_pseudo")
-    if (
-        item.status == "claimed"
-        and item.claimed_by
-        and item.claimed_by != current_pseudo
-    ):
+    if ItemService.is_locked_for(item, current_pseudo):
         return Response(
             {"error": "Cet article est verrouillé par un autre utilisateur"},
             status=status.HTTP_403_FORBIDDEN,
@@ -120,18 +316,20 @@ def delete_item(request, item_id):
 
 
 @api_view(["POST"])
+@sets_etag
 def reset_list(request, list_id):
     """
     POST /api/lists/{list_id}/reset/
     Réinitialiser la liste après les courses.
     """
     shopping_list = ShoppingListService.get_list_by_id(list_id)
-    ShoppingListService.reset_list(shopping_list)
-    serializer = ShoppingListSerializer(shopping_list)
-    return Response(serializer.data)
+    _, text = ShoppingListService.reset_list(shopping_list)
+    # The LIST_RESET event as broadcast, not encoded a second time
+    return HttpResponse(text, content_type="application/json")
 
 
 @api_view(["POST"])
+@sets_etag
 def rename_pseudo(request, list_id):
     """
     POST /api/lists/{list_id}/rename-pseudo/
@@ -168,3 +366,24 @@ def rename_pseudo(request, list_id):
         )
     except ValueError as e:
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@require_GET
+def metrics(request):
+    """
+    GET /api/metrics/
+    Process metrics in the Prometheus text format. Requires
+    ``Authorization: Bearer <METRICS_TOKEN>`` when a token is configured,
+    otherwise a request from ``INTERNAL_METRICS_IPS``.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = (
+            request.headers.get("Authorization") == f"Bearer {settings.METRICS_TOKEN}"
+        )
+    else:
+        allowed = request.META.get("REMOTE_ADDR") in settings.INTERNAL_METRICS_IPS
+    if not allowed:
+        return HttpResponse("Accès refusé", status=403, content_type="text/plain")
+    return HttpResponse(
+        metrics_registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,141 @@
+"""
+WebSocket wire formats, negotiated through the WebSocket subprotocol.
+Following SOLID principles - consumers pick a format, this module encodes it.
+
+``teamshop.json`` (the default, also used when a client offers no
+subprotocol) sends events as JSON text frames, exactly as published.
+
+``teamshop.msgpack.v1`` sends binary MessagePack frames, smaller on poor
+mobile links:
+
+- map keys listed in ``KEYS`` are sent as their index in that tuple
+- ``created_at`` / ``updated_at`` become integer milliseconds since the epoch
+- the channel layer ``type`` key is dropped; clients dispatch on ``event``
+
+Clients of that protocol send commands as MessagePack maps, with interned or
+plain keys.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import msgpack
+
+JSON_PROTOCOL = "teamshop.json"
+MSGPACK_PROTOCOL = "teamshop.msgpack.v1"
+
+# Interned keys of the v1 protocol. Only ever append: the index is the wire key.
+KEYS = (
+    "type",
+    "event",
+    "revision",
+    "item",
+    "item_id",
+    "id",
+    "name",
+    "status",
+    "claimed_by",
+    "created_at",
+    "updated_at",
+    "version",
+    "events",
+    "list_id",
+    "deleted_ids",
+    "reset_ids",
+    "old_pseudo",
+    "new_pseudo",
+    "request_id",
+    "action",
+    "ok",
+    "data",
+    "error",
+    "items",
+    "results",
+    "index",
+    "op",
+    "pseudo",
+    "current_pseudo",
+    "operations",
+    "since",
+    "snapshot",
+)
+KEY_IDS = {key: index for index, key in enumerate(KEYS)}
+TIMESTAMP_KEYS = frozenset({"created_at", "updated_at"})
+DROPPED_KEYS = frozenset({"type"})
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def negotiate(offered):
+    """Return the subprotocol to accept among those offered by the client."""
+    for protocol in (MSGPACK_PROTOCOL, JSON_PROTOCOL):
+        if protocol in (offered or ()):
+            return protocol
+    return None
+
+
+def _timestamp(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - _EPOCH) // _MILLISECOND
+
+
+def compact(value):
+    """Rewrite a JSON-compatible event with interned keys and integer timestamps."""
+    if isinstance(value, dict):
+        return {
+            KEY_IDS.get(key, key): (
+                _timestamp(item) if key in TIMESTAMP_KEYS else compact(item)
+            )
+            for key, item in value.items()
+            if key not in DROPPED_KEYS
+        }
+    if isinstance(value, list):
+        return [compact(item) for item in value]
+    return value
+
+
+def _key_name(key):
+    if isinstance(key, int) and 0 <= key < len(KEYS):
+        return KEYS[key]
+    return key
+
+
+def expand(value):
+    """Turn interned keys back into names. Timestamps stay integers."""
+    if isinstance(value, dict):
+        return {_key_name(key): expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item) for item in value]
+    return value
+
+
+# MessagePack
+
+
+def pack(value):
+    """Encode ``value`` as MessagePack."""
+    return msgpack.packb(value)
+
+
+def unpack(data):
+    """Decode one MessagePack value; raises ValueError on invalid data."""
+    try:
+        return msgpack.unpackb(data, strict_map_key=False)
+    except (msgpack.UnpackException, TypeError) as e:
+        raise ValueError(str(e)) from e
+
+
+@lru_cache(maxsize=256)
+def binary_frame(text):
+    """
+    Binary frame for a JSON frame from ``broadcast.encode_frame``. Cached, so a
+    frame fanned out to many binary sockets of a process is encoded once.
+    """
+    return pack(compact(json.loads(text)))
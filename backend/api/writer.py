@@ -0,0 +1,186 @@
+"""
+Single-writer queue with group commit, for SQLite.
+Following SOLID principles - services declare their writes with
+``serialized_write``; ordering and batching of transactions live here.
+
+SQLite allows one writer at a time. Request threads writing concurrently
+queue on its lock and, when a read transaction has to upgrade, fail with
+"database is locked". When enabled (see ``api.sqlite``), every decorated
+service call is handed to one writer thread instead. That thread takes all
+calls waiting in the queue, up to ``MAX_BATCH``, and runs them in a single
+transaction, each in its own savepoint: one commit for many mutations, and
+no lock contention between them. A call that raises only rolls back its
+savepoint; the caller gets the exception, the others still commit.
+
+Callers block until the transaction commits, so responses are never sent for
+uncommitted writes. They give up with ``WriterUnavailable`` (a 500 for HTTP
+requests) after ``timeout`` seconds, or as soon as the writer thread is found
+dead; a call the writer has not started by then is never run, and the next
+call starts a new writer thread. Each call runs in a copy of the caller's
+context, so ETags, metrics and profiling still see it. Broadcasts of the batch
+are sent once it commits, merged per list as usual; async views therefore get
+them from the dispatcher instead of ``broadcast.capture()``.
+"""
+import contextvars
+import functools
+import logging
+import queue
+import threading
+import time
+from django.db import connection, transaction
+from .metrics import write_group_size
+
+logger = logging.getLogger(__name__)
+
+
+class WriterUnavailable(RuntimeError):
+    """The writer thread did not run a write in time, or has died."""
+
+
+class _Call:
+    __slots__ = ("context", "func", "result", "error", "done", "lock", "state")
+
+    def __init__(self, func):
+        self.context = contextvars.copy_context()
+        self.func = func
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        # "queued", then "started" by the writer or "abandoned" by the caller
+        self.state = "queued"
+
+    def start(self):
+        """Claim the call for the writer; False if its caller gave up on it."""
+        with self.lock:
+            if self.state == "abandoned":
+                return False
+            self.state = "started"
+            return True
+
+    def abandon(self):
+        """Give up on the call; True if the writer had not started it."""
+        with self.lock:
+            if self.state == "queued":
+                self.state = "abandoned"
+            return self.state == "abandoned"
+
+
+class WriteQueue:
+    """Runs queued write calls from one thread, group-committing them."""
+
+    # Seconds between two liveness checks of the writer thread by a caller
+    poll_interval = 0.5
+
+    def __init__(self, max_batch=64, timeout=30):
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._calls = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def run(self, func, *args, **kwargs):
+        """Run ``func`` in the writer thread and return its result once committed."""
+        # Calls made by a queued call, or inside the caller's own transaction,
+        # must see that transaction: run them right here.
+        if threading.current_thread() is self._thread or connection.in_atomic_block:
+            return func(*args, **kwargs)
+        call = _Call(functools.partial(func, *args, **kwargs))
+        thread = self._ensure_thread()
+        self._calls.put(call)
+        self._wait(call, thread)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _wait(self, call, thread):
+        deadline = time.monotonic() + self.timeout
+        while not call.done.wait(self.poll_interval):
+            if thread.is_alive() and time.monotonic() < deadline:
+                continue
+            if call.done.is_set():
+                return
+            reason = (
+                f"did not commit within {self.timeout}s"
+                if thread.is_alive()
+                else "has stopped"
+            )
+            outcome = "was not run" if call.abandon() else "was running"
+            logger.error("The database writer %s; the write %s", reason, outcome)
+            raise WriterUnavailable(f"The database writer {reason}")
+
+    def _ensure_thread(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is not None:
+                    logger.error("The database writer thread died; restarting it")
+                self._thread = threading.Thread(
+                    target=self._loop, name="db-writer", daemon=True
+                )
+                self._thread.start()
+            return self._thread
+
+    def _loop(self):
+        while True:
+            calls = [self._calls.get()]
+            while len(calls) < self.max_batch:
+                try:
+                    calls.append(self._calls.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(calls)
+
+    def _commit(self, calls):
+        calls = [call for call in calls if call.start()]
+        if not calls:
+            return
+        connection.close_if_unusable_or_obsolete()
+        try:
+            with transaction.atomic():
+                for call in calls:
+                    try:
+                        with transaction.atomic():
+                            call.result = call.context.run(call.func)
+                    except Exception as e:
+                        call.error = e
+        except Exception as e:
+            # The commit itself failed: nothing of the batch was written.
+            logger.exception("Group commit of %d writes failed", len(calls))
+            for call in calls:
+                call.error = call.error or e
+        finally:
+            write_group_size.observe(len(calls))
+            for call in calls:
+                call.done.set()
+
+
+_queue = None
+
+
+def enable(max_batch=64, timeout=30):
+    """Route ``serialized_write`` calls through a process-wide ``WriteQueue``."""
+    global _queue
+    _queue = WriteQueue(max_batch, timeout)
+
+
+def disable():
+    global _queue
+    _queue = None
+
+
+def serialized_write(func):
+    """
+    Decorate a service method that writes to the database, so it goes through
+    the single-writer queue when one is enabled and runs directly otherwise.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _queue is None:
+            return func(*args, **kwargs)
+        return _queue.run(func, *args, **kwargs)
+
+    return wrapper
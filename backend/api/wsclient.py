@@ -0,0 +1,118 @@
+"""
+Minimal asyncio WebSocket client for harnesses and load tests.
+Following SOLID principles - just enough RFC 6455 to talk to a local daphne
+over real sockets, without pulling in a client library.
+"""
+import asyncio
+import base64
+import os
+import struct
+
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    """The server closed the connection; ``code`` is its close code."""
+
+    def __init__(self, code=None):
+        super().__init__(f"WebSocket closed ({code})")
+        self.code = code
+
+
+class WebSocketClient:
+    """A connected WebSocket; use ``connect()`` to create one."""
+
+    def __init__(self, reader, writer, subprotocol=None):
+        self.reader = reader
+        self.writer = writer
+        self.subprotocol = subprotocol
+
+    async def send_text(self, text):
+        await self._send_frame(OP_TEXT, text.encode())
+
+    async def send_bytes(self, data):
+        await self._send_frame(OP_BINARY, data)
+
+    async def recv(self):
+        """
+        Return the next data message as ``str`` (text) or ``bytes`` (binary).
+        Answers pings transparently; raises WebSocketClosed on close.
+        """
+        while True:
+            opcode, payload = await self._read_frame()
+            if opcode == OP_TEXT:
+                return payload.decode()
+            if opcode == OP_BINARY:
+                return payload
+            if opcode == OP_PING:
+                await self._send_frame(OP_PONG, payload)
+            elif opcode == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if payload else None
+                raise WebSocketClosed(code)
+
+    async def close(self, code=1000):
+        try:
+            await self._send_frame(OP_CLOSE, struct.pack("!H", code))
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+    async def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 65536:
+            header += bytes([0x80 | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def _read_frame(self):
+        first, second = await self.reader.readexactly(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+        payload = await self.reader.readexactly(length)
+        # Servers never fragment the small frames this app sends.
+        return first & 0x0F, payload
+
+
+async def connect(host, port, path, subprotocols=None, origin=None):
+    """Open a WebSocket to ``ws://host:port/path`` and return a client."""
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    headers = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {host}:{port}",
+        "Upgrade: websocket",
+        "Connection: Upgrade",
+        f"Sec-WebSocket-Key: {key}",
+        "Sec-WebSocket-Version: 13",
+        f"Origin: {origin or f'http://{host}:{port}'}",
+    ]
+    if subprotocols:
+        headers.append(f"Sec-WebSocket-Protocol: {', '.join(subprotocols)}")
+    writer.write(("\r\n".join(headers) + "\r\n\r\n").encode())
+    await writer.drain()
+
+    response = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = response.decode("latin-1").split("\r\n")
+    if " 101 " not in status_line:
+        writer.close()
+        raise WebSocketClosed(status_line)
+    subprotocol = None
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sec-websocket-protocol":
+            subprotocol = value.strip()
+    return WebSocketClient(reader, writer, subprotocol)
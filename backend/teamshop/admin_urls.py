@@ -0,0 +1,10 @@
+"""
+Admin URLconf of the lean startup profile (``teamshop.lean``), imported on the
+first ``/admin/`` request: registers the ``admin.py`` of every app, as the
+default admin app does at startup, then routes to the admin site.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
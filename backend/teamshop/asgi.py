@@ -10,21 +10,32 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
-from api.routing import websocket_urlpatterns
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "teamshop.settings")
 
 # Initialize Django ASGI application early to ensure the AppRegistry is populated
 django_asgi_app = get_asgi_application()
 
+# Imported after setup: the consumers import models.
+from django.conf import settings  # noqa: E402
+from api.routing import websocket_urlpatterns  # noqa: E402
+from api.retention import start_collector  # noqa: E402
+
+websocket_app = URLRouter(websocket_urlpatterns)
+if not settings.LEAN_STARTUP:
+    # The consumers do not read scope["user"]; the lean profile skips it
+    from channels.auth import AuthMiddlewareStack
+
+    websocket_app = AuthMiddlewareStack(websocket_app)
+
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
-        "websocket": AllowedHostsOriginValidator(
-            AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
-        ),
+        "websocket": AllowedHostsOriginValidator(websocket_app),
     }
 )
+
+# Deletes inactive lists in the background when LIST_RETENTION is enabled
+start_collector()
@@ -0,0 +1,56 @@
+"""
+Lean startup profile (``LEAN_STARTUP=True``).
+Following SOLID principles - the settings switch the profile on, this module
+holds what the admin still needs when it is not loaded at startup.
+
+The API and the WebSockets use neither sessions nor users; only the admin
+does. In the lean profile the admin app is installed without autodiscovery
+(``SimpleAdminConfig``), its URLconf (``teamshop.admin_urls``) is imported on
+the first ``/admin/`` request, and the session, authentication and message
+middleware run for ``/admin/`` requests only, through ``AdminOnlyMiddleware``.
+
+The modules of ``django.contrib.admin`` are still imported at startup: an
+installed app is imported with its models, and the admin cannot be left out
+of ``INSTALLED_APPS`` without losing its ``LogEntry`` history, templates and
+static files. Only the registration of every app's ``admin.py``, the admin
+URL patterns and that middleware are deferred, so the gain is small.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.module_loading import import_string
+
+ADMIN_PREFIX = "/admin/"
+
+# Run in this order around admin requests, as in the default MIDDLEWARE
+ADMIN_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+
+
+class AdminOnlyMiddleware:
+    """Runs ``ADMIN_MIDDLEWARE`` for admin requests, built on the first one."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self._admin_handler = None
+
+    def __call__(self, request):
+        if request.path_info.startswith(ADMIN_PREFIX):
+            return self.admin_handler()(request)
+        return self.get_response(request)
+
+    def admin_handler(self):
+        """``get_response`` wrapped in ``ADMIN_MIDDLEWARE``."""
+        if self._admin_handler is None:
+            handler = self.get_response
+            for path in reversed(ADMIN_MIDDLEWARE):
+                handler = import_string(path)(handler)
+            self._admin_handler = handler
+        return self._admin_handler
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",  # Latency and query metrics per view
+    "api.profiling.ProfilingMiddleware",  # Removed unless REQUEST_PROFILING
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Add Whitenoise for static files
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -63,6 +65,20 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Lean startup profile (teamshop/lean.py): the admin's autodiscovery and URLs
+# wait for its first request (its modules still load at startup), and sessions,
+# users and messages are only handled for admin requests. The admin checks for
+# that middleware in MIDDLEWARE.
+LEAN_STARTUP = os.environ.get("LEAN_STARTUP", "False") == "True"
+if LEAN_STARTUP:
+    INSTALLED_APPS[0] = "django.contrib.admin.apps.SimpleAdminConfig"
+    MIDDLEWARE[
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware")
+    ] = "teamshop.lean.AdminOnlyMiddleware"
+    MIDDLEWARE.remove("django.contrib.auth.middleware.AuthenticationMiddleware")
+    MIDDLEWARE.remove("django.contrib.messages.middleware.MessageMiddleware")
+    SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
+
 ROOT_URLCONF = "teamshop.urls"
 
 TEMPLATES = [
@@ -95,6 +111,26 @@ DATABASES = {
     )
 }
 
+# Opt-in SQLite tuning for single-server deployments (api/sqlite.py): WAL,
+# synchronous=NORMAL, busy timeout, mmap and page cache on every connection,
+# and service writes group-committed by a single writer thread (api/writer.py).
+SQLITE_PERFORMANCE = {
+    "ENABLED": os.environ.get("SQLITE_PERFORMANCE", "False") == "True",
+    "BUSY_TIMEOUT": int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")),  # ms
+    "MMAP_SIZE": 256 * 1024 * 1024,
+    "CACHE_SIZE": -64 * 1024,  # KiB
+    "WRITE_QUEUE": os.environ.get("SQLITE_WRITE_QUEUE", "True") == "True",
+    "MAX_BATCH": 64,
+    "WRITE_TIMEOUT": int(os.environ.get("SQLITE_WRITE_TIMEOUT", "30")),  # s
+}
+if (
+    SQLITE_PERFORMANCE["ENABLED"]
+    and DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3"
+):
+    # Take the write lock when a transaction starts, so waiting for it honours
+    # the busy timeout instead of failing on a read-to-write upgrade.
+    DATABASES["default"].setdefault("OPTIONS", {})["transaction_mode"] = "IMMEDIATE"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -154,7 +190,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework Configuration
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "api.profiling.TimedJSONRenderer",
     ],
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",
@@ -169,10 +205,110 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
 ).split(",")
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = os.environ.get("CORS_ALLOW_ALL", "False") == "True"
+# Let cross-origin clients read list ETags for conditional requests
+CORS_EXPOSE_HEADERS = ["ETag"]
+
+# List snapshot cache
+# Serialized GET /api/lists/{list_id}/ payloads, keyed by list revision.
+# Set LIST_SNAPSHOT_SHARED_CACHE to an alias of CACHES to share them between
+# worker processes.
+LIST_SNAPSHOT_CACHE = {
+    "MAX_ENTRIES": int(os.environ.get("LIST_SNAPSHOT_CACHE_SIZE", "512")),
+    "SHARED_CACHE": os.environ.get("LIST_SNAPSHOT_SHARED_CACHE") or None,
+    "TIMEOUT": 300,
+}
 
-# Channels Configuration
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
+# Per-list event log backing GET /api/lists/{list_id}/changes/?since=N.
+# Clients further behind than MAX_EVENTS get a full snapshot instead.
+LIST_EVENT_LOG = {
+    "MAX_EVENTS": 200,
+    "PRUNE_EVERY": 20,
+}
+
+# Retention of inactive lists and sessions (api/retention.py). Run
+# "manage.py purge_inactive", or set LIST_RETENTION=True to collect every
+# INTERVAL seconds in each ASGI process.
+LIST_RETENTION = {
+    "ENABLED": os.environ.get("LIST_RETENTION", "False") == "True",
+    "LIST_DAYS": int(os.environ.get("LIST_RETENTION_DAYS", "90")),
+    "EMPTY_LIST_DAYS": int(os.environ.get("LIST_RETENTION_EMPTY_DAYS", "7")),
+    "SESSION_DAYS": int(os.environ.get("SESSION_RETENTION_DAYS", "90")),
+    "BATCH_SIZE": 500,
+    "PAUSE": 0.05,
+    "INTERVAL": int(os.environ.get("LIST_RETENTION_INTERVAL", "3600")),
+}
+
+# WebSocket limits of each process (api/admission.py). Sockets over a limit are
+# closed with code 4029 and a "retry-after=<seconds>" reason; slow sockets
+# (send queue full) with 4008, silent ones (no pong) with 4001.
+WEBSOCKET_LIMITS = {
+    "MAX_CONNECTIONS": int(os.environ.get("WS_MAX_CONNECTIONS", "10000")),
+    "MAX_PER_LIST": int(os.environ.get("WS_MAX_PER_LIST", "200")),
+    "RETRY_AFTER": 5,
+    "SEND_QUEUE": int(os.environ.get("WS_SEND_QUEUE", "64")),
+    "SEND_TIMEOUT": 10,
+    "PING_INTERVAL": int(os.environ.get("WS_PING_INTERVAL", "25")),
+    "IDLE_TIMEOUT": int(os.environ.get("WS_IDLE_TIMEOUT", "60")),
+}
+
+# List code allocation (api/list_ids.py). Codes are a permutation of a shared
+# counter keyed with LIST_ID_KEY, or with SECRET_KEY when unset; each process
+# reserves BLOCK_SIZE codes at a time.
+LIST_IDS = {
+    "KEY": os.environ.get("LIST_ID_KEY") or None,
+    "BLOCK_SIZE": 1000,
 }
+
+# Item-name autocomplete (api/suggest.py). Names used in fewer than
+# GLOBAL_MIN_LISTS lists are only ever suggested in their own list.
+ITEM_SUGGEST = {
+    "MAX_LISTS": int(os.environ.get("SUGGEST_MAX_LISTS", "1024")),
+    "GLOBAL_MIN_LISTS": int(os.environ.get("SUGGEST_GLOBAL_MIN_LISTS", "3")),
+}
+
+# Serve the hot list endpoints (get_list, add_item, update_item, delete_item)
+# from the native async views of api/async_views.py. Only useful under ASGI.
+API_ASYNC_VIEWS = os.environ.get("API_ASYNC_VIEWS", "False") == "True"
+
+# Bearer token required to read /api/metrics/. Leave unset to expose the
+# endpoint only to requests from INTERNAL_METRICS_IPS.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+INTERNAL_METRICS_IPS = os.environ.get(
+    "INTERNAL_METRICS_IPS", "127.0.0.1,::1"
+).split(",")
+
+# On-demand profiling (api/profiling.py). Requests sending
+# "X-Profile: <PROFILING_TOKEN>", and a PROFILING_RATE share of all requests,
+# are profiled; reports and profiles go to PROFILING_DIR.
+REQUEST_PROFILING = {
+    "ENABLED": os.environ.get("PROFILING", "False") == "True",
+    "RATE": float(os.environ.get("PROFILING_RATE", "0")),
+    "TOKEN": os.environ.get("PROFILING_TOKEN") or None,
+    "PROFILER": os.environ.get("PROFILING_BACKEND", "cprofile"),  # or sampling
+    "DIR": os.environ.get("PROFILING_DIR", str(BASE_DIR / "profiles")),
+    "KEEP": int(os.environ.get("PROFILING_KEEP", "200")),
+}
+
+# Channels Configuration
+# The in-memory layer only reaches sockets of the current process. Set
+# CHANNEL_LAYER=database to run several daphne processes against the same
+# database (LISTEN/NOTIFY on PostgreSQL, table polling on SQLite).
+if os.environ.get("CHANNEL_LAYER", "memory") == "database":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "api.channel_layer.DatabaseChannelLayer",
+            "CONFIG": {
+                "capacity": 100,
+                "expiry": 60,
+                "poll_interval": float(
+                    os.environ.get("CHANNEL_LAYER_POLL_INTERVAL", "0.05")
+                ),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "api.channel_layer.MemoryChannelLayer",
+        },
+    }
@@ -15,16 +15,28 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
+from django.urls.resolvers import RoutePattern, URLResolver
 from django.views.generic import TemplateView
 
+if settings.LEAN_STARTUP:
+    # Imports teamshop.admin_urls, and autodiscovers, on the first admin request
+    admin_urls = URLResolver(
+        RoutePattern("admin/"),
+        "teamshop.admin_urls",
+        app_name="admin",
+        namespace="admin",
+    )
+else:
+    from django.contrib import admin
+
+    admin_urls = path("admin/", admin.site.urls)
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
+    admin_urls,
     path("api/", include("api.urls")),
     # Serve React Frontend for any other route
     path("", TemplateView.as_view(template_name="index.html")),
     path("<path:resource>", TemplateView.as_view(template_name="index.html")),
 ]
-
@@ -21,4 +21,8 @@ echo "Collecting static files..."
 cd backend
 python manage.py collectstatic --noinput
 
+# Compile the bytecode now instead of on the first start
+echo "Compiling Python bytecode..."
+python -m compileall -q .
+
 echo "Build complete!"
@@ -1,12 +1,43 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
+import { itemApi } from '../services/api';
+
+// Délai avant de demander des suggestions, pour ne pas appeler l'API à chaque touche
+const SUGGEST_DELAY_MS = 150;
 
 /**
  * AddItemForm Component - Formulaire d'ajout d'article
- * Sticky bottom input (mobile-first)
+ * Sticky bottom input (mobile-first), avec suggestions de noms déjà utilisés
  */
-export default function AddItemForm({ onAdd, disabled }) {
+export default function AddItemForm({ onAdd, disabled, listId, existingNames = [] }) {
   const [itemName, setItemName] = useState('');
   const [loading, setLoading] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    const prefix = itemName.trim();
+    if (!listId || !prefix) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const names = await itemApi.suggestNames(listId, prefix);
+        if (!cancelled) setSuggestions(names);
+      } catch {
+        // Les suggestions sont facultatives
+        if (!cancelled) setSuggestions([]);
+      }
+    }, SUGGEST_DELAY_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [listId, itemName]);
+
+  // Ne pas proposer ce qui est déjà sur la liste
+  const onList = new Set(existingNames.map((name) => name.toLowerCase()));
+  const shown = suggestions.filter((name) => !onList.has(name.toLowerCase()));
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -34,9 +65,16 @@ export default function AddItemForm({ onAdd, disabled }) {
           value={itemName}
           onChange={(e) => setItemName(e.target.value)}
           placeholder="Ajouter un article..."
+          list="item-suggestions"
+          autoComplete="off"
           className="flex-1 px-4 py-3 border-2 border-gray-300 rounded-lg focus:ring-2 focus:ring-indigo-500 focus:border-transparent outline-none transition-all text-base"
           disabled={disabled || loading}
         />
+        <datalist id="item-suggestions">
+          {shown.map((name) => (
+            <option key={name} value={name} />
+          ))}
+        </datalist>
         <button
           type="submit"
           disabled={!itemName.trim() || disabled || loading}
@@ -3,13 +3,51 @@
  * Manages WebSocket connection lifecycle and message handling.
  * Following SOLID principles - single responsibility for WebSocket management.
  */
-import { useEffect, useRef, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
+
+// How long to wait for the server ACK of a command before giving up
+const COMMAND_TIMEOUT_MS = 10000;
+
+// Reconnection delay: random up to BASE * 2^attempt, capped, so that clients
+// dropped together (e.g. by a deploy) do not all come back at once
+const RECONNECT_BASE_MS = 1000;
+const RECONNECT_MAX_MS = 30000;
+
+// Close code of a server at its connection limit; the reason is
+// "retry-after=<seconds>"
+const CLOSE_TRY_AGAIN = 4029;
+
+/**
+ * Milliseconds to wait before reconnecting after the given close event.
+ */
+export function reconnectDelay(closeEvent, attempt) {
+    const match = /^retry-after=(\d+)$/.exec(closeEvent.reason || '');
+    if (closeEvent.code === CLOSE_TRY_AGAIN && match) {
+        return Number(match[1]) * 1000;
+    }
+    const ceiling = Math.min(RECONNECT_MAX_MS, RECONNECT_BASE_MS * 2 ** attempt);
+    return Math.random() * ceiling;
+}
+
+/**
+ * Events committed together arrive as a single BATCH frame; inner events
+ * without their own revision share the revision of the batch.
+ */
+export function unpackEvents(data) {
+    if (data.event !== 'BATCH') return [data];
+    return data.events.map((event) =>
+        event.revision ? event : { ...event, revision: data.revision }
+    );
+}
 
 export default function useWebSocket(listId, onMessage) {
     const [isConnected, setIsConnected] = useState(false);
     const wsRef = useRef(null);
     const reconnectTimeoutRef = useRef(null);
+    const reconnectAttemptRef = useRef(0);
     const onMessageRef = useRef(onMessage);
+    const pendingRef = useRef(new Map());
+    const requestCounterRef = useRef(0);
 
     // Update the ref whenever onMessage changes
     useEffect(() => {
@@ -19,6 +57,29 @@ export default function useWebSocket(listId, onMessage) {
     useEffect(() => {
         if (!listId) return;
 
+        const settleCommand = (ack) => {
+            const pending = pendingRef.current.get(ack.request_id);
+            if (!pending) return;
+            pendingRef.current.delete(ack.request_id);
+            clearTimeout(pending.timeout);
+            if (ack.ok) {
+                pending.resolve(ack.data);
+            } else {
+                // Same shape as an axios error so callers can share error handling
+                pending.reject({
+                    response: { status: ack.status, data: { error: ack.error } },
+                });
+            }
+        };
+
+        const rejectPendingCommands = () => {
+            pendingRef.current.forEach((pending) => {
+                clearTimeout(pending.timeout);
+                pending.reject(new Error('WebSocket disconnected'));
+            });
+            pendingRef.current.clear();
+        };
+
         const connectWebSocket = () => {
             // WebSocket URL - adjust protocol based on current protocol
             const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
@@ -29,6 +90,7 @@ export default function useWebSocket(listId, onMessage) {
 
             ws.onopen = () => {
                 console.log('WebSocket connected');
+                reconnectAttemptRef.current = 0;
                 setIsConnected(true);
             };
 
@@ -36,9 +98,17 @@ export default function useWebSocket(listId, onMessage) {
                 try {
                     const data = JSON.parse(event.data);
                     console.log('WebSocket message received:', data);
-                    if (onMessageRef.current) {
-                        onMessageRef.current(data);
+                    if (data.event === 'ACK') {
+                        settleCommand(data);
+                        return;
                     }
+                    if (data.event === 'PING') {
+                        // Keeps the server from closing this socket as idle
+                        ws.send(JSON.stringify({ action: 'pong' }));
+                        return;
+                    }
+                    if (!onMessageRef.current) return;
+                    unpackEvents(data).forEach((item) => onMessageRef.current(item));
                 } catch (error) {
                     console.error('Error parsing WebSocket message:', error);
                 }
@@ -48,15 +118,18 @@ export default function useWebSocket(listId, onMessage) {
                 console.error('WebSocket error:', error);
             };
 
-            ws.onclose = () => {
-                console.log('WebSocket disconnected');
+            ws.onclose = (event) => {
+                console.log('WebSocket disconnected', event.code, event.reason);
                 setIsConnected(false);
+                rejectPendingCommands();
 
-                // Attempt to reconnect after 3 seconds
+                // Attempt to reconnect, backing off while it keeps failing
+                const delay = reconnectDelay(event, reconnectAttemptRef.current);
+                reconnectAttemptRef.current += 1;
                 reconnectTimeoutRef.current = setTimeout(() => {
                     console.log('Attempting to reconnect...');
                     connectWebSocket();
-                }, 3000);
+                }, delay);
             };
         };
 
@@ -73,5 +146,26 @@ export default function useWebSocket(listId, onMessage) {
         };
     }, [listId]); // Only reconnect when listId changes
 
-    return { isConnected };
+    /**
+     * Send a mutation over the socket and resolve with the ACK data.
+     * Rejects when the socket is closed so callers can fall back to HTTP.
+     */
+    const sendCommand = useCallback((action, payload = {}) => {
+        const ws = wsRef.current;
+        if (!ws || ws.readyState !== WebSocket.OPEN) {
+            return Promise.reject(new Error('WebSocket not connected'));
+        }
+        requestCounterRef.current += 1;
+        const requestId = `${Date.now()}-${requestCounterRef.current}`;
+        return new Promise((resolve, reject) => {
+            const timeout = setTimeout(() => {
+                pendingRef.current.delete(requestId);
+                reject(new Error('WebSocket command timed out'));
+            }, COMMAND_TIMEOUT_MS);
+            pendingRef.current.set(requestId, { resolve, reject, timeout });
+            ws.send(JSON.stringify({ action, request_id: requestId, ...payload }));
+        });
+    }, []);
+
+    return { isConnected, sendCommand };
 }
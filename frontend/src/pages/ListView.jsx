@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { listApi, itemApi } from '../services/api';
 import ItemRow from '../components/ItemRow';
@@ -6,7 +6,7 @@ import AddItemForm from '../components/AddItemForm';
 import PseudoModal from '../components/PseudoModal';
 import RenameModal from '../components/RenameModal';
 import ChristmasAnimation from '../components/ChristmasAnimation';
-import useWebSocket from '../hooks/useWebSocket';
+import useWebSocket, { unpackEvents } from '../hooks/useWebSocket';
 
 /**
  * ListView Page - Vue principale de la liste
@@ -24,9 +24,16 @@ export default function ListView() {
   const [showRenameModal, setShowRenameModal] = useState(false);
   const [showChristmasAnimation, setShowChristmasAnimation] = useState(false);
 
+  // Last list revision applied, used to catch up after a reconnect
+  const lastRevisionRef = useRef(0);
+  const hasConnectedRef = useRef(false);
+
   // Handle WebSocket messages for real-time updates
   const handleWebSocketMessage = useCallback((data) => {
     console.log('Handling WebSocket event:', data);
+    if (data.revision) {
+      lastRevisionRef.current = Math.max(lastRevisionRef.current, data.revision);
+    }
 
     if (data.event === 'ITEM_ADDED' && data.item) {
       setList((prevList) => {
@@ -57,10 +64,24 @@ export default function ListView() {
           items: prevList.items.filter((item) => item.id !== data.item_id),
         };
       });
-    } else if (data.event === 'LIST_RESET' && data.list) {
-      console.log('LIST_RESET event received', data.list);
-      // Replace entire list state with fresh data from server
-      setList(data.list);
+    } else if (data.event === 'LIST_RESET') {
+      console.log('LIST_RESET event received', data);
+      // Apply the diff: bought items are gone, claimed items are pending again
+      const deletedIds = new Set(data.deleted_ids || []);
+      const resetIds = new Set(data.reset_ids || []);
+      setList((prevList) => {
+        if (!prevList) return prevList;
+        return {
+          ...prevList,
+          items: prevList.items
+            .filter((item) => !deletedIds.has(item.id))
+            .map((item) =>
+              resetIds.has(item.id)
+                ? { ...item, status: 'pending', claimed_by: null }
+                : item
+            ),
+        };
+      });
       // Exit shopping mode for everyone
       setIsShoppingMode(false);
     } else if (data.event === 'PSEUDO_RENAMED' && data.old_pseudo && data.new_pseudo) {
@@ -81,7 +102,36 @@ export default function ListView() {
   }, []);
 
   // Connect to WebSocket for real-time updates
-  const { isConnected } = useWebSocket(listId, handleWebSocketMessage);
+  const { isConnected, sendCommand } = useWebSocket(listId, handleWebSocketMessage);
+
+  // Run a mutation over the WebSocket when it is open, otherwise over HTTP
+  const runCommand = useCallback(
+    (action, payload, httpFallback) =>
+      isConnected ? sendCommand(action, payload) : httpFallback(),
+    [isConnected, sendCommand]
+  );
+
+  // After a reconnect, fetch only the events missed while offline
+  useEffect(() => {
+    if (!isConnected) return;
+    if (!hasConnectedRef.current) {
+      hasConnectedRef.current = true;
+      return;
+    }
+    sendCommand('resume', { since: lastRevisionRef.current })
+      .then((changes) => {
+        if (changes.snapshot) {
+          setList(changes.snapshot);
+        } else {
+          changes.events.flatMap(unpackEvents).forEach(handleWebSocketMessage);
+        }
+        lastRevisionRef.current = changes.revision;
+      })
+      .catch((err) => {
+        console.error('Resync failed, reloading list:', err);
+        loadList();
+      });
+  }, [isConnected, sendCommand, handleWebSocketMessage]);
 
   // Load list data
   useEffect(() => {
@@ -101,6 +151,7 @@ export default function ListView() {
     try {
       const data = await listApi.getList(listId);
       setList(data);
+      lastRevisionRef.current = data.revision || 0;
       setError('');
     } catch (err) {
       if (err.response?.status === 404) {
@@ -125,7 +176,7 @@ export default function ListView() {
         setShowChristmasAnimation(true);
       }
 
-      await itemApi.addItem(listId, name);
+      await runCommand('add_item', { name }, () => itemApi.addItem(listId, name));
       // No need to refresh - WebSocket will update automatically
     } catch (err) {
       if (err.response?.status === 404) {
@@ -141,7 +192,11 @@ export default function ListView() {
 
   const handleDeleteItem = async (itemId) => {
     try {
-      await itemApi.deleteItem(itemId, currentPseudo);
+      await runCommand(
+        'delete',
+        { item_id: itemId, current_pseudo: currentPseudo },
+        () => itemApi.deleteItem(itemId, currentPseudo)
+      );
       // No need to refresh - WebSocket will update automatically
     } catch (err) {
       if (err.response?.status === 403) {
@@ -217,21 +272,18 @@ export default function ListView() {
     try {
       if (item.status === 'pending') {
         // Claim item
-        await itemApi.updateItem(item.id, {
-          status: 'claimed',
-          claimed_by: currentPseudo,
-          current_pseudo: currentPseudo,
-        });
+        await runCommand('claim', { item_id: item.id, pseudo: currentPseudo }, () =>
+          itemApi.claimItem(item.id, currentPseudo)
+        );
       } else if (item.status === 'claimed' && item.claimed_by === currentPseudo) {
         // Validate item (bought)
-        await itemApi.updateItem(item.id, {
-          status: 'bought',
-          current_pseudo: currentPseudo,
-        });
+        await runCommand('validate', { item_id: item.id, pseudo: currentPseudo }, () =>
+          itemApi.validateItem(item.id, currentPseudo)
+        );
       }
     } catch (err) {
       console.error('Error updating item:', err);
-      if (err.response?.status === 403) {
+      if (err.response?.status === 403 || err.response?.status === 409) {
         alert('🔒 Un autre utilisateur a déjà pris cet article.');
       } else if (err.response?.status === 404) {
         alert('❌ Article introuvable.');
@@ -243,7 +295,7 @@ export default function ListView() {
 
   const handleResetList = async () => {
     try {
-      await listApi.resetList(listId);
+      await runCommand('reset', {}, () => listApi.resetList(listId));
       // WebSocket will handle the list update and mode change
       // Don't update state here to avoid race conditions
     } catch (err) {
@@ -416,7 +468,12 @@ export default function ListView() {
 
       {/* Add Item Form - Sticky Bottom */}
       {!isShoppingMode && (
-        <AddItemForm onAdd={handleAddItem} disabled={!list} />
+        <AddItemForm
+          onAdd={handleAddItem}
+          disabled={!list}
+          listId={listId}
+          existingNames={list?.items.map((item) => item.name) ?? []}
+        />
       )}
 
       {/* Finish Shopping Button - Sticky Bottom for Shopping Mode */}
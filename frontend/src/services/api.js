@@ -48,6 +48,22 @@ export const itemApi = {
     return response.data;
   },
 
+  /**
+   * Suggérer des noms d'articles commençant par q
+   */
+  suggestNames: async (listId, q) => {
+    const response = await api.get(`/lists/${listId}/suggest/`, { params: { q } });
+    return response.data.suggestions;
+  },
+
+  /**
+   * Appliquer plusieurs opérations sur les articles en une seule requête
+   */
+  batchItems: async (listId, operations) => {
+    const response = await api.post(`/lists/${listId}/items/batch/`, { operations });
+    return response.data;
+  },
+
   /**
    * Mettre à jour un article
    */
@@ -56,6 +72,30 @@ export const itemApi = {
     return response.data;
   },
 
+  /**
+   * Prendre en charge un article (409 si quelqu'un l'a pris avant)
+   */
+  claimItem: async (itemId, pseudo) => {
+    const response = await api.post(`/items/${itemId}/claim/`, { pseudo });
+    return response.data;
+  },
+
+  /**
+   * Libérer un article pris en charge
+   */
+  unclaimItem: async (itemId, pseudo) => {
+    const response = await api.post(`/items/${itemId}/unclaim/`, { pseudo });
+    return response.data;
+  },
+
+  /**
+   * Marquer comme acheté un article pris en charge
+   */
+  validateItem: async (itemId, pseudo) => {
+    const response = await api.post(`/items/${itemId}/validate/`, { pseudo });
+    return response.data;
+  },
+
   /**
    * Supprimer un article
    */